@@ -0,0 +1,73 @@
+"""Compare CompletionList.model_validate with CompactCompletionList.from_json.
+
+Usage: python benchmarks/completion_list.py [number of items]
+"""
+
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+import sansio_lsp_client as lsp
+
+
+def make_result(count: int) -> str:
+    # Roughly what clangd sends for a global completion
+    items = []
+    for i in range(count):
+        name = f"symbol_{i % 5000}_{i}"
+        items.append(
+            {
+                "label": f" {name}(int x, char *y)",
+                "kind": 3,
+                "detail": "int",
+                "sortText": f"{i:08x}{name}",
+                "filterText": name,
+                "insertText": name,
+                "insertTextFormat": 1,
+                "textEdit": {
+                    "range": {
+                        "start": {"line": 10, "character": 4},
+                        "end": {"line": 10, "character": 7},
+                    },
+                    "newText": name,
+                },
+                "score": 0.5,
+            }
+        )
+    return json.dumps({"isIncomplete": False, "items": items})
+
+
+def measure(name: str, raw: str, parse) -> None:
+    # Timed without tracemalloc, because tracing slows allocations down a lot.
+    gc.collect()
+    start = time.perf_counter()
+    result = parse(json.loads(raw))
+    elapsed = time.perf_counter() - start
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = parse(json.loads(raw))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    print(
+        f"{name:>32}: {elapsed * 1000:7.1f} ms, "
+        f"{current / 2**20:6.1f} MiB retained, {peak / 2**20:6.1f} MiB peak"
+    )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 30_000
+    raw = make_result(count)
+    print(f"{count} items, {len(raw) / 2**20:.1f} MiB of JSON")
+    measure("json.loads only", raw, lambda result: result)
+    measure("CompletionList.model_validate", raw, lsp.CompletionList.model_validate)
+    measure("CompactCompletionList.from_json", raw, lsp.CompactCompletionList.from_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Measure how long importing the library takes, in fresh interpreters.
+
+Usage: python benchmarks/import_time.py [number of runs]
+"""
+
+import statistics
+import subprocess
+import sys
+
+STATEMENTS = [
+    "import sansio_lsp_client",
+    "from sansio_lsp_client import ResponseCache",
+    "import pydantic",
+    "from sansio_lsp_client import Client",
+    "from sansio_lsp_client import Client, Hover, DocumentSymbol",
+]
+
+TIMER = """
+import time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(statement: str, runs: int) -> float:
+    times = [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", TIMER.format(statement=statement)],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(runs)
+    ]
+    return statistics.median(times)
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    for statement in STATEMENTS:
+        print(f"{statement:>60}: {measure(statement, runs) * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Measure the time and peak memory of sending a huge document with did_open().
+
+Usage: python benchmarks/large_document.py [size in MiB]
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+
+import sansio_lsp_client as lsp
+from sansio_lsp_client.io_handler import _make_headers, _make_response
+
+
+def initialized_client() -> lsp.Client:
+    client = lsp.Client()
+    client.send()
+    list(client.recv(_make_response(id=0, result={"capabilities": {}})))
+    client.send()
+    return client
+
+
+def with_json_dumps(item: lsp.TextDocumentItem) -> bytes:
+    # What did_open() used to do
+    content = {
+        "jsonrpc": "2.0",
+        "method": "textDocument/didOpen",
+        "params": {"textDocument": item.model_dump()},
+    }
+    encoded_content = json.dumps(content).encode("utf-8")
+    request = bytearray()
+    request += _make_headers(content_length=len(encoded_content))
+    request += encoded_content
+    return request[:]
+
+
+def with_did_open(item: lsp.TextDocumentItem) -> bytes:
+    client = initialized_client()
+    client.did_open(item)
+    return client.send()
+
+
+def measure(name: str, function, item: lsp.TextDocumentItem) -> None:
+    start = time.perf_counter()
+    function(item)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = function(item)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(
+        f"{name:>12}: {elapsed * 1000:7.1f} ms, "
+        f"{peak / 2**20:6.1f} MiB peak (text: {len(item.text) / 2**20:.1f} MiB)"
+    )
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    line = 'static const char *s = "\\thello";  // generated\n'
+    text = line * (size * 2**20 // len(line))
+    item = lsp.TextDocumentItem(
+        uri="file:///generated.c", languageId="c", version=0, text=text
+    )
+    measure("json.dumps", with_json_dumps, item)
+    measure("did_open", with_did_open, item)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare did_open() in a loop with Client.preload_documents().
+
+Usage: python benchmarks/preload.py [number of files]
+"""
+
+import pathlib
+import sys
+import tempfile
+import time
+
+import sansio_lsp_client as lsp
+from sansio_lsp_client.io_handler import _make_response
+
+
+def initialized_client() -> lsp.Client:
+    client = lsp.Client()
+    client.send()
+    list(client.recv(_make_response(id=0, result={"capabilities": {}})))
+    client.send()
+    return client
+
+
+def with_did_open(paths) -> int:
+    client = initialized_client()
+    sent = 0
+    for path in paths:
+        client.did_open(
+            lsp.TextDocumentItem(
+                uri=pathlib.Path(path).absolute().as_uri(),
+                languageId="python",
+                version=0,
+                text=pathlib.Path(path).read_text(encoding="utf-8"),
+            )
+        )
+        sent += len(client.send())
+    return sent
+
+
+def with_preload(paths) -> int:
+    client = initialized_client()
+    sent = 0
+    for progress in client.preload_documents(paths, "python"):
+        sent += len(client.send())
+    return sent
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(count):
+            path = pathlib.Path(directory, f"module_{i}.py")
+            path.write_text(f"def function_{i}(x):\n    return x * {i}\n" * 200)
+            paths.append(str(path))
+
+        for name, function in [("did_open", with_did_open), ("preload", with_preload)]:
+            start = time.perf_counter()
+            sent = function(paths)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:>10}: {elapsed * 1000:7.1f} ms, "
+                f"{count / elapsed:8.0f} files/s, {sent / elapsed / 2**20:6.1f} MiB/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
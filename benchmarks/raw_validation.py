@@ -0,0 +1,68 @@
+"""Compare how fast recv() handles messages with and without validation.
+
+Usage: python benchmarks/raw_validation.py [number of messages]
+"""
+
+import sys
+import time
+
+import sansio_lsp_client as lsp
+from sansio_lsp_client.io_handler import _make_request, _make_response
+
+
+def diagnostic(line: int) -> dict:
+    return {
+        "range": {
+            "start": {"line": line, "character": 0},
+            "end": {"line": line, "character": 10},
+        },
+        "severity": 2,
+        "source": "linter",
+        "message": f"unused variable on line {line}",
+    }
+
+
+def make_messages(count: int) -> bytes:
+    # What a bulk indexer sees: diagnostics and logs interleaved
+    data = bytearray()
+    for i in range(count):
+        if i % 2:
+            params = {
+                "uri": f"file:///src/file{i}.py",
+                "diagnostics": [diagnostic(line) for line in range(10)],
+            }
+            data += _make_request("textDocument/publishDiagnostics", params)
+        else:
+            data += _make_request(
+                "window/logMessage", {"type": 4, "message": f"indexed file {i}"}
+            )
+    return bytes(data)
+
+
+def initialized_client(validation: str) -> lsp.Client:
+    client = lsp.Client(validation=validation)  # type: ignore[arg-type]
+    client.send()
+    list(client.recv(_make_response(id=0, result={"capabilities": {}})))
+    client.send()
+    return client
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = make_messages(count)
+    for validation in ["models", "raw"]:
+        client = initialized_client(validation)
+        start = time.perf_counter()
+        events = 0
+        for offset in range(0, len(data), 65536):
+            for _ in client.recv(data[offset : offset + 65536]):
+                events += 1
+        elapsed = time.perf_counter() - start
+        print(
+            f"{validation:>6}: {events} events in {elapsed * 1000:7.1f} ms,"
+            f" {events / elapsed:9.0f} events/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,203 @@
 """Client library for managing language server requests & responses."""
 
-from .client import *
-from .events import *
-from .structs import *
+import importlib
+import typing as t
+
+if t.TYPE_CHECKING:
+    from .call_hierarchy import *
+    from .capabilities import *
+    from .client import *
+    from .compact_completion import *
+    from .completion import *
+    from .diagnostics import *
+    from .events import *
+    from .preload import *
+    from .progress import *
+    from .response_cache import *
+    from .semantic_tokens import *
+    from .symbol_index import *
+    from .structs import *
+    from .watched_files import *
+    from .workspace_edit import *
+    from .workspace_symbols import *
+    from pydantic import ValidationError as ValidationError
 
 __version__ = "0.12.0"
+
+# Importing pydantic and creating the models takes a while, so submodules are
+# imported when one of their names is used for the first time. A program that
+# only needs e.g. the ResponseCache doesn't pay for the rest.
+_SUBMODULE_NAMES: t.Dict[str, t.List[str]] = {
+    "call_hierarchy": ["CallHierarchyExpander"],
+    "capabilities": ["CapabilityRegistry"],
+    # ValidationError is pydantic's, for catching errors of recv()
+    "client": [
+        "CAPABILITIES",
+        "Client",
+        "ClientState",
+        "MessageTooLargeError",
+        "ValidationError",
+    ],
+    "compact_completion": ["CompactCompletionItem", "CompactCompletionList"],
+    "completion": ["CompletionSession"],
+    "diagnostics": ["DiagnosticsIndex"],
+    "events": [
+        "CompactCompletion",
+        "Completion",
+        "CompletionItemResolve",
+        "ConfigurationRequest",
+        "Declaration",
+        "Definition",
+        "DiagnosticRefreshRequest",
+        "DiagnosticsDelta",
+        "DocumentDiagnostics",
+        "DocumentFormatting",
+        "Event",
+        "Hover",
+        "Implementation",
+        "Initialized",
+        "LogMessage",
+        "MCallHierarchItems",
+        "MCallHierarchyIncomingCalls",
+        "MCallHierarchyOutgoingCalls",
+        "MDocumentSymbols",
+        "MFoldingRanges",
+        "MInlayHints",
+        "MWorkspaceSymbols",
+        "MessageSkipped",
+        "MethodResponse",
+        "PartialResult",
+        "Progress",
+        "ProgressUpdate",
+        "PublishDiagnostics",
+        "RawEvent",
+        "RawResponse",
+        "RawServerNotification",
+        "RawServerRequest",
+        "References",
+        "RegisterCapabilityRequest",
+        "ResponseError",
+        "SemanticTokens",
+        "ServerNotification",
+        "ServerRequest",
+        "ShowMessage",
+        "ShowMessageRequest",
+        "Shutdown",
+        "SignatureHelp",
+        "TypeDefinition",
+        "UnregisterCapabilityRequest",
+        "WillSaveWaitUntilEdits",
+        "WorkDoneProgress",
+        "WorkDoneProgressBegin",
+        "WorkDoneProgressCreate",
+        "WorkDoneProgressEnd",
+        "WorkDoneProgressReport",
+        "WorkspaceDiagnostics",
+        "WorkspaceEdit",
+        "WorkspaceFolders",
+        "WorkspaceProjectInitializationComplete",
+    ],
+    "preload": ["PreloadProgress"],
+    "progress": ["ProgressTracker"],
+    "response_cache": ["DEFAULT_CACHED_METHODS", "ResponseCache"],
+    "semantic_tokens": ["SemanticToken", "SemanticTokensData"],
+    "symbol_index": ["SymbolIndex"],
+    "structs": [
+        "CallHierarchyIncomingCall",
+        "CallHierarchyItem",
+        "CallHierarchyOutgoingCall",
+        "Command",
+        "CompletionContext",
+        "CompletionItem",
+        "CompletionItemKind",
+        "CompletionItemTag",
+        "CompletionList",
+        "CompletionTriggerKind",
+        "ConfigurationItem",
+        "Diagnostic",
+        "DiagnosticRelatedInformation",
+        "DiagnosticSeverity",
+        "DocumentDiagnosticReportKind",
+        "DocumentSymbol",
+        "FileChangeType",
+        "FileEvent",
+        "FileSystemWatcher",
+        "FoldingRange",
+        "FormattingOptions",
+        "Id",
+        "InlayHint",
+        "InlayHintKind",
+        "InlayHintLabelPart",
+        "InsertTextFormat",
+        "JSONDict",
+        "JSONList",
+        "Location",
+        "LocationLink",
+        "MWorkDoneProgressKind",
+        "MarkedString",
+        "MarkupContent",
+        "MarkupKind",
+        "MessageActionItem",
+        "MessageType",
+        "OptionalVersionedTextDocumentIdentifier",
+        "ParameterInformation",
+        "Position",
+        "ProgressToken",
+        "ProgressValue",
+        "Range",
+        "Registration",
+        "RelativePattern",
+        "Request",
+        "Response",
+        "SemanticTokensLegend",
+        "ServerInfo",
+        "SignatureInformation",
+        "SymbolInformation",
+        "SymbolKind",
+        "SymbolTag",
+        "TextDocumentContentChangeEvent",
+        "TextDocumentEdit",
+        "TextDocumentIdentifier",
+        "TextDocumentItem",
+        "TextDocumentPosition",
+        "TextDocumentSaveReason",
+        "TextDocumentSyncKind",
+        "TextEdit",
+        "Unregistration",
+        "VersionedTextDocumentIdentifier",
+        "WatchKind",
+        "WorkDoneProgressBeginValue",
+        "WorkDoneProgressEndValue",
+        "WorkDoneProgressReportValue",
+        "WorkDoneProgressValue",
+        "WorkspaceDocumentDiagnosticReport",
+        "WorkspaceFolder",
+    ],
+    "watched_files": ["InotifyWatcher", "WatchedFilesBatcher"],
+    "workspace_edit": [
+        "OverlappingEditsError",
+        "apply_text_edits",
+        "apply_workspace_edit",
+    ],
+    "workspace_symbols": ["WorkspaceSymbolIndex"],
+}
+_NAME_SUBMODULES = {
+    name: submodule for submodule, names in _SUBMODULE_NAMES.items() for name in names
+}
+
+__all__ = ["__version__", *_NAME_SUBMODULES]
+
+
+def __getattr__(name: str) -> t.Any:
+    if name in _SUBMODULE_NAMES:
+        return importlib.import_module(f".{name}", __name__)
+    if name not in _NAME_SUBMODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    submodule = importlib.import_module(f".{_NAME_SUBMODULES[name]}", __name__)
+    value = getattr(submodule, name)
+    globals()[name] = value  # __getattr__ isn't called for it again
+    return value
+
+
+def __dir__() -> t.List[str]:
+    return sorted({*globals(), *_NAME_SUBMODULES})
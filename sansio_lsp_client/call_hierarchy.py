@@ -0,0 +1,123 @@
+import collections
+import typing as t
+
+from .events import (
+    Event,
+    MCallHierarchyIncomingCalls,
+    MCallHierarchyOutgoingCalls,
+    ResponseError,
+)
+from .structs import (
+    CallHierarchyIncomingCall,
+    CallHierarchyItem,
+    CallHierarchyOutgoingCall,
+    Id,
+    Range,
+)
+
+if t.TYPE_CHECKING:
+    from .client import Client
+
+# Items are considered the same if they have the same uri and selectionRange.
+_ItemKey = t.Tuple[str, Range]
+_Call = t.Union[CallHierarchyIncomingCall, CallHierarchyOutgoingCall]
+
+
+def _item_key(item: CallHierarchyItem) -> _ItemKey:
+    return (item.uri, item.selectionRange)
+
+
+class CallHierarchyExpander:
+    """
+    Explores the call graph breadth-first, starting from the items of a
+    prepareCallHierarchy response.
+
+    Up to `max_in_flight` incomingCalls or outgoingCalls requests (depending
+    on `direction`) are sent at once, and every item is expanded only once,
+    no matter how many callers or callees share it. Items at `max_depth`
+    calls away from the start are not expanded.
+
+    Pass every event from `Client.recv()` to `handle()`, which returns True
+    for the events that belong to the expander, and send the client's data
+    until `done` is true::
+
+        expander = CallHierarchyExpander(client, "outgoing", max_depth=3)
+        expander.start(prepare_call_hierarchy_event.result)
+        while not expander.done:
+            sock.sendall(client.send())
+            for event in client.recv(sock.recv(4096)):
+                expander.handle(event)
+    """
+
+    def __init__(
+        self,
+        client: "Client",
+        direction: t.Literal["incoming", "outgoing"],
+        max_depth: int = 3,
+        max_in_flight: int = 8,
+    ) -> None:
+        self.client = client
+        self.direction = direction
+        self.max_depth = max_depth
+        self.max_in_flight = max_in_flight
+
+        # Every item seen so far, and the calls of the expanded items
+        self.items: t.Dict[_ItemKey, CallHierarchyItem] = {}
+        self.calls: t.Dict[_ItemKey, t.List[_Call]] = {}
+        # Items whose requests failed, with the errors
+        self.errors: t.Dict[_ItemKey, ResponseError] = {}
+
+        self._queue: t.Deque[t.Tuple[CallHierarchyItem, int]] = collections.deque()
+        self._in_flight: t.Dict[Id, t.Tuple[_ItemKey, int]] = {}
+
+    @property
+    def done(self) -> bool:
+        return not self._queue and not self._in_flight
+
+    def start(self, items: t.Optional[t.Iterable[CallHierarchyItem]]) -> None:
+        """Start expanding from `items`, which are at depth 0."""
+        for item in items or []:
+            self._add(item, 0)
+        self._send_requests()
+
+    def _add(self, item: CallHierarchyItem, depth: int) -> None:
+        key = _item_key(item)
+        if key in self.items:
+            return
+        self.items[key] = item
+        if depth < self.max_depth:
+            self._queue.append((item, depth))
+
+    def _send_requests(self) -> None:
+        while self._queue and len(self._in_flight) < self.max_in_flight:
+            item, depth = self._queue.popleft()
+            if self.direction == "incoming":
+                id = self.client.incoming_calls(item)
+            else:
+                id = self.client.outgoing_calls(item)
+            self._in_flight[id] = (_item_key(item), depth)
+
+    def handle(self, event: Event) -> bool:
+        """Handle an event if it's a response to the expander's requests."""
+        if not isinstance(
+            event,
+            (MCallHierarchyIncomingCalls, MCallHierarchyOutgoingCalls, ResponseError),
+        ):
+            return False
+        if event.message_id not in self._in_flight:
+            return False
+
+        key, depth = self._in_flight.pop(event.message_id)
+        if isinstance(event, ResponseError):
+            self.errors[key] = event
+        else:
+            calls: t.List[_Call] = list(event.result or [])
+            self.calls[key] = calls
+            for call in calls:
+                if isinstance(call, CallHierarchyIncomingCall):
+                    self._add(call.from_, depth + 1)
+                else:
+                    self._add(call.to, depth + 1)
+
+        self._send_requests()
+        return True
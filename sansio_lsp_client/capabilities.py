@@ -0,0 +1,236 @@
+import collections
+import re
+import typing as t
+import urllib.parse
+
+from .structs import JSONDict, Registration, Unregistration
+
+# Where servers advertise support for each request in their static
+# capabilities (the result of the initialize request).
+_STATIC_CAPABILITIES: t.Dict[str, t.Tuple[str, ...]] = {
+    "textDocument/completion": ("completionProvider",),
+    "completionItem/resolve": ("completionProvider", "resolveProvider"),
+    "textDocument/hover": ("hoverProvider",),
+    "textDocument/signatureHelp": ("signatureHelpProvider",),
+    "textDocument/declaration": ("declarationProvider",),
+    "textDocument/definition": ("definitionProvider",),
+    "textDocument/typeDefinition": ("typeDefinitionProvider",),
+    "textDocument/implementation": ("implementationProvider",),
+    "textDocument/references": ("referencesProvider",),
+    "textDocument/documentHighlight": ("documentHighlightProvider",),
+    "textDocument/documentSymbol": ("documentSymbolProvider",),
+    "textDocument/codeAction": ("codeActionProvider",),
+    "textDocument/codeLens": ("codeLensProvider",),
+    "textDocument/documentLink": ("documentLinkProvider",),
+    "textDocument/documentColor": ("colorProvider",),
+    "textDocument/formatting": ("documentFormattingProvider",),
+    "textDocument/rangeFormatting": ("documentRangeFormattingProvider",),
+    "textDocument/onTypeFormatting": ("documentOnTypeFormattingProvider",),
+    "textDocument/rename": ("renameProvider",),
+    "textDocument/foldingRange": ("foldingRangeProvider",),
+    "textDocument/selectionRange": ("selectionRangeProvider",),
+    "textDocument/prepareCallHierarchy": ("callHierarchyProvider",),
+    "callHierarchy/incomingCalls": ("callHierarchyProvider",),
+    "callHierarchy/outgoingCalls": ("callHierarchyProvider",),
+    "textDocument/semanticTokens/full": ("semanticTokensProvider", "full"),
+    "textDocument/semanticTokens/full/delta": (
+        "semanticTokensProvider",
+        "full",
+        "delta",
+    ),
+    "textDocument/semanticTokens/range": ("semanticTokensProvider", "range"),
+    "textDocument/inlayHint": ("inlayHintProvider",),
+    "textDocument/diagnostic": ("diagnosticProvider",),
+    "workspace/diagnostic": ("diagnosticProvider", "workspaceDiagnostics"),
+    "workspace/symbol": ("workspaceSymbolProvider",),
+    "workspace/executeCommand": ("executeCommandProvider",),
+}
+
+# Some requests are registered dynamically under another method's name.
+_REGISTRATION_METHODS = {
+    "completionItem/resolve": "textDocument/completion",
+    "callHierarchy/incomingCalls": "textDocument/prepareCallHierarchy",
+    "callHierarchy/outgoingCalls": "textDocument/prepareCallHierarchy",
+    "textDocument/semanticTokens/full": "textDocument/semanticTokens",
+    "textDocument/semanticTokens/full/delta": "textDocument/semanticTokens",
+    "textDocument/semanticTokens/range": "textDocument/semanticTokens",
+}
+
+# How many results of CapabilityRegistry.supports() are remembered
+_SUPPORTS_CACHE_SIZE = 1024
+
+
+def _compile_glob(pattern: str) -> t.Pattern[str]:
+    """Compile a glob pattern of the LSP spec into a regex matching whole paths.
+
+    Supported syntax: `*` (within a path segment), `?`, `**` (any number of
+    path segments), `{a,b}` and `[a-z]` / `[!a-z]`."""
+    regex = []
+    brace_depth = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        i += 1
+        if char == "*":
+            if pattern.startswith("*", i):
+                i += 1
+                if pattern.startswith("/", i):
+                    i += 1
+                    regex.append("(?:.*/)?")
+                else:
+                    regex.append(".*")
+            else:
+                regex.append("[^/]*")
+        elif char == "?":
+            regex.append("[^/]")
+        elif char == "{":
+            brace_depth += 1
+            regex.append("(?:")
+        elif char == "}" and brace_depth > 0:
+            brace_depth -= 1
+            regex.append(")")
+        elif char == "," and brace_depth > 0:
+            regex.append("|")
+        elif char == "[":
+            end = pattern.find("]", i + 1)  # "[]]" contains "]"
+            if end == -1:
+                regex.append(re.escape(char))
+                continue
+            content = pattern[i:end]
+            i = end + 1
+            if content.startswith("!"):
+                content = "^" + content[1:]
+            regex.append("[" + content.replace("\\", "\\\\") + "]")
+        else:
+            regex.append(re.escape(char))
+    return re.compile("".join(regex) + r"\Z")
+
+
+def _uri_path(uri: str) -> str:
+    return urllib.parse.unquote(urllib.parse.urlparse(uri).path)
+
+
+class _DocumentFilter:
+    __slots__ = ("language", "scheme", "pattern")
+
+    def __init__(self, filter: JSONDict) -> None:
+        self.language: t.Optional[str] = filter.get("language")
+        self.scheme: t.Optional[str] = filter.get("scheme")
+        pattern = filter.get("pattern")
+        self.pattern = None if pattern is None else _compile_glob(pattern)
+
+    def matches(self, uri: str, language_id: t.Optional[str]) -> bool:
+        if self.language is not None and self.language != language_id:
+            return False
+        if self.scheme is not None and self.scheme != uri.partition(":")[0]:
+            return False
+        if self.pattern is not None and not self.pattern.match(_uri_path(uri)):
+            return False
+        return True
+
+
+# None means that the capability applies to all documents.
+_DocumentSelector = t.Optional[t.List[_DocumentFilter]]
+
+
+def _compile_document_selector(options: t.Any) -> _DocumentSelector:
+    if not isinstance(options, dict) or options.get("documentSelector") is None:
+        return None
+    return [_DocumentFilter(f) for f in options["documentSelector"]]
+
+
+def _selector_matches(
+    selector: _DocumentSelector, uri: t.Optional[str], language_id: t.Optional[str]
+) -> bool:
+    if selector is None or uri is None:
+        return True
+    return any(f.matches(uri, language_id) for f in selector)
+
+
+class CapabilityRegistry:
+    """
+    Keeps track of what a server supports, from both its static capabilities
+    and the capabilities it registers and unregisters dynamically.
+
+    The Client keeps one of these up to date, see `Client.supports()`.
+    """
+
+    def __init__(self) -> None:
+        # The document selector of every statically supported method.
+        self._static: t.Dict[str, _DocumentSelector] = {}
+        # Dynamic registrations by id, with their document selectors.
+        self._dynamic: t.Dict[str, t.Tuple[Registration, _DocumentSelector]] = {}
+        # Results of supports(), least recently used first. Every document
+        # gives new keys, so only the most recent ones are kept.
+        self._cache: t.OrderedDict[
+            t.Tuple[str, t.Optional[str], t.Optional[str]], bool
+        ] = collections.OrderedDict()
+
+    def set_server_capabilities(self, capabilities: JSONDict) -> None:
+        self._static.clear()
+        for method, path in _STATIC_CAPABILITIES.items():
+            value: t.Any = capabilities
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            # An empty dict of options also means "supported".
+            if value is not None and value is not False:
+                self._static[method] = _compile_document_selector(
+                    capabilities.get(path[0])
+                )
+        self._cache.clear()
+
+    def register(self, registrations: t.Iterable[Registration]) -> None:
+        for registration in registrations:
+            self._dynamic[registration.id] = (
+                registration,
+                _compile_document_selector(registration.registerOptions),
+            )
+        self._cache.clear()
+
+    def unregister(self, unregistrations: t.Iterable[Unregistration]) -> None:
+        for unregistration in unregistrations:
+            self._dynamic.pop(unregistration.id, None)
+        self._cache.clear()
+
+    def registrations(self, method: str) -> t.List[Registration]:
+        """The current dynamic registrations of a method."""
+        return [r for r, _ in self._dynamic.values() if r.method == method]
+
+    def supports(
+        self,
+        method: str,
+        uri: t.Optional[str] = None,
+        language_id: t.Optional[str] = None,
+    ) -> bool:
+        """
+        Whether the server supports `method`, for the document `uri` if given.
+
+        Methods that a server can't advertise (e.g. notifications) are always
+        considered supported. Results are cached until the capabilities
+        change.
+        """
+        key = (method, uri, language_id)
+        try:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        if method not in _STATIC_CAPABILITIES:
+            result = True
+        elif method in self._static and _selector_matches(
+            self._static[method], uri, language_id
+        ):
+            result = True
+        else:
+            registration_method = _REGISTRATION_METHODS.get(method, method)
+            result = any(
+                registration.method == registration_method
+                and _selector_matches(selector, uri, language_id)
+                for registration, selector in self._dynamic.values()
+            )
+
+        self._cache[key] = result
+        while len(self._cache) > _SUPPORTS_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
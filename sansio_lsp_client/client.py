@@ -1,29 +1,46 @@
+import collections
 import enum
+import json
+import pathlib
+import time
 import typing as t
 
 from pydantic import ValidationError, TypeAdapter
 
 from .events import (
+    CompactCompletion,
     Completion,
+    CompletionItemResolve,
     ConfigurationRequest,
     Declaration,
     Definition,
+    DiagnosticRefreshRequest,
+    DocumentDiagnostics,
     DocumentFormatting,
     Event,
     Hover,
     Implementation,
     Initialized,
     LogMessage,
+    MessageSkipped,
     MCallHierarchItems,
+    MCallHierarchyIncomingCalls,
+    MCallHierarchyOutgoingCalls,
     MDocumentSymbols,
     MFoldingRanges,
     MInlayHints,
     MWorkspaceSymbols,
     MethodResponse,
+    PartialResult,
     PublishDiagnostics,
+    RawEvent,
+    RawResponse,
+    RawServerNotification,
+    RawServerRequest,
     References,
     RegisterCapabilityRequest,
     ResponseError,
+    SemanticTokens,
     ServerNotification,
     ServerRequest,
     ShowMessage,
@@ -31,29 +48,63 @@ from .events import (
     Shutdown,
     SignatureHelp,
     TypeDefinition,
+    UnregisterCapabilityRequest,
     WillSaveWaitUntilEdits,
     WorkDoneProgressBegin,
     WorkDoneProgressCreate,
     WorkDoneProgressEnd,
     WorkDoneProgressReport,
+    WorkspaceDiagnostics,
     WorkspaceEdit,
     WorkspaceFolders,
     WorkspaceProjectInitializationComplete,
 )
-from .io_handler import _make_request, _make_response, _parse_messages
+from .capabilities import CapabilityRegistry
+from .compact_completion import CompactCompletionList
+from .diagnostics import _DiagnosticsDiffer
+from .io_handler import (
+    _LIST_RESPONSE_START_MAX_LENGTH,
+    _SkippedMessage,
+    _SpilledMessage,
+    _StreamedListResponse,
+    _coalesce_notifications,
+    _make_response,
+    _parse_headers,
+    _parse_one_raw_message,
+    _parse_request_or_response,
+    _start_streamed_list_response,
+    _streamed_if_long,
+    _write_did_open,
+    _write_request,
+)
+from .preload import PreloadProgress, _read_text
+from .progress import ProgressTracker
+from .response_cache import ResponseCache, _content_hash
+from .semantic_tokens import SemanticTokensData
+from .workspace_edit import apply_workspace_edit
 from .structs import (
+    CallHierarchyItem,
     CompletionContext,
     CompletionItem,
     CompletionItemKind,
     CompletionList,
+    Diagnostic,
+    DocumentDiagnosticReportKind,
+    DocumentSymbol,
+    FileEvent,
+    FileSystemWatcher,
     FormattingOptions,
     Id,
     JSONDict,
     JSONList,
+    Location,
     MWorkDoneProgressKind,
+    ProgressToken,
     Range,
+    Registration,
     Request,
     Response,
+    SymbolInformation,
     SymbolKind,
     TextDocumentContentChangeEvent,
     TextDocumentEdit,
@@ -62,11 +113,17 @@ from .structs import (
     TextDocumentPosition,
     TextDocumentSaveReason,
     TextEdit,
+    Unregistration,
     VersionedTextDocumentIdentifier,
+    WorkspaceDocumentDiagnosticReport,
     WorkspaceFolder,
 )
 
 
+class MessageTooLargeError(Exception):
+    """Raised by `Client.recv()` for messages bigger than `max_message_size`."""
+
+
 class ClientState(enum.Enum):
     NOT_INITIALIZED = enum.auto()
     WAITING_FOR_INITIALIZED = enum.auto()
@@ -85,9 +142,16 @@ CAPABILITIES: JSONDict = {
             #'willSave': True
         },
         "publishDiagnostics": {"relatedInformation": True},
+        "diagnostic": {"dynamicRegistration": True, "relatedDocumentSupport": False},
         "completion": {
             "dynamicRegistration": True,
-            "completionItem": {"snippetSupport": False},
+            "completionItem": {
+                "snippetSupport": False,
+                # Fetched with Client.resolve_completion_item() when needed
+                "resolveSupport": {
+                    "properties": ["documentation", "detail", "additionalTextEdits"]
+                },
+            },
             "completionItemKind": {"valueSet": list(CompletionItemKind)},
         },
         "hover": {
@@ -123,6 +187,50 @@ CAPABILITIES: JSONDict = {
             "dynamicRegistration": True,
             "symbolKind": {"valueSet": list(SymbolKind)},
         },
+        "semanticTokens": {
+            "dynamicRegistration": True,
+            "requests": {"range": True, "full": {"delta": True}},
+            "tokenTypes": [
+                "namespace",
+                "type",
+                "class",
+                "enum",
+                "interface",
+                "struct",
+                "typeParameter",
+                "parameter",
+                "variable",
+                "property",
+                "enumMember",
+                "event",
+                "function",
+                "method",
+                "macro",
+                "keyword",
+                "modifier",
+                "comment",
+                "string",
+                "number",
+                "regexp",
+                "operator",
+                "decorator",
+            ],
+            "tokenModifiers": [
+                "declaration",
+                "definition",
+                "readonly",
+                "static",
+                "deprecated",
+                "abstract",
+                "async",
+                "modification",
+                "documentation",
+                "defaultLibrary",
+            ],
+            "formats": ["relative"],
+            "overlappingTokenSupport": False,
+            "multilineTokenSupport": False,
+        },
     },
     "window": {
         "showMessage": {
@@ -139,9 +247,34 @@ CAPABILITIES: JSONDict = {
         # TODO 'workspaceEdit':..., #'applyEdit':..., 'executeCommand':...,
         "configuration": True,
         "didChangeConfiguration": {"dynamicRegistration": True},
+        "didChangeWatchedFiles": {
+            "dynamicRegistration": True,
+            "relativePatternSupport": True,
+        },
+        "diagnostics": {"refreshSupport": True},
     },
 }
 
+# Results used for requests that are skipped because the server doesn't
+# support them. Requests not listed here get a null result.
+_UNSUPPORTED_REQUEST_RESULTS: t.Dict[str, JSONDict] = {
+    "textDocument/diagnostic": {"kind": "full", "items": []},
+    "workspace/diagnostic": {"items": []},
+}
+
+
+# Types of the partial results of the requests that support them
+_PARTIAL_RESULT_TYPES: t.Dict[str, t.Any] = {
+    "textDocument/references": t.List[Location],
+    "workspace/symbol": t.List[SymbolInformation],
+    "textDocument/documentSymbol": t.Union[
+        t.List[SymbolInformation], t.List[DocumentSymbol]
+    ],
+}
+
+# Maximum number of items in a PartialResult of a streamed response
+_STREAMED_RESULT_BATCH_SIZE = 1000
+
 
 class Client:
     # TODO: Save the encoding given here.
@@ -151,9 +284,93 @@ class Client:
         root_uri: t.Optional[str] = None,
         workspace_folders: t.Optional[t.List[WorkspaceFolder]] = None,
         trace: str = "off",
+        publish_diagnostics: t.Literal["full", "delta", "both"] = "full",
+        coalesce_notifications: bool = False,
+        completion_resolve_cache_size: int = 256,
+        completion_format: t.Literal["model", "compact"] = "model",
+        progress_tracker: t.Optional[ProgressTracker] = None,
+        skip_unsupported_requests: bool = False,
+        stream_results_larger_than: t.Optional[int] = None,
+        max_message_size: t.Optional[int] = None,
+        oversized_messages: t.Literal["raise", "skip"] = "raise",
+        spill_messages_larger_than: t.Optional[int] = None,
+        response_cache: t.Optional[ResponseCache] = None,
+        validation: t.Literal["models", "raw"] = "models",
     ) -> None:
         self._state = ClientState.NOT_INITIALIZED
 
+        # With "raw", recv() yields RawEvents with the decoded JSON of the
+        # messages instead of validating them into models. The client still
+        # keeps track of requests, initializing, shutting down, capability
+        # registrations and the response cache, but nothing else from the
+        # responses (e.g. diagnostic result ids or semantic tokens for delta
+        # requests). See RawEvent for the events that raw mode never yields.
+        if validation == "raw" and stream_results_larger_than is not None:
+            raise ValueError("streamed results can't be used with validation='raw'")
+        self._validation = validation
+
+        # If given, responses to the requests in response_cache.methods are
+        # looked up before sending a request and saved when they arrive. The
+        # cache keys contain the server's name and version, which are known
+        # after initializing, and content hashes of the open documents. The
+        # hash is None after an incremental change, because the client
+        # doesn't have the new text.
+        self._response_cache = response_cache
+        self._server_identity: t.Optional[str] = None
+        self._document_hashes: t.Dict[str, t.Optional[str]] = {}
+        self._response_cache_keys: t.Dict[Id, str] = {}
+
+        # Messages with a bigger Content-Length are never kept in memory. Their
+        # content is discarded as it arrives, and recv() either raises
+        # MessageTooLargeError or yields a MessageSkipped event.
+        self._max_message_size = max_message_size
+        self._oversized_messages = oversized_messages
+
+        # If given, the content of messages with at least this many bytes is
+        # written to a temporary file while it arrives, instead of _recv_buf.
+        self._spill_messages_larger_than = spill_messages_larger_than
+
+        # If given, the list results of references, workspace/symbol and
+        # documentSymbol responses with at least this many bytes are decoded
+        # while they arrive. Each recv() then yields the items received so far
+        # as a PartialResult event, like with partial_results=True.
+        self._stream_results_larger_than = stream_results_larger_than
+
+        # The message being received, if it's received differently than by
+        # waiting for all of it in _recv_buf (see the options above).
+        self._incoming: t.Union[
+            None, _SkippedMessage, _SpilledMessage, _StreamedListResponse
+        ] = None
+
+        # If enabled, requests that the server doesn't support are not sent.
+        # Instead, an empty response event is created locally.
+        self._skip_unsupported_requests = skip_unsupported_requests
+
+        # If given, work done progress notifications are fed to this instead
+        # of being yielded as events.
+        self.progress_tracker = progress_tracker
+
+        # With "compact", completion responses become CompactCompletion
+        # events instead of Completion events.
+        self._completion_format = completion_format
+
+        # If enabled, notifications superseded by a later notification
+        # received in the same recv() call are dropped before validation.
+        self._coalesce_notifications = coalesce_notifications
+        # Frames that were taken out of _recv_buf for coalescing, but not
+        # handled yet because handling an earlier frame failed. The next
+        # recv() handles them first.
+        self._coalesced_frames: t.Deque[JSONDict] = collections.deque()
+        # Error from parsing the message after _coalesced_frames, raised once
+        # they are handled
+        self._coalescing_error: t.Optional[Exception] = None
+
+        # With "delta", PublishDiagnostics events are replaced by
+        # DiagnosticsDelta events. With "both", each PublishDiagnostics is
+        # followed by the corresponding DiagnosticsDelta.
+        self._publish_diagnostics = publish_diagnostics
+        self._diagnostics_differ = _DiagnosticsDiffer()
+
         # Used to save data as it comes in (from `recieve_bytes`) until we have
         # a full request.
         self._recv_buf = bytearray()
@@ -161,9 +378,49 @@ class Client:
         # Things that we still need to send.
         self._send_buf = bytearray()
 
+        # Events that were created without talking to the server, e.g. cached
+        # responses. They are yielded by the next recv() or drain_local().
+        self._local_events: t.Deque[t.Union[Event, RawEvent]] = collections.deque()
+
+        # Resolved completion items of the latest completion request, least
+        # recently used first.
+        self._resolved_completion_items: t.OrderedDict[str, CompletionItem] = (
+            collections.OrderedDict()
+        )
+        self._completion_resolve_cache_size = completion_resolve_cache_size
+
+        # What the server supports, and the languages of the open documents
+        # for matching document selectors.
+        self._capabilities = CapabilityRegistry()
+        self._document_languages: t.Dict[str, str] = {}
+        # The latest versions of the open documents
+        self._document_versions: t.Dict[str, int] = {}
+
         # Keeps track of which IDs match to which unanswered requests.
         self._unanswered_requests: t.Dict[Id, Request] = {}
 
+        # Pull diagnostics: the last report of every document, as its resultId
+        # and diagnostics. Sending back the resultId lets the server answer
+        # "unchanged" instead of sending the same diagnostics again.
+        self._diagnostic_reports: t.Dict[
+            str, t.Tuple[t.Optional[str], t.List[Diagnostic]]
+        ] = {}
+        # Documents that changed since their diagnostics were last pulled,
+        # and documents whose diagnostics are being pulled right now.
+        self._diagnostics_dirty: t.Set[str] = set()
+        self._diagnostics_in_flight: t.Set[str] = set()
+
+        # Semantic tokens of the whole document, by uri. Deltas are applied
+        # to these.
+        self._semantic_tokens: t.Dict[str, SemanticTokensData] = {}
+
+        # Requests sent with a partialResultToken: which request each token
+        # belongs to, and the token and number of partial results received
+        # for each request.
+        self._partial_result_tokens: t.Dict[ProgressToken, Id] = {}
+        self._partial_result_requests: t.Dict[Id, t.Tuple[ProgressToken, int]] = {}
+        self._partial_result_token_counter = 0
+
         # Just a simple counter to make sure we have unique IDs. We could make
         # sure that this fits into a JSONRPC Number, seeing as Python supports
         # bignums, but I think that's an unlikely enough case that checking for
@@ -191,6 +448,39 @@ class Client:
     def state(self) -> ClientState:
         return self._state
 
+    @property
+    def capabilities(self) -> CapabilityRegistry:
+        return self._capabilities
+
+    def supports(self, method: str, uri: t.Optional[str] = None) -> bool:
+        """
+        Whether the server supports a request, e.g. "textDocument/inlayHint",
+        for the document `uri` if given.
+
+        This considers the server's capabilities from the initialize response
+        and dynamic registrations. Documents opened with did_open() are also
+        matched against the languages in document selectors.
+        """
+        return self._capabilities.supports(
+            method, uri, self._document_languages.get(uri) if uri else None
+        )
+
+    @property
+    def file_watchers(self) -> t.List[FileSystemWatcher]:
+        """
+        The files that the server wants to hear about, from its
+        `workspace/didChangeWatchedFiles` registrations.
+
+        See `WatchedFilesBatcher` for a way to report changes to these files.
+        """
+        return [
+            FileSystemWatcher.model_validate(watcher)
+            for registration in self._capabilities.registrations(
+                "workspace/didChangeWatchedFiles"
+            )
+            for watcher in (registration.registerOptions or {}).get("watchers", [])
+        ]
+
     @property
     def is_initialized(self) -> bool:
         return (
@@ -198,18 +488,101 @@ class Client:
             and self._state != ClientState.WAITING_FOR_INITIALIZED
         )
 
-    def _send_request(self, method: str, params: t.Optional[JSONDict] = None) -> Id:
+    def document_version(self, uri: str) -> t.Optional[int]:
+        """The latest version of an open document, or None if it isn't open."""
+        return self._document_versions.get(uri)
+
+    def _next_id(self) -> Id:
         id: Id = self._id_counter
         self._id_counter += 1
+        return id
 
-        self._send_buf += _make_request(method=method, params=params, id=id)
+    def _should_skip_request(self, method: str, params: t.Optional[JSONDict]) -> bool:
+        if not self._skip_unsupported_requests:
+            return False
+        uri = None
+        if params is not None and isinstance(params.get("textDocument"), dict):
+            uri = params["textDocument"].get("uri")
+        return not self.supports(method, uri)
+
+    def _response_cache_key(
+        self, method: str, params: t.Optional[JSONDict]
+    ) -> t.Optional[str]:
+        if (
+            self._response_cache is None
+            or self._server_identity is None
+            or method not in self._response_cache.methods
+            or params is None
+            or not isinstance(params.get("textDocument"), dict)
+        ):
+            return None
+        content_hash = self._document_hashes.get(params["textDocument"].get("uri"))
+        if content_hash is None:
+            return None
+        params = {
+            key: value for key, value in params.items() if key != "partialResultToken"
+        }
+        return ResponseCache.key(self._server_identity, method, content_hash, params)
+
+    def _send_request(
+        self,
+        method: str,
+        params: t.Optional[JSONDict] = None,
+        partial_results: bool = False,
+    ) -> Id:
+        """
+        With `partial_results=True`, a partialResultToken is added to the
+        params if the request is sent to the server.
+        """
+        id = self._next_id()
+
+        cache_key = self._response_cache_key(method, params)
+        if cache_key is not None:
+            assert self._response_cache is not None
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                self._unanswered_requests[id] = Request(
+                    id=id, method=method, params=params
+                )
+                self._local_events.append(
+                    self._handle_local_response(id, json.loads(cached))
+                )
+                return id
+
+        if self._should_skip_request(method, params):
+            self._unanswered_requests[id] = Request(id=id, method=method, params=params)
+            result: t.Optional[JSONDict] = _UNSUPPORTED_REQUEST_RESULTS.get(method)
+            if method == "completionItem/resolve":
+                result = params  # nothing more to know about the item
+            self._local_events.append(self._handle_local_response(id, result))
+            return id
+
+        if partial_results:
+            assert params is not None
+            token = f"sansio-lsp-client-partial-{self._partial_result_token_counter}"
+            self._partial_result_token_counter += 1
+            params = {**params, "partialResultToken": token}
+            self._partial_result_tokens[token] = id
+            self._partial_result_requests[id] = (token, 0)
+
+        _write_request(self._send_buf, method=method, params=params, id=id)
         self._unanswered_requests[id] = Request(id=id, method=method, params=params)
+        if cache_key is not None:
+            self._response_cache_keys[id] = cache_key
         return id
 
+    def _forget_partial_results(self, id: Id) -> int:
+        """Returns the number of partial results received for the request."""
+        if id not in self._partial_result_requests:
+            return 0
+        token, count = self._partial_result_requests.pop(id)
+        del self._partial_result_tokens[token]
+        return count
+
     def _send_notification(
         self, method: str, params: t.Optional[JSONDict] = None
     ) -> None:
-        self._send_buf += _make_request(method=method, params=params)
+        _write_request(self._send_buf, method=method, params=params)
 
     def _send_response(
         self,
@@ -219,12 +592,37 @@ class Client:
     ) -> None:
         self._send_buf += _make_response(id=id, result=result, error=error)
 
+    def _set_initialize_result(
+        self,
+        capabilities: JSONDict,
+        server_name: t.Optional[str],
+        server_version: t.Optional[str],
+    ) -> None:
+        self._capabilities.set_server_capabilities(capabilities)
+        if server_name is not None:
+            self._server_identity = json.dumps([server_name, server_version])
+        self._state = ClientState.NORMAL
+
+    def _handle_local_response(self, id: Id, result: t.Any) -> t.Union[Event, RawEvent]:
+        if self._validation == "raw":
+            return self._handle_raw_response(id, result, None)
+        event = self._handle_response(Response(id=id, result=result))
+        assert event is not None  # only late diagnostics are ignored
+        return event
+
     # response from server
-    def _handle_response(self, response: Response) -> Event:
+    def _handle_response(self, response: Response) -> t.Optional[Event]:
         assert response.id is not None
         request = self._unanswered_requests.pop(response.id)
+        delivered_partial_results = self._forget_partial_results(response.id)
+        cache_key = self._response_cache_keys.pop(response.id, None)
 
         if response.error is not None:
+            if request.method == "textDocument/diagnostic":
+                # Try again on the next pull_diagnostics()
+                uri = self._diagnostic_request_uri(request)
+                self._diagnostics_in_flight.discard(uri)
+                self._diagnostics_dirty.add(uri)
             err = ResponseError.model_validate(response.error)
             err.message_id = response.id
             return err
@@ -238,13 +636,27 @@ class Client:
                     "initialized", params={}
                 )  # params=None doesn't work with gopls
                 event = Initialized.model_validate(response.result)
-                self._state = ClientState.NORMAL
+                server_info = event.serverInfo
+                self._set_initialize_result(
+                    event.capabilities,
+                    None if server_info is None else server_info.name,
+                    None if server_info is None else server_info.version,
+                )
 
             case "shutdown":
                 assert self._state == ClientState.WAITING_FOR_SHUTDOWN
                 event = Shutdown()
                 self._state = ClientState.SHUTDOWN
 
+            case "textDocument/completion" if self._completion_format == "compact":
+                event = CompactCompletion(
+                    completion_list=(
+                        None
+                        if response.result is None
+                        else CompactCompletionList.from_json(response.result)
+                    )
+                )
+
             case "textDocument/completion":
                 completion_list = None
 
@@ -267,6 +679,87 @@ class Client:
                     message_id=response.id, completion_list=completion_list
                 )
 
+            case "textDocument/diagnostic":
+                uri = self._diagnostic_request_uri(request)
+                self._diagnostics_in_flight.discard(uri)
+                assert isinstance(response.result, dict)
+                kind = DocumentDiagnosticReportKind(response.result["kind"])
+                result_id = response.result.get("resultId")
+                if kind == DocumentDiagnosticReportKind.UNCHANGED:
+                    previous = self._diagnostic_reports.get(uri)
+                    if previous is None:
+                        # The document was closed while the request was
+                        # waiting, and the diagnostics that didn't change
+                        # were forgotten.
+                        return None
+                    # Reuse the already validated diagnostics.
+                    items = previous[1]
+                else:
+                    items = TypeAdapter(t.List[Diagnostic]).validate_python(
+                        response.result["items"]
+                    )
+                # Not if the document was closed while the request was waiting
+                if uri in self._document_versions or uri in self._diagnostic_reports:
+                    self._diagnostic_reports[uri] = (result_id, items)
+                event = DocumentDiagnostics(
+                    uri=uri, kind=kind, result_id=result_id, items=items
+                )
+
+            case "completionItem/resolve":
+                assert isinstance(request.params, dict)
+                item = CompletionItem.model_validate(response.result)
+                self._cache_resolved_completion_item(request.params, item)
+                event = CompletionItemResolve(item=item)
+
+            case (
+                "textDocument/semanticTokens/full"
+                | "textDocument/semanticTokens/full/delta"
+            ):
+                assert isinstance(request.params, dict)
+                uri = request.params["textDocument"]["uri"]
+                tokens: t.Optional[SemanticTokensData]
+                if response.result is None:
+                    tokens = None
+                    self._semantic_tokens.pop(uri, None)
+                else:
+                    assert isinstance(response.result, dict)
+                    result_id = response.result.get("resultId")
+                    if "edits" in response.result:
+                        # The delta is relative to the tokens of the request's
+                        # previousResultId. They are gone if the document was
+                        # closed, or if another response replaced them while
+                        # this one was on its way.
+                        tokens = self._semantic_tokens.get(uri)
+                        if (
+                            tokens is not None
+                            and tokens.result_id == request.params["previousResultId"]
+                        ):
+                            tokens.apply_edits(response.result["edits"], result_id)
+                        else:
+                            tokens = None
+                    else:
+                        # Also for delta requests, if the server didn't
+                        # want to compute a delta.
+                        tokens = SemanticTokensData(response.result["data"], result_id)
+                        if uri in self._document_versions:
+                            self._semantic_tokens[uri] = tokens
+                event = SemanticTokens(uri=uri, tokens=tokens)
+
+            case "textDocument/semanticTokens/range":
+                assert isinstance(request.params, dict)
+                if response.result is None:
+                    tokens = None
+                else:
+                    assert isinstance(response.result, dict)
+                    tokens = SemanticTokensData(
+                        response.result["data"], response.result.get("resultId")
+                    )
+                event = SemanticTokens(
+                    uri=request.params["textDocument"]["uri"],
+                    tokens=tokens,
+                    range=Range.model_validate(request.params["range"]),
+                )
+
             case "textDocument/willSaveWaitUntil":
                 event = WillSaveWaitUntilEdits(
                     edits=TypeAdapter(t.List[TextEdit]).validate_python(response.result)
@@ -299,8 +792,9 @@ class Client:
                 )
 
             case "textDocument/inlayHint":
-                event = TypeAdapter(MInlayHints).validate_python(response)
-                event.message_id = response.id
+                event = TypeAdapter(MInlayHints).validate_python(
+                    {"result": response.result}
+                )
 
             case "textDocument/rename":
                 if response.result is not None and isinstance(response.result, dict):
@@ -349,6 +843,14 @@ class Client:
                 event = TypeAdapter(MCallHierarchItems).validate_python(
                     {"result": response.result}
                 )
+            case "callHierarchy/incomingCalls":
+                event = MCallHierarchyIncomingCalls.model_validate(
+                    {"result": response.result}
+                )
+            case "callHierarchy/outgoingCalls":
+                event = MCallHierarchyOutgoingCalls.model_validate(
+                    {"result": response.result}
+                )
 
             case "textDocument/formatting" | "textDocument/rangeFormatting":
                 event = TypeAdapter(DocumentFormatting).validate_python(
@@ -361,19 +863,53 @@ class Client:
                     {"result": response.result}
                 )
 
+            case "workspace/diagnostic":
+                assert isinstance(response.result, dict)
+                reports = []
+                for item in response.result["items"]:
+                    kind = DocumentDiagnosticReportKind(item["kind"])
+                    if kind == DocumentDiagnosticReportKind.UNCHANGED:
+                        items = self._diagnostic_reports.get(item["uri"], (None, []))[1]
+                        report = WorkspaceDocumentDiagnosticReport(
+                            uri=item["uri"],
+                            version=item.get("version"),
+                            kind=kind,
+                            resultId=item.get("resultId"),
+                        )
+                        # Assigned after validation, so that the cached
+                        # diagnostics aren't validated again.
+                        report.items = items
+                    else:
+                        report = WorkspaceDocumentDiagnosticReport.model_validate(item)
+                    self._diagnostic_reports[report.uri] = (
+                        report.resultId,
+                        report.items,
+                    )
+                    reports.append(report)
+                event = WorkspaceDiagnostics(reports=reports)
+
             case _:
                 raise NotImplementedError((response, request))
 
         if isinstance(event, MethodResponse):
             event.message_id = response.id
+        if isinstance(event, (References, MWorkspaceSymbols, MDocumentSymbols)):
+            event.delivered_partial_results = delivered_partial_results
+
+        # A response after partial results has only the rest of the result
+        if cache_key is not None and not delivered_partial_results:
+            assert self._response_cache is not None
+            self._response_cache.put(cache_key, json.dumps(response.result))
 
         return event
 
     # request from server
-    def _handle_request(self, request: Request) -> Event:
+    def _handle_request(self, request: Request) -> t.Optional[Event]:
         def parse_request(event_cls: t.Type[Event]) -> Event:
             if issubclass(event_cls, ServerRequest):
-                event = TypeAdapter(event_cls).validate_python(request.params)
+                event = TypeAdapter(event_cls).validate_python(
+                    request.params if request.params is not None else {}
+                )
                 assert request.id is not None
                 event._id = request.id
                 event._client = self
@@ -421,11 +957,36 @@ class Client:
             event = parse_request(WorkDoneProgressCreate)
             assert isinstance(event, WorkDoneProgressCreate)
             return event
+        elif request.method == "workspace/diagnostic/refresh":
+            self._diagnostics_dirty.update(self._diagnostic_reports)
+            event = parse_request(DiagnosticRefreshRequest)
+            assert isinstance(event, DiagnosticRefreshRequest)
+            return event
         elif request.method == "client/registerCapability":
             event = parse_request(RegisterCapabilityRequest)
             assert isinstance(event, RegisterCapabilityRequest)
+            self._capabilities.register(event.registrations)
+            return event
+        elif request.method == "client/unregisterCapability":
+            event = parse_request(UnregisterCapabilityRequest)
+            assert isinstance(event, UnregisterCapabilityRequest)
+            self._capabilities.unregister(event.unregisterations)
             return event
 
+        elif (
+            request.method == "$/progress"
+            and isinstance(request.params, dict)
+            and request.params.get("token") in self._partial_result_tokens
+        ):
+            id = self._partial_result_tokens[request.params["token"]]
+            method = self._unanswered_requests[id].method
+            result = TypeAdapter(_PARTIAL_RESULT_TYPES[method]).validate_python(
+                request.params["value"]
+            )
+            token, count = self._partial_result_requests[id]
+            self._partial_result_requests[id] = (token, count + 1)
+            return PartialResult(message_id=id, result=result)
+
         elif request.method == "$/progress":
             assert request.params is not None
             assert isinstance(
@@ -438,6 +999,11 @@ class Client:
             assert (
                 "kind" in request.params["value"]
             ), "Expected 'kind' in request.params['value']"
+            if self.progress_tracker is not None:
+                self.progress_tracker.feed_raw(
+                    request.params["token"], request.params["value"]
+                )
+                return None
             kind = MWorkDoneProgressKind(request.params["value"]["kind"])
             if kind == MWorkDoneProgressKind.BEGIN:
                 event = parse_request(WorkDoneProgressBegin)
@@ -457,20 +1023,291 @@ class Client:
         else:
             raise NotImplementedError(request)
 
-    def recv(self, data: bytes) -> t.Iterator[Event]:
+    def _handle_raw_response(
+        self, id: Id, result: t.Any, error: t.Optional[JSONDict]
+    ) -> RawResponse:
+        request = self._unanswered_requests.pop(id)
+        delivered_partial_results = self._forget_partial_results(id)
+        cache_key = self._response_cache_keys.pop(id, None)
+
+        if request.method == "textDocument/diagnostic":
+            uri = self._diagnostic_request_uri(request)
+            self._diagnostics_in_flight.discard(uri)
+            if error is not None:
+                self._diagnostics_dirty.add(uri)  # try again on the next pull
+        if error is None:
+            if request.method == "initialize":
+                assert self._state == ClientState.WAITING_FOR_INITIALIZED
+                self._send_notification("initialized", params={})
+                # Not validated like the rest of the result. Without a valid
+                # name, the server's responses just aren't cached.
+                server_info = result.get("serverInfo")
+                if not isinstance(server_info, dict):
+                    server_info = {}
+                name = server_info.get("name")
+                version = server_info.get("version")
+                self._set_initialize_result(
+                    result["capabilities"],
+                    name if isinstance(name, str) else None,
+                    version if isinstance(version, str) else None,
+                )
+            elif request.method == "shutdown":
+                assert self._state == ClientState.WAITING_FOR_SHUTDOWN
+                self._state = ClientState.SHUTDOWN
+            if cache_key is not None and not delivered_partial_results:
+                assert self._response_cache is not None
+                self._response_cache.put(cache_key, json.dumps(result))
+
+        return RawResponse(request.method, id, result, error)
+
+    def _handle_raw_message(self, message: JSONDict) -> t.Iterator[RawEvent]:
+        method = message.get("method")
+        if method is None:
+            yield self._handle_raw_response(
+                message["id"], message.get("result"), message.get("error")
+            )
+            return
+
+        params: t.Any = message.get("params")
+        if method == "client/registerCapability":
+            self._capabilities.register(
+                Registration(**registration) for registration in params["registrations"]
+            )
+        elif method == "client/unregisterCapability":
+            self._capabilities.unregister(
+                Unregistration(**unregistration)
+                # Misspelled in the spec
+                for unregistration in params["unregisterations"]
+            )
+        elif method == "$/progress":
+            id = self._partial_result_tokens.get(params["token"])
+            if id is not None:
+                token, count = self._partial_result_requests[id]
+                self._partial_result_requests[id] = (token, count + 1)
+            elif self.progress_tracker is not None:
+                self.progress_tracker.feed_raw(params["token"], params["value"])
+                return
+
+        if "id" in message:
+            yield RawServerRequest(method, message["id"], params, self)
+        else:
+            yield RawServerNotification(method, None, params)
+
+    def _handle_frames(
+        self, frames: t.Iterable[JSONDict]
+    ) -> t.Iterator[t.Union[Event, RawEvent]]:
+        if self._validation == "raw":
+            for frame in frames:
+                yield from self._handle_raw_message(frame)
+        else:
+            for message in map(_parse_request_or_response, frames):
+                yield from self._handle_message(message)
+
+    def drain_local(self) -> t.List[t.Union[Event, RawEvent]]:
+        """
+        Return the events that were created locally, without a server response,
+        e.g. for skipped requests (see `skip_unsupported_requests`).
+
+        These events are also yielded by the next call to recv(). Use this
+        method to get them without waiting for data from the server.
+        """
+        events = list(self._local_events)
+        self._local_events.clear()
+        return events
+
+    def recv(self, data: bytes) -> t.Iterator[t.Union[Event, RawEvent]]:
+        while self._local_events:
+            yield self._local_events.popleft()
+
         self._recv_buf += data
-        # Make sure to use lots of iterators, so that if one message fails to
-        # parse, the messages before it are yielded successfully before the
-        # error, and the messages after it are left in _recv_buf.
-        for message in _parse_messages(self._recv_buf):
-            if isinstance(message, Response):
-                yield self._handle_response(message)
+        if self._coalesced_frames or self._coalescing_error is not None:
+            # Left over from a recv() that failed, and they came before
+            # _incoming
+            yield from self._handle_frames(self._parse_coalesced_frames())
+
+        while True:
+            if self._incoming is not None:
+                yield from self._recv_incoming()
+                if self._incoming is not None:
+                    return  # the rest of it hasn't arrived yet
+
+            # Make sure to use lots of iterators, so that if one message fails
+            # to parse, the messages before it are yielded successfully before
+            # the error, and the messages after it are left in _recv_buf.
+            if self._coalesce_notifications:
+                frames = self._parse_coalesced_frames()
             else:
-                yield self._handle_request(message)
+                frames = self._parse_frames()
+
+            yield from self._handle_frames(frames)
+
+            if self._incoming is None:
+                return
+
+    def _parse_frames(self) -> t.Iterator[JSONDict]:
+        """Parse messages from _recv_buf until reaching one that shouldn't be
+        received into memory as a whole. That one becomes _incoming."""
+        while True:
+            headers = _parse_headers(self._recv_buf)
+            if headers is None:
+                return
+            content_start, encoding, content_length = headers
+
+            if (
+                self._max_message_size is not None
+                and content_length > self._max_message_size
+            ):
+                del self._recv_buf[:content_start]
+                self._incoming = _SkippedMessage(content_length)
+                if self._oversized_messages == "raise":
+                    # The rest of the message will be skipped, so that the
+                    # next recv() doesn't fail again.
+                    raise MessageTooLargeError(
+                        f"Content-Length {content_length} exceeds the maximum"
+                        f" message size {self._max_message_size}"
+                    )
+                return
+
+            if (
+                self._stream_results_larger_than is not None
+                and content_length >= self._stream_results_larger_than
+            ):
+                self._incoming = _start_streamed_list_response(
+                    self._recv_buf,
+                    self._stream_results_larger_than,
+                    self._is_list_response,
+                )
+                if self._incoming is not None:
+                    return
+                received = len(self._recv_buf) - content_start
+                if received < min(content_length, _LIST_RESPONSE_START_MAX_LENGTH):
+                    return  # can't tell yet whether it's a list response
+
+            if (
+                self._spill_messages_larger_than is not None
+                and content_length >= self._spill_messages_larger_than
+            ):
+                del self._recv_buf[:content_start]
+                self._incoming = _SpilledMessage(encoding, content_length)
+                return
+
+            frames = _parse_one_raw_message(self._recv_buf)
+            if frames is None:
+                return
+            yield from frames
+
+    def _parse_coalesced_frames(self) -> t.Iterator[JSONDict]:
+        # Coalescing needs to see all the frames before handling any of them.
+        # If a message fails to parse, the frames before it are still handled
+        # before the error. If handling a frame fails, the frames after it
+        # stay in _coalesced_frames.
+        frames = list(self._coalesced_frames)
+        self._coalesced_frames.clear()
+        if self._coalescing_error is None and self._incoming is None:
+            try:
+                frames.extend(self._parse_frames())
+            except Exception as e:
+                self._coalescing_error = e
+        self._coalesced_frames.extend(_coalesce_notifications(frames))
+
+        while self._coalesced_frames:
+            yield self._coalesced_frames.popleft()
+        error, self._coalescing_error = self._coalescing_error, None
+        if error is not None:
+            raise error
+
+    def _is_list_response(self, id: Id) -> bool:
+        request = self._unanswered_requests.get(id)
+        return request is not None and request.method in _PARTIAL_RESULT_TYPES
+
+    def _recv_incoming(self) -> t.Iterator[t.Union[Event, RawEvent]]:
+        incoming = self._incoming
+        if isinstance(incoming, _StreamedListResponse):
+            yield from self._recv_streamed_response(incoming)
+
+        elif isinstance(incoming, _SpilledMessage):
+            try:
+                frames = incoming.feed(self._recv_buf)
+            except Exception:
+                self._incoming = None
+                raise
+            if frames is not None:
+                self._incoming = None
+                yield from self._handle_frames(frames)
+
+        elif isinstance(incoming, _SkippedMessage):
+            incoming.feed(self._recv_buf)
+            if incoming.done:
+                self._incoming = None
+                id = incoming.response_id
+                if id in self._unanswered_requests:
+                    # The response will never come
+                    del self._unanswered_requests[id]
+                    self._forget_partial_results(id)
+                    self._response_cache_keys.pop(id, None)
+                yield MessageSkipped(
+                    content_length=incoming.content_length, message_id=id
+                )
+
+    def _recv_streamed_response(
+        self, streamed: _StreamedListResponse
+    ) -> t.Iterator[Event]:
+        try:
+            items = streamed.feed(self._recv_buf)
+        except Exception:
+            # Don't get stuck with a broken response
+            self._incoming = None
+            self._unanswered_requests.pop(streamed.id, None)
+            self._forget_partial_results(streamed.id)
+            self._response_cache_keys.pop(streamed.id, None)
+            raise
+
+        method = self._unanswered_requests[streamed.id].method
+        adapter = TypeAdapter(_PARTIAL_RESULT_TYPES[method])
+        for start in range(0, len(items), _STREAMED_RESULT_BATCH_SIZE):
+            streamed.batches += 1
+            yield PartialResult(
+                message_id=streamed.id,
+                result=adapter.validate_python(
+                    items[start : start + _STREAMED_RESULT_BATCH_SIZE]
+                ),
+            )
+
+        if streamed.done:
+            self._incoming = None
+            # The items were all delivered as partial results, so there's no
+            # result to cache.
+            self._response_cache_keys.pop(streamed.id, None)
+            event = self._handle_response(Response(id=streamed.id, result=[]))
+            assert isinstance(event, (References, MWorkspaceSymbols, MDocumentSymbols))
+            event.delivered_partial_results += streamed.batches
+            yield event
+
+    def _handle_message(self, message: t.Union[Request, Response]) -> t.Iterator[Event]:
+        if isinstance(message, Response):
+            event = self._handle_response(message)
+            if event is not None:
+                yield event
+            return
+
+        event = self._handle_request(message)
+        if event is None:
+            return
+        if (
+            isinstance(event, PublishDiagnostics)
+            and self._publish_diagnostics != "full"
+        ):
+            delta = self._diagnostics_differ.diff(event)
+            if self._publish_diagnostics == "both":
+                yield event
+            yield delta
+        else:
+            yield event
 
     def send(self) -> bytes:
-        send_buf = self._send_buf[:]
-        self._send_buf.clear()
+        # Hand over the buffer instead of copying it, it can be huge
+        send_buf = self._send_buf
+        self._send_buf = bytearray()
         return send_buf
 
     def shutdown(self) -> None:
@@ -491,25 +1328,153 @@ class Client:
 
     def did_open(self, text_document: TextDocumentItem) -> None:
         assert self._state == ClientState.NORMAL
-        self._send_notification(
-            method="textDocument/didOpen",
-            params={"textDocument": text_document.model_dump()},
+        self._diagnostics_dirty.add(text_document.uri)
+        self._document_languages[text_document.uri] = text_document.languageId
+        self._document_versions[text_document.uri] = text_document.version
+        if self._response_cache is not None:
+            self._document_hashes[text_document.uri] = _content_hash(text_document.text)
+        _write_did_open(
+            self._send_buf,
+            text_document.uri,
+            text_document.languageId,
+            text_document.version,
+            text_document.text,
         )
 
+    def preload_documents(
+        self,
+        paths: t.Sequence[str],
+        language_id: t.Union[str, t.Callable[[str], str]],
+        max_unflushed_bytes: int = 4 * 1024 * 1024,
+    ) -> t.Iterator[PreloadProgress]:
+        """
+        Open many files at once, e.g. to warm up the server for a project.
+
+        `language_id` is the languageId of all files, or a function that
+        returns it for a path. The files are memory-mapped and their didOpen
+        notifications are written directly to the send buffer. Whenever the
+        unsent data reaches `max_unflushed_bytes`, this generator pauses and
+        yields the progress so far. Send the data with `send()` before
+        resuming it::
+
+            for progress in client.preload_documents(paths, "python"):
+                sock.sendall(client.send())
+            print(f"{progress.files_per_second:.0f} files/s")
+
+        The final progress is yielded after all files have been opened.
+        """
+        assert self._state == ClientState.NORMAL
+        start = time.perf_counter()
+        opened = 0
+        written = 0
+        failed: t.List[t.Tuple[str, Exception]] = []
+
+        def progress() -> PreloadProgress:
+            return PreloadProgress(
+                files=opened,
+                total_files=len(paths),
+                bytes=written,
+                seconds=time.perf_counter() - start,
+                failed=failed,
+            )
+
+        for path in paths:
+            if len(self._send_buf) >= max_unflushed_bytes:
+                yield progress()
+
+            try:
+                text = _read_text(path)
+            except (OSError, UnicodeDecodeError) as e:
+                failed.append((path, e))
+                continue
+            uri = pathlib.Path(path).absolute().as_uri()
+            language = (
+                language_id if isinstance(language_id, str) else language_id(path)
+            )
+
+            self._diagnostics_dirty.add(uri)
+            self._document_languages[uri] = language
+            self._document_versions[uri] = 0
+            if self._response_cache is not None:
+                self._document_hashes[uri] = _content_hash(text)
+            written += _write_did_open(self._send_buf, uri, language, 0, text)
+            opened += 1
+
+        yield progress()
+
     def did_change(
         self,
         text_document: VersionedTextDocumentIdentifier,
         content_changes: t.List[TextDocumentContentChangeEvent],
     ) -> None:
         assert self._state == ClientState.NORMAL
+        self._diagnostics_dirty.add(text_document.uri)
+        if text_document.version is not None:
+            self._document_versions[text_document.uri] = text_document.version
+        if self._response_cache is not None:
+            last_change = content_changes[-1] if content_changes else None
+            if last_change is not None and last_change.range is None:
+                # The last change replaces the whole text
+                self._document_hashes[text_document.uri] = _content_hash(
+                    last_change.text
+                )
+            elif content_changes:
+                self._document_hashes[text_document.uri] = None
         self._send_notification(
             method="textDocument/didChange",
             params={
                 "textDocument": text_document.model_dump(),
-                "contentChanges": [evt.model_dump() for evt in content_changes],
+                "contentChanges": [
+                    {**evt.model_dump(), "text": _streamed_if_long(evt.text)}
+                    for evt in content_changes
+                ],
             },
         )
 
+    def apply_workspace_edit(
+        self,
+        edit: WorkspaceEdit,
+        get_text: t.Callable[[str], str],
+        max_workers: t.Optional[int] = None,
+    ) -> t.Dict[str, str]:
+        """
+        Apply a workspace edit, e.g. from a rename() response.
+
+        The new texts are computed with `apply_workspace_edit()` (see there
+        for `get_text` and `max_workers`) and returned by uri. Writing them
+        to files or editor buffers is up to the caller. For every document
+        that is open, a didChange notification with the new text and the
+        next version number is sent, so later did_change() calls must
+        continue from that version.
+
+        Raises ValueError if the edit was made for a different version of an
+        open document than the latest one.
+        """
+        assert self._state == ClientState.NORMAL
+        for document_edit in edit.documentChanges or []:
+            uri = document_edit.textDocument.uri
+            version = document_edit.textDocument.version
+            if (
+                version is not None
+                and uri in self._document_versions
+                and self._document_versions[uri] != version
+            ):
+                raise ValueError(
+                    f"the edit is for version {version} of {uri}, but the"
+                    f" latest version is {self._document_versions[uri]}"
+                )
+
+        texts = apply_workspace_edit(edit, get_text, max_workers)
+        for uri, text in texts.items():
+            if uri in self._document_versions:
+                self.did_change(
+                    VersionedTextDocumentIdentifier(
+                        uri=uri, version=self._document_versions[uri] + 1
+                    ),
+                    [TextDocumentContentChangeEvent.whole_document_change(text)],
+                )
+        return texts
+
     def did_change_configuration(self, settings: t.Any) -> None:
         assert self._state == ClientState.NORMAL
         self._send_notification(
@@ -540,11 +1505,18 @@ class Client:
         assert self._state == ClientState.NORMAL
         params: t.Dict[str, t.Any] = {"textDocument": text_document.model_dump()}
         if text is not None:
-            params["text"] = text
+            params["text"] = _streamed_if_long(text)
         self._send_notification(method="textDocument/didSave", params=params)
 
     def did_close(self, text_document: TextDocumentIdentifier) -> None:
         assert self._state == ClientState.NORMAL
+        self._diagnostic_reports.pop(text_document.uri, None)
+        self._diagnostics_dirty.discard(text_document.uri)
+        self._diagnostics_in_flight.discard(text_document.uri)
+        self._semantic_tokens.pop(text_document.uri, None)
+        self._document_languages.pop(text_document.uri, None)
+        self._document_versions.pop(text_document.uri, None)
+        self._document_hashes.pop(text_document.uri, None)
         self._send_notification(
             method="textDocument/didClose",
             params={"textDocument": text_document.model_dump()},
@@ -562,6 +1534,13 @@ class Client:
             method="workspace/didChangeWorkspaceFolders", params=params
         )
 
+    def did_change_watched_files(self, changes: t.List[FileEvent]) -> None:
+        assert self._state == ClientState.NORMAL
+        self._send_notification(
+            method="workspace/didChangeWatchedFiles",
+            params={"changes": [change.model_dump() for change in changes]},
+        )
+
     def completion(
         self,
         text_document_position: TextDocumentPosition,
@@ -572,8 +1551,44 @@ class Client:
         params.update(text_document_position.model_dump())
         if context is not None:
             params.update(context.model_dump())
+        # Resolving depends on the context of the completion request, e.g.
+        # the edits to add an import.
+        self._resolved_completion_items.clear()
         return self._send_request(method="textDocument/completion", params=params)
 
+    @staticmethod
+    def _completion_item_cache_key(item: JSONDict) -> str:
+        return json.dumps([item.get("label"), item.get("data")], sort_keys=True)
+
+    def _cache_resolved_completion_item(
+        self, params: JSONDict, item: CompletionItem
+    ) -> None:
+        cache = self._resolved_completion_items
+        cache[self._completion_item_cache_key(params)] = item
+        while len(cache) > self._completion_resolve_cache_size:
+            cache.popitem(last=False)
+
+    def resolve_completion_item(self, item: CompletionItem) -> Id:
+        """
+        Ask the server for the missing details of a completion item, such as
+        its documentation.
+
+        Items that were already resolved since the latest completion request
+        are not sent to the server again. Instead, the CompletionItemResolve
+        event is yielded by the next recv() or drain_local().
+        """
+        assert self._state == ClientState.NORMAL
+        params = item.model_dump(mode="json", exclude_none=True)
+        cache_key = self._completion_item_cache_key(params)
+        resolved = self._resolved_completion_items.get(cache_key)
+        if resolved is None:
+            return self._send_request(method="completionItem/resolve", params=params)
+
+        self._resolved_completion_items.move_to_end(cache_key)
+        id = self._next_id()
+        self._local_events.append(CompletionItemResolve(message_id=id, item=resolved))
+        return id
+
     def rename(
         self,
         text_document_position: TextDocumentPosition,
@@ -635,22 +1650,53 @@ class Client:
             params=text_document_position.model_dump(),
         )
 
-    def references(self, text_document_position: TextDocumentPosition) -> Id:
+    def references(
+        self,
+        text_document_position: TextDocumentPosition,
+        partial_results: bool = False,
+    ) -> Id:
+        """
+        Find references to a symbol.
+
+        With `partial_results=True`, the server may send the references in
+        parts as PartialResult events before the final References event.
+        """
         assert self._state == ClientState.NORMAL
         params = {
             "context": {"includeDeclaration": True},
             **text_document_position.model_dump(),
         }
-        return self._send_request(method="textDocument/references", params=params)
+        return self._send_request(
+            method="textDocument/references",
+            params=params,
+            partial_results=partial_results,
+        )
 
-    # TODO incomplete
     def prepareCallHierarchy(self, text_document_position: TextDocumentPosition) -> Id:
+        """
+        Find the call hierarchy items at a position. Pass them to
+        incoming_calls() and outgoing_calls(), or see CallHierarchyExpander.
+        """
         assert self._state == ClientState.NORMAL
         return self._send_request(
             method="textDocument/prepareCallHierarchy",
             params=text_document_position.model_dump(),
         )
 
+    def incoming_calls(self, item: CallHierarchyItem) -> Id:
+        assert self._state == ClientState.NORMAL
+        return self._send_request(
+            method="callHierarchy/incomingCalls",
+            params={"item": item.model_dump(exclude_unset=True)},
+        )
+
+    def outgoing_calls(self, item: CallHierarchyItem) -> Id:
+        assert self._state == ClientState.NORMAL
+        return self._send_request(
+            method="callHierarchy/outgoingCalls",
+            params={"item": item.model_dump(exclude_unset=True)},
+        )
+
     def implementation(self, text_document_position: TextDocumentPosition) -> Id:
         assert self._state == ClientState.NORMAL
         return self._send_request(
@@ -658,15 +1704,63 @@ class Client:
             params=text_document_position.model_dump(),
         )
 
-    def workspace_symbol(self, query: str = "") -> Id:
+    def semantic_tokens_full(self, text_document: TextDocumentIdentifier) -> Id:
+        assert self._state == ClientState.NORMAL
+        return self._send_request(
+            method="textDocument/semanticTokens/full",
+            params={"textDocument": text_document.model_dump()},
+        )
+
+    def semantic_tokens_full_delta(self, text_document: TextDocumentIdentifier) -> Id:
+        """
+        Request the changes to the semantic tokens since the previous response.
+
+        If there is no previous response for the document, this requests all
+        tokens instead.
+        """
+        assert self._state == ClientState.NORMAL
+        previous = self._semantic_tokens.get(text_document.uri)
+        if previous is None or previous.result_id is None:
+            return self.semantic_tokens_full(text_document)
+        return self._send_request(
+            method="textDocument/semanticTokens/full/delta",
+            params={
+                "textDocument": text_document.model_dump(),
+                "previousResultId": previous.result_id,
+            },
+        )
+
+    def semantic_tokens_range(
+        self, text_document: TextDocumentIdentifier, range: Range
+    ) -> Id:
+        assert self._state == ClientState.NORMAL
+        return self._send_request(
+            method="textDocument/semanticTokens/range",
+            params={
+                "textDocument": text_document.model_dump(),
+                "range": range.model_dump(),
+            },
+        )
+
+    def workspace_symbol(self, query: str = "", partial_results: bool = False) -> Id:
+        """See references() for `partial_results`."""
         assert self._state == ClientState.NORMAL
-        return self._send_request(method="workspace/symbol", params={"query": query})
+        return self._send_request(
+            method="workspace/symbol",
+            params={"query": query},
+            partial_results=partial_results,
+        )
 
-    def documentSymbol(self, text_document: TextDocumentIdentifier) -> Id:
+    def documentSymbol(
+        self, text_document: TextDocumentIdentifier, partial_results: bool = False
+    ) -> Id:
+        """See references() for `partial_results`."""
         assert self._state == ClientState.NORMAL
+        params = {"textDocument": text_document.model_dump()}
         return self._send_request(
             method="textDocument/documentSymbol",
-            params={"textDocument": text_document.model_dump()},
+            params=params,
+            partial_results=partial_results,
         )
 
     def formatting(
@@ -692,3 +1786,63 @@ class Client:
             "options": options.model_dump(),
         }
         return self._send_request(method="textDocument/rangeFormatting", params=params)
+
+    @staticmethod
+    def _diagnostic_request_uri(request: Request) -> str:
+        assert isinstance(request.params, dict)
+        uri: str = request.params["textDocument"]["uri"]
+        return uri
+
+    def document_diagnostic(
+        self,
+        text_document: TextDocumentIdentifier,
+        identifier: t.Optional[str] = None,
+    ) -> Id:
+        """
+        Pull the diagnostics of a document (LSP 3.17).
+
+        If the document is closed before the response arrives, the response
+        isn't remembered, and an "unchanged" response yields no event.
+        """
+        assert self._state == ClientState.NORMAL
+        params: JSONDict = {"textDocument": text_document.model_dump()}
+        if identifier is not None:
+            params["identifier"] = identifier
+        previous = self._diagnostic_reports.get(text_document.uri)
+        if previous is not None and previous[0] is not None:
+            params["previousResultId"] = previous[0]
+        self._diagnostics_dirty.discard(text_document.uri)
+        self._diagnostics_in_flight.add(text_document.uri)
+        return self._send_request(method="textDocument/diagnostic", params=params)
+
+    def workspace_diagnostic(self, identifier: t.Optional[str] = None) -> Id:
+        """Pull the diagnostics of the whole workspace (LSP 3.17)."""
+        assert self._state == ClientState.NORMAL
+        params: JSONDict = {
+            "previousResultIds": [
+                {"uri": uri, "value": result_id}
+                for uri, (result_id, _) in self._diagnostic_reports.items()
+                if result_id is not None
+            ]
+        }
+        if identifier is not None:
+            params["identifier"] = identifier
+        return self._send_request(method="workspace/diagnostic", params=params)
+
+    def pull_diagnostics(self, visible_uris: t.Iterable[str]) -> t.List[Id]:
+        """
+        Pull the diagnostics of the visible documents that need it.
+
+        A document is pulled if it was opened, changed or refreshed by the
+        server since its last pull, and isn't being pulled already. Call this
+        e.g. after edits or scrolling to another file; documents that aren't
+        visible are pulled once they become visible.
+        """
+        ids = []
+        for uri in visible_uris:
+            if (
+                uri in self._diagnostics_dirty
+                and uri not in self._diagnostics_in_flight
+            ):
+                ids.append(self.document_diagnostic(TextDocumentIdentifier(uri=uri)))
+        return ids
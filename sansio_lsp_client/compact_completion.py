@@ -0,0 +1,156 @@
+import array
+import sys
+import typing as t
+
+from .structs import CompletionItem, CompletionItemKind, InsertTextFormat, JSONDict
+
+# These fields are stored in parallel arrays, everything else is kept as
+# JSON until an item is materialized.
+_COLUMN_FIELDS = frozenset(
+    ["label", "kind", "sortText", "filterText", "insertText", "insertTextFormat"]
+)
+
+
+def _intern(value: t.Any) -> t.Optional[str]:
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"expected a string, got {value!r}")
+    return sys.intern(value)
+
+
+class CompactCompletionItem:
+    """
+    A view of one item in a CompactCompletionList.
+
+    It has the most commonly needed attributes of a CompletionItem. Use
+    `materialize()` to get a full CompletionItem.
+    """
+
+    __slots__ = ("_list", "_index")
+
+    def __init__(self, completion_list: "CompactCompletionList", index: int) -> None:
+        self._list = completion_list
+        self._index = index
+
+    def __repr__(self) -> str:
+        return f"<CompactCompletionItem {self.label!r}>"
+
+    @property
+    def label(self) -> str:
+        return self._list._labels[self._index]
+
+    @property
+    def kind(self) -> t.Optional[CompletionItemKind]:
+        kind = self._list._kinds[self._index]
+        return CompletionItemKind(kind) if kind else None
+
+    @property
+    def sortText(self) -> t.Optional[str]:
+        return self._list._sort_texts[self._index]
+
+    @property
+    def filterText(self) -> t.Optional[str]:
+        return self._list._filter_texts[self._index]
+
+    @property
+    def insertText(self) -> t.Optional[str]:
+        return self._list._insert_texts[self._index]
+
+    @property
+    def insertTextFormat(self) -> t.Optional[InsertTextFormat]:
+        insert_text_format = self._list._insert_text_formats[self._index]
+        return InsertTextFormat(insert_text_format) if insert_text_format else None
+
+    def materialize(self) -> CompletionItem:
+        return self._list.materialize(self._index)
+
+
+class CompactCompletionList(t.Sequence[CompactCompletionItem]):
+    """
+    A memory-efficient alternative to CompletionList for huge completion
+    results, used by clients created with `completion_format="compact"`.
+
+    Strings are interned and stored in parallel lists, kinds and insert text
+    formats in byte arrays. The remaining fields of every item are kept as
+    JSON, and are validated only when an item is materialized into a
+    CompletionItem.
+    """
+
+    def __init__(self, isIncomplete: bool, items: t.List[JSONDict]) -> None:
+        self.isIncomplete = isIncomplete
+
+        count = len(items)
+        self._labels: t.List[str] = [""] * count
+        # 0 means "not given", it isn't a valid kind or format.
+        self._kinds = array.array("B", bytes(count))
+        self._insert_text_formats = array.array("B", bytes(count))
+        self._sort_texts: t.List[t.Optional[str]] = [None] * count
+        self._filter_texts: t.List[t.Optional[str]] = [None] * count
+        self._insert_texts: t.List[t.Optional[str]] = [None] * count
+        self._rest: t.List[t.Optional[JSONDict]] = [None] * count
+
+        for index, item in enumerate(items):
+            label = _intern(item["label"])
+            assert label is not None
+            self._labels[index] = label
+            self._kinds[index] = item.get("kind") or 0
+            self._insert_text_formats[index] = item.get("insertTextFormat") or 0
+            self._sort_texts[index] = _intern(item.get("sortText"))
+            self._filter_texts[index] = _intern(item.get("filterText"))
+            self._insert_texts[index] = _intern(item.get("insertText"))
+            if not _COLUMN_FIELDS.issuperset(item):
+                self._rest[index] = {
+                    key: value
+                    for key, value in item.items()
+                    if key not in _COLUMN_FIELDS
+                }
+
+    @classmethod
+    def from_json(
+        cls, result: t.Union[JSONDict, t.List[JSONDict]]
+    ) -> "CompactCompletionList":
+        """Create from the result of a textDocument/completion request."""
+        if isinstance(result, list):
+            return cls(isIncomplete=False, items=result)
+        return cls(isIncomplete=bool(result["isIncomplete"]), items=result["items"])
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    @t.overload
+    def __getitem__(self, index: int) -> CompactCompletionItem: ...
+
+    @t.overload
+    def __getitem__(self, index: slice) -> t.List[CompactCompletionItem]: ...
+
+    def __getitem__(
+        self, index: t.Union[int, slice]
+    ) -> t.Union[CompactCompletionItem, t.List[CompactCompletionItem]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return CompactCompletionItem(self, index)
+
+    @property
+    def items(self) -> "CompactCompletionList":
+        # For compatibility with code written for CompletionList
+        return self
+
+    def materialize(self, index: int) -> CompletionItem:
+        """Create a full CompletionItem for the item at `index`."""
+        data: JSONDict = dict(self._rest[index] or {})
+        data["label"] = self._labels[index]
+        for key, value in [
+            ("kind", self._kinds[index]),
+            ("insertTextFormat", self._insert_text_formats[index]),
+            ("sortText", self._sort_texts[index]),
+            ("filterText", self._filter_texts[index]),
+            ("insertText", self._insert_texts[index]),
+        ]:
+            if value is not None and value != 0:
+                data[key] = value
+        return CompletionItem.model_validate(data)
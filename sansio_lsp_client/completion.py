@@ -0,0 +1,128 @@
+import typing as t
+
+from .compact_completion import CompactCompletionItem
+from .events import CompactCompletion, Completion
+from .structs import CompletionItem
+
+_Item = t.Union[CompletionItem, CompactCompletionItem]
+
+# Bonuses used by _fuzzy_score. Matching the start of the candidate matters
+# most, then runs of consecutive characters and the starts of words.
+_SCORE_MATCH = 1
+_SCORE_SAME_CASE = 1
+_SCORE_CONSECUTIVE = 11
+_SCORE_WORD_START = 10
+_SCORE_FIRST_CHAR = 15
+_PENALTY_GAP = 1
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _fuzzy_score(
+    query: str, query_lower: str, text: str, text_lower: str
+) -> t.Optional[int]:
+    """Score how well `query` matches `text` as a subsequence.
+
+    Returns None if the characters of `query` don't all appear in `text` in
+    order, and a larger number for better matches otherwise. Matching is
+    case-insensitive, but matching case gives a small bonus."""
+    score = 0
+    text_index = 0
+    previous_match = -2
+    for query_char, query_char_lower in zip(query, query_lower):
+        found = text_lower.find(query_char_lower, text_index)
+        if found == -1:
+            return None
+
+        score += _SCORE_MATCH
+        if text[found] == query_char:
+            score += _SCORE_SAME_CASE
+        if found == 0:
+            score += _SCORE_FIRST_CHAR
+        elif found == previous_match + 1:
+            score += _SCORE_CONSECUTIVE
+        elif not text[found - 1].isalnum() or (
+            text[found - 1].islower() and text[found].isupper()
+        ):
+            score += _SCORE_WORD_START
+        else:
+            score -= _PENALTY_GAP * (found - text_index)
+
+        previous_match = found
+        text_index = found + 1
+    return score
+
+
+class _IndexedItem:
+    __slots__ = ("item", "text", "lower", "chars", "sort_text")
+
+    def __init__(self, item: _Item) -> None:
+        self.item = item
+        self.text = item.filterText or item.label
+        self.lower = self.text.lower()
+        # Lets most non-matching items be rejected with a set comparison.
+        self.chars = frozenset(self.lower)
+        self.sort_text = item.sortText or item.label
+
+
+class CompletionSession:
+    """
+    Filters and ranks the result of a completion request while the user types.
+
+    Create a session from the `Completion` (or `CompactCompletion`) event and
+    the word that was being completed when the request was sent, then call
+    `filter()` with the updated word on every keystroke. `filter()` returns
+    None when the items can't be filtered locally, and a new completion
+    request should be sent to the server (the list was incomplete, or the
+    user left the word).
+    """
+
+    def __init__(
+        self, completion: t.Union[Completion, CompactCompletion], prefix: str = ""
+    ) -> None:
+        self.completion = completion
+        self.prefix = prefix
+
+        completion_list = completion.completion_list
+        self.is_incomplete = completion_list is None or completion_list.isIncomplete
+        items = [] if completion_list is None else completion_list.items
+        self._items = [_IndexedItem(item) for item in items]
+
+        # Typing more characters can only remove matches, so the candidates
+        # of the previous query are filtered instead of all items.
+        self._last_query: t.Optional[str] = None
+        self._last_candidates = self._items
+
+    def needs_requery(self, prefix: str) -> bool:
+        return (
+            self.is_incomplete
+            or not prefix.startswith(self.prefix)
+            or not all(map(_is_word_char, prefix))
+        )
+
+    def filter(self, prefix: str) -> t.Optional[t.List[_Item]]:
+        """Items matching `prefix`, best first, or None to ask the server."""
+        if self.needs_requery(prefix):
+            return None
+
+        if self._last_query is not None and prefix.startswith(self._last_query):
+            candidates = self._last_candidates
+        else:
+            candidates = self._items
+
+        prefix_lower = prefix.lower()
+        prefix_chars = frozenset(prefix_lower)
+        scored = []
+        for indexed in candidates:
+            if not prefix_chars <= indexed.chars:
+                continue
+            score = _fuzzy_score(prefix, prefix_lower, indexed.text, indexed.lower)
+            if score is not None:
+                scored.append((-score, indexed.sort_text, indexed))
+
+        scored.sort(key=lambda entry: (entry[0], entry[1]))
+        self._last_query = prefix
+        self._last_candidates = [entry[2] for entry in scored]
+        return [indexed.item for indexed in self._last_candidates]
@@ -0,0 +1,261 @@
+import collections
+import sys
+import typing as t
+
+from .events import DiagnosticsDelta, PublishDiagnostics
+from .structs import Diagnostic, DiagnosticSeverity, Position
+
+# (line, character) pairs, compared lexicographically.
+_Point = t.Tuple[int, int]
+_Interval = t.Tuple[_Point, _Point, Diagnostic]
+
+# Used as the character of the end of a line when querying whole lines.
+_END_OF_LINE = sys.maxsize
+
+_DiagnosticKey = t.Tuple[
+    _Point, _Point, t.Optional[int], t.Optional[t.Union[int, str]], str
+]
+
+
+def _diagnostic_key(diagnostic: Diagnostic) -> _DiagnosticKey:
+    # Two diagnostics with the same key are considered to be the same
+    # diagnostic, even if e.g. their relatedInformation differs.
+    return (
+        diagnostic.range.start.as_tuple(),
+        diagnostic.range.end.as_tuple(),
+        diagnostic.severity,
+        diagnostic.code,
+        diagnostic.message,
+    )
+
+
+class _IntervalNode:
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(
+        self,
+        center: _Point,
+        by_start: t.List[_Interval],
+        by_end: t.List[_Interval],
+        left: t.Optional["_IntervalNode"],
+        right: t.Optional["_IntervalNode"],
+    ) -> None:
+        self.center = center
+        # Intervals containing `center`, sorted by ascending start and by
+        # descending end respectively.
+        self.by_start = by_start
+        self.by_end = by_end
+        self.left = left
+        self.right = right
+
+
+def _build_tree(intervals: t.List[_Interval]) -> t.Optional[_IntervalNode]:
+    """Build a centered interval tree, `intervals` must be sorted by start.
+
+    The center of every node is the start of its median interval, so every
+    node holds at least one interval and both subtrees hold at most half of
+    the intervals. This makes queries O(log n + k)."""
+    if not intervals:
+        return None
+
+    center = intervals[len(intervals) // 2][0]
+    left: t.List[_Interval] = []
+    right: t.List[_Interval] = []
+    here: t.List[_Interval] = []
+    for interval in intervals:
+        if interval[1] < center:
+            left.append(interval)
+        elif interval[0] > center:
+            right.append(interval)
+        else:
+            here.append(interval)
+
+    return _IntervalNode(
+        center=center,
+        by_start=here,
+        by_end=sorted(here, key=lambda i: i[1], reverse=True),
+        left=_build_tree(left),
+        right=_build_tree(right),
+    )
+
+
+def _query_tree(
+    node: t.Optional[_IntervalNode], lo: _Point, hi: _Point, out: t.List[_Interval]
+) -> None:
+    """Append every interval overlapping [lo, hi] to `out`."""
+    while node is not None:
+        if hi < node.center:
+            for interval in node.by_start:
+                if interval[0] > hi:
+                    break
+                out.append(interval)
+            node = node.left
+        elif lo > node.center:
+            for interval in node.by_end:
+                if interval[1] < lo:
+                    break
+                out.append(interval)
+            node = node.right
+        else:
+            out.extend(node.by_start)
+            _query_tree(node.left, lo, hi, out)
+            node = node.right
+
+
+class _DocumentDiagnostics:
+    __slots__ = ("diagnostics", "counts", "_trees")
+
+    def __init__(self, diagnostics: t.List[Diagnostic]) -> None:
+        self.diagnostics = diagnostics
+        self.counts = collections.Counter(d.severity for d in diagnostics)
+        # Built lazily on the first query, servers often republish a file
+        # many times before anyone looks at it.
+        self._trees: t.Optional[
+            t.Dict[t.Optional[DiagnosticSeverity], t.Optional[_IntervalNode]]
+        ] = None
+
+    def trees(
+        self,
+    ) -> t.Dict[t.Optional[DiagnosticSeverity], t.Optional[_IntervalNode]]:
+        if self._trees is None:
+            grouped: t.Dict[t.Optional[DiagnosticSeverity], t.List[_Interval]] = (
+                collections.defaultdict(list)
+            )
+            for diagnostic in self.diagnostics:
+                grouped[diagnostic.severity].append(
+                    (
+                        diagnostic.range.start.as_tuple(),
+                        diagnostic.range.end.as_tuple(),
+                        diagnostic,
+                    )
+                )
+            self._trees = {}
+            for severity, intervals in grouped.items():
+                intervals.sort(key=lambda i: i[0])
+                self._trees[severity] = _build_tree(intervals)
+        return self._trees
+
+
+class DiagnosticsIndex:
+    """
+    Index of the diagnostics published by a server, for range queries.
+
+    Feed every `PublishDiagnostics` event to `update()`. Per uri, the
+    diagnostics are kept in interval trees (one per severity), so that
+    finding the diagnostics overlapping a position or some lines doesn't
+    require scanning all of them. Workspace-wide counts by severity are
+    maintained as diagnostics get replaced.
+    """
+
+    def __init__(self) -> None:
+        self._documents: t.Dict[str, _DocumentDiagnostics] = {}
+        self._counts: t.Counter[t.Optional[DiagnosticSeverity]] = collections.Counter()
+
+    def update(self, event: PublishDiagnostics) -> None:
+        """Replace the diagnostics of `event.uri` with `event.diagnostics`."""
+        self.remove(event.uri)
+        if event.diagnostics:
+            document = _DocumentDiagnostics(list(event.diagnostics))
+            self._documents[event.uri] = document
+            self._counts.update(document.counts)
+
+    def remove(self, uri: str) -> None:
+        """Forget the diagnostics of a document, e.g. after closing it."""
+        document = self._documents.pop(uri, None)
+        if document is not None:
+            self._counts.subtract(document.counts)
+
+    def clear(self) -> None:
+        self._documents.clear()
+        self._counts.clear()
+
+    @property
+    def uris(self) -> t.List[str]:
+        """The uris that currently have at least one diagnostic."""
+        return list(self._documents)
+
+    def get(self, uri: str) -> t.List[Diagnostic]:
+        """All diagnostics of a document, in the order the server sent them."""
+        document = self._documents.get(uri)
+        return [] if document is None else list(document.diagnostics)
+
+    def counts(
+        self, uri: t.Optional[str] = None
+    ) -> t.Dict[t.Optional[DiagnosticSeverity], int]:
+        """Number of diagnostics by severity, for one document or everything.
+
+        Diagnostics without a severity are counted under the `None` key."""
+        if uri is None:
+            return {severity: n for severity, n in self._counts.items() if n > 0}
+        document = self._documents.get(uri)
+        return {} if document is None else dict(document.counts)
+
+    def _query(
+        self,
+        uri: str,
+        lo: _Point,
+        hi: _Point,
+        severities: t.Optional[t.Collection[t.Optional[DiagnosticSeverity]]],
+    ) -> t.List[Diagnostic]:
+        document = self._documents.get(uri)
+        if document is None:
+            return []
+
+        found: t.List[_Interval] = []
+        for severity, tree in document.trees().items():
+            if severities is None or severity in severities:
+                _query_tree(tree, lo, hi, found)
+        found.sort(key=lambda i: (i[0], i[1]))
+        return [interval[2] for interval in found]
+
+    def at(
+        self,
+        uri: str,
+        position: Position,
+        severities: t.Optional[t.Collection[t.Optional[DiagnosticSeverity]]] = None,
+    ) -> t.List[Diagnostic]:
+        """Diagnostics whose range contains `position`, sorted by range."""
+        point = position.as_tuple()
+        return self._query(uri, point, point, severities)
+
+    def in_lines(
+        self,
+        uri: str,
+        first_line: int,
+        last_line: int,
+        severities: t.Optional[t.Collection[t.Optional[DiagnosticSeverity]]] = None,
+    ) -> t.List[Diagnostic]:
+        """Diagnostics overlapping the lines `first_line..last_line` (inclusive),
+        e.g. the visible part of an editor. Sorted by range."""
+        return self._query(uri, (first_line, 0), (last_line, _END_OF_LINE), severities)
+
+
+class _DiagnosticsDiffer:
+    """Remembers the last diagnostics of every uri to compute deltas."""
+
+    def __init__(self) -> None:
+        self._previous: t.Dict[str, t.Dict[_DiagnosticKey, t.List[Diagnostic]]] = {}
+
+    def diff(self, event: PublishDiagnostics) -> DiagnosticsDelta:
+        current: t.Dict[_DiagnosticKey, t.List[Diagnostic]] = {}
+        for diagnostic in event.diagnostics:
+            current.setdefault(_diagnostic_key(diagnostic), []).append(diagnostic)
+        previous = self._previous.pop(event.uri, {})
+        if current:
+            self._previous[event.uri] = current
+
+        # Servers may send the same diagnostic more than once, so these are
+        # compared as multisets.
+        added: t.List[Diagnostic] = []
+        removed: t.List[Diagnostic] = []
+        unchanged = 0
+        for key, diagnostics in current.items():
+            old_count = len(previous.get(key, ()))
+            unchanged += min(old_count, len(diagnostics))
+            added.extend(diagnostics[old_count:])
+        for key, old_diagnostics in previous.items():
+            removed.extend(old_diagnostics[len(current.get(key, ())) :])
+
+        return DiagnosticsDelta(
+            uri=event.uri, added=added, removed=removed, unchanged=unchanged
+        )
@@ -1,16 +1,21 @@
 import typing as t
 
-from pydantic import BaseModel, PrivateAttr
+from pydantic import BaseModel, ConfigDict, PrivateAttr
 
 if t.TYPE_CHECKING:  # avoid import cycle at runtime
     from .client import Client
+from .compact_completion import CompactCompletionList
+from .semantic_tokens import SemanticTokensData
 from .structs import (
     FoldingRange,
     InlayHint,
     JSONDict,
+    JSONList,
     Diagnostic,
+    DocumentDiagnosticReportKind,
     MessageType,
     MessageActionItem,
+    CompletionItem,
     CompletionList,
     TextEdit,
     TextDocumentEdit,
@@ -20,9 +25,12 @@ from .structs import (
     MarkedString,
     SignatureInformation,
     LocationLink,
+    CallHierarchyIncomingCall,
     CallHierarchyItem,
+    CallHierarchyOutgoingCall,
     SymbolInformation,
     Registration,
+    Unregistration,
     DocumentSymbol,
     WorkspaceFolder,
     ProgressToken,
@@ -30,13 +38,17 @@ from .structs import (
     WorkDoneProgressReportValue,
     WorkDoneProgressEndValue,
     ConfigurationItem,
+    ServerInfo,
+    WorkspaceDocumentDiagnosticReport,
 )
 
 Id = t.Union[int, str]
 
 
 class Event(BaseModel):
-    pass
+    # A session usually sees only a few kinds of events, so the schema of
+    # each event class is built when it's first used instead of on import.
+    model_config = ConfigDict(defer_build=True)
 
 
 class MethodResponse(Event):
@@ -50,6 +62,99 @@ class ResponseError(Event):
     data: t.Optional[t.Union[str, int, float, bool, t.List[t.Any], JSONDict]] = None
 
 
+class MessageSkipped(Event):
+    """
+    A message from the server was bigger than the `max_message_size` given
+    to the Client, and it was discarded.
+
+    If the message was a response, `message_id` is its id, and no other event
+    will be created for the request.
+    """
+
+    content_length: int
+    message_id: t.Optional[Id] = None
+
+
+class RawEvent:
+    """
+    A message from the server with `Client(validation="raw")`. Its JSON is
+    not validated or converted to models.
+
+    `payload` is the decoded `result` of a response, or the `params` of a
+    request or notification. `message_id` is None for notifications.
+
+    Raw mode yields these instead of all other events except
+    `MessageSkipped`, and some events have no raw counterpart:
+
+    - `PartialResult`: partial results arrive as $/progress notifications,
+      and the number of them isn't counted in the final `RawResponse`.
+    - `Initialized`, `Shutdown` and `ResponseError`: these are
+      `RawResponse`s, with `error` set for failed requests.
+    - `DiagnosticsDelta` and `CompactCompletion`: the `publish_diagnostics`
+      and `completion_format` options of the client have no effect.
+    """
+
+    __slots__ = ("method", "message_id", "payload")
+
+    def __init__(self, method: str, message_id: t.Optional[Id], payload: t.Any) -> None:
+        self.method = method
+        self.message_id = message_id
+        self.payload = payload
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(method={self.method!r},"
+            f" message_id={self.message_id!r}, payload={self.payload!r})"
+        )
+
+
+class RawResponse(RawEvent):
+    """A response to a request of the client. `method` is the request's
+    method, and `error` is the error object of a failed request."""
+
+    __slots__ = ("error",)
+
+    def __init__(
+        self,
+        method: str,
+        message_id: Id,
+        payload: t.Any,
+        error: t.Optional[JSONDict] = None,
+    ) -> None:
+        super().__init__(method, message_id, payload)
+        self.error = error
+
+
+class RawServerNotification(RawEvent):
+    """A notification from the server, e.g. textDocument/publishDiagnostics."""
+
+    __slots__ = ()
+
+
+class RawServerRequest(RawEvent):
+    """
+    A request from the server, e.g. workspace/configuration. The server
+    waits for the response, so always answer it with `reply()`.
+    """
+
+    __slots__ = ("_client",)
+
+    def __init__(
+        self, method: str, message_id: Id, payload: t.Any, client: "Client"
+    ) -> None:
+        super().__init__(method, message_id, payload)
+        self._client = client
+
+    def reply(
+        self,
+        result: t.Optional[t.Union[JSONDict, JSONList]] = None,
+        error: t.Optional[JSONDict] = None,
+    ) -> None:
+        """Add a response with `result` or `error` to the send buffer."""
+        assert self.message_id is not None
+        self._client._send_response(id=self.message_id, result=result, error=error)
+
+
 class ServerRequest(Event):
     _client: "Client" = PrivateAttr()
     _id: Id = PrivateAttr()
@@ -61,6 +166,7 @@ class ServerNotification(Event):
 
 class Initialized(Event):
     capabilities: JSONDict
+    serverInfo: t.Optional[ServerInfo] = None
 
 
 class Shutdown(Event):
@@ -126,11 +232,36 @@ class WorkDoneProgressEnd(WorkDoneProgress):
     value: WorkDoneProgressEndValue
 
 
+class ProgressUpdate(Event):
+    """The latest state of a work done progress, from ProgressTracker.tick()."""
+
+    token: ProgressToken
+    title: str
+    message: t.Optional[str] = None
+    percentage: t.Optional[int] = None
+    cancellable: t.Optional[bool] = None
+    done: bool
+    # Average percentage of all unfinished work that reports a percentage
+    aggregate_percentage: t.Optional[float] = None
+
+
 # XXX: should these two be just Events or?
 class Completion(MethodResponse):
     completion_list: t.Optional[CompletionList]
 
 
+class CompactCompletion(MethodResponse):
+    """Like Completion, for clients created with `completion_format="compact"`."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    completion_list: t.Optional[CompactCompletionList]
+
+
+class CompletionItemResolve(MethodResponse):
+    item: CompletionItem
+
+
 # XXX: not sure how to name this event.
 class WillSaveWaitUntilEdits(Event):
     edits: t.Optional[t.List[TextEdit]]
@@ -141,6 +272,46 @@ class PublishDiagnostics(ServerNotification):
     diagnostics: t.List[Diagnostic]
 
 
+class DiagnosticsDelta(ServerNotification):
+    """
+    What changed in the diagnostics of a document since the previous
+    `textDocument/publishDiagnostics` for it.
+
+    Emitted by clients created with `publish_diagnostics="delta"` or
+    `publish_diagnostics="both"`.
+    """
+
+    uri: str
+    added: t.List[Diagnostic]
+    removed: t.List[Diagnostic]
+    unchanged: int
+
+
+class DocumentDiagnostics(MethodResponse):
+    """
+    Response to `Client.document_diagnostic()`.
+
+    If the server reports that nothing changed since the previous pull,
+    `kind` is `UNCHANGED` and `items` are the diagnostics of that pull.
+    """
+
+    uri: str
+    kind: DocumentDiagnosticReportKind
+    result_id: t.Optional[str] = None
+    items: t.List[Diagnostic]
+
+
+class WorkspaceDiagnostics(MethodResponse):
+    reports: t.List[WorkspaceDocumentDiagnosticReport]
+
+
+class DiagnosticRefreshRequest(ServerRequest):
+    """The server asks to pull the diagnostics of all documents again."""
+
+    def reply(self) -> None:
+        self._client._send_response(id=self._id, result=None)
+
+
 class WorkspaceProjectInitializationComplete(ServerNotification):
     """Notification, exclusive to the Roslyn language server to indicate that the solution has been loaded."""
 
@@ -176,21 +347,44 @@ class WorkspaceEdit(MethodResponse):
     documentChanges: t.Optional[t.List[TextDocumentEdit]] = None
 
 
+class PartialResult(Event):
+    """
+    A part of the result of a request sent with `partial_results=True`.
+
+    `result` contains validated items of the same type as the `result` of
+    the final response event, whose `delivered_partial_results` tells how
+    many PartialResult events were yielded before it.
+    """
+
+    message_id: Id
+    result: t.List[t.Any]
+
+
 # result is a list, so putting in a custom class
 class References(MethodResponse):
     result: t.Union[t.List[Location], None]
+    delivered_partial_results: int = 0
 
 
-class MCallHierarchItems(Event):
+class MCallHierarchItems(MethodResponse):
     result: t.Union[t.List[CallHierarchyItem], None]
 
 
+class MCallHierarchyIncomingCalls(MethodResponse):
+    result: t.Optional[t.List[CallHierarchyIncomingCall]] = None
+
+
+class MCallHierarchyOutgoingCalls(MethodResponse):
+    result: t.Optional[t.List[CallHierarchyOutgoingCall]] = None
+
+
 class Implementation(MethodResponse):
     result: t.Union[Location, t.List[t.Union[Location, LocationLink]], None]
 
 
 class MWorkspaceSymbols(MethodResponse):
     result: t.Union[t.List[SymbolInformation], None]
+    delivered_partial_results: int = 0
 
 
 class MFoldingRanges(MethodResponse):
@@ -201,8 +395,31 @@ class MInlayHints(MethodResponse):
     result: t.Optional[t.List[InlayHint]] = None
 
 
+class SemanticTokens(MethodResponse):
+    """
+    Response to the semantic tokens requests of the client.
+
+    For `semantic_tokens_range()`, `range` is the requested range and
+    `tokens` contains only the tokens in it. Otherwise `tokens` contains the
+    tokens of the whole document, and it is the same object every time for
+    the same document, because deltas are applied to it in place. Only the
+    tokens of open documents are kept for deltas. If the document was
+    closed before a delta arrived, or another response replaced the tokens
+    that the delta is relative to, the delta can't be applied and `tokens`
+    is None; call `semantic_tokens_full_delta()` again to get the changes
+    since the tokens that are kept.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    uri: str
+    tokens: t.Optional[SemanticTokensData]
+    range: t.Optional[Range] = None
+
+
 class MDocumentSymbols(MethodResponse):
     result: t.Union[t.List[SymbolInformation], t.List[DocumentSymbol], None] = None
+    delivered_partial_results: int = 0
 
 
 class Declaration(MethodResponse):
@@ -220,6 +437,14 @@ class RegisterCapabilityRequest(ServerRequest):
         self._client._send_response(id=self._id, result={})
 
 
+class UnregisterCapabilityRequest(ServerRequest):
+    # Misspelled in the LSP spec, and kept that way for compatibility
+    unregisterations: t.List[Unregistration]
+
+    def reply(self) -> None:
+        self._client._send_response(id=self._id, result=None)
+
+
 class DocumentFormatting(MethodResponse):
     result: t.Union[t.List[TextEdit], None] = None
 
@@ -1,5 +1,8 @@
+import codecs
 import json
+import mmap
 import re
+import tempfile
 import typing as t
 
 from pydantic import TypeAdapter
@@ -21,32 +24,126 @@ def _make_headers(content_length: int, encoding: str = "utf-8") -> bytes:
     return headers_bytes
 
 
-def _make_request(
+# Strings at least this long in the params of a request are escaped and
+# written in chunks, see _StreamedText.
+_STREAMED_TEXT_MIN_LENGTH = 64 * 1024
+_STREAMED_TEXT_CHUNK_SIZE = 64 * 1024
+
+# Stands for a _StreamedText in the output of json.dumps()
+_STREAMED_TEXT_PLACEHOLDER = "\0sansio-lsp-client streamed text\0"
+_QUOTED_PLACEHOLDER = json.dumps(_STREAMED_TEXT_PLACEHOLDER)
+
+
+class _StreamedText:
+    """
+    A string in the params of _write_request() that is escaped and written
+    in chunks, so that no JSON string containing all of it is ever created.
+    Use this for document contents, which can be many megabytes.
+    """
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+def _streamed_if_long(text: str) -> t.Union[str, _StreamedText]:
+    if len(text) >= _STREAMED_TEXT_MIN_LENGTH:
+        return _StreamedText(text)
+    return text
+
+
+def _write_content(buf: bytearray, content: JSONDict, encoding: str) -> int:
+    """Append the headers and JSON of a message to `buf`. Returns the number
+    of bytes written."""
+    streamed_texts: t.List[str] = []
+
+    def replace_streamed_text(value: t.Any) -> str:
+        if isinstance(value, _StreamedText):
+            streamed_texts.append(value.text)
+            return _STREAMED_TEXT_PLACEHOLDER
+        raise TypeError(
+            f"Object of type {type(value).__name__} is not JSON serializable"
+        )
+
+    # Everything except the streamed texts is small, so it's fine to put
+    # it into one JSON string. With the default ensure_ascii=True, the JSON
+    # is ASCII, and the length of the escaped texts is known in bytes.
+    envelope = json.dumps(content, default=replace_streamed_text).split(
+        _QUOTED_PLACEHOLDER
+    )
+    assert len(envelope) == len(streamed_texts) + 1
+
+    # The texts are escaped straight into `buf`, and the headers are
+    # inserted before them once the length is known. Moving the content in
+    # `buf` is a lot faster than escaping the texts twice to compute their
+    # lengths beforehand.
+    content_start = len(buf)
+    buf += envelope[0].encode(encoding)
+    for text, after in zip(streamed_texts, envelope[1:]):
+        buf += b'"'
+        for start in range(0, len(text), _STREAMED_TEXT_CHUNK_SIZE):
+            chunk = text[start : start + _STREAMED_TEXT_CHUNK_SIZE]
+            # Strip the quotes added by encode_basestring_ascii()
+            buf += json.encoder.encode_basestring_ascii(chunk)[1:-1].encode("ascii")
+        buf += b'"'
+        buf += after.encode(encoding)
+
+    content_length = len(buf) - content_start
+    headers = _make_headers(content_length=content_length, encoding=encoding)
+    buf[content_start:content_start] = headers
+    return len(headers) + content_length
+
+
+def _write_request(
+    buf: bytearray,
     method: str,
     params: t.Optional[JSONDict] = None,
     id: t.Optional[Id] = None,
     *,
     encoding: str = "utf-8",
-) -> bytes:
-    request = bytearray()
-
-    # Set up the actual JSONRPC content and encode it.
+) -> int:
+    """Append a request (or a notification, if `id` is None) to `buf`.
+    Returns the number of bytes written."""
     content: JSONDict = {"jsonrpc": "2.0", "method": method}
     if params is not None:
         content["params"] = params
     if id is not None:
         content["id"] = id
-    encoded_content = json.dumps(content).encode(encoding)
+    return _write_content(buf, content, encoding)
 
-    # Write the headers to the request body
-    request += _make_headers(content_length=len(encoded_content), encoding=encoding)
-
-    # Append the content to the request
-    request += encoded_content
 
+def _make_request(
+    method: str,
+    params: t.Optional[JSONDict] = None,
+    id: t.Optional[Id] = None,
+    *,
+    encoding: str = "utf-8",
+) -> bytes:
+    request = bytearray()
+    _write_request(request, method, params, id, encoding=encoding)
     return request
 
 
+def _write_did_open(
+    buf: bytearray, uri: str, language_id: str, version: int, text: str
+) -> int:
+    """
+    Append a textDocument/didOpen notification to `buf`, without creating
+    a TextDocumentItem or a JSON string of the whole text. Returns the number
+    of bytes written.
+    """
+    params = {
+        "textDocument": {
+            "uri": uri,
+            "languageId": language_id,
+            "version": version,
+            "text": _streamed_if_long(text),
+        }
+    }
+    return _write_request(buf, "textDocument/didOpen", params)
+
+
 def _make_response(
     id: int | str,  # TODO: does this make sense?
     result: t.Optional[t.Union[JSONDict, JSONList]] = None,
@@ -122,10 +219,20 @@ def _parse_one_message(
         or an iterable of Request or Response objects if a message was parsed successfully.
 
     Note: This function modifies response_buf by removing parsed data."""
-    if b"\r\n\r\n" not in response_buf:
+    frames = _parse_one_raw_message(response_buf)
+    if frames is None:
         return None
+    return map(_parse_request_or_response, frames)
+
 
-    header_lines, raw_content = bytes(response_buf).split(b"\r\n\r\n", 1)
+def _parse_headers(response_buf: bytearray) -> t.Optional[t.Tuple[int, str, int]]:
+    """Parse the headers at the start of `response_buf`.
+
+    Returns None if the headers haven't been fully received yet, and
+    (offset of the content, encoding, Content-Length) otherwise."""
+    headers_end = response_buf.find(b"\r\n\r\n")
+    if headers_end == -1:
+        return None
 
     # Many langservers don't set Content-Type header for whatever reason. We
     # use a sane default for that.
@@ -133,7 +240,7 @@ def _parse_one_message(
     # Langserver spec links to RFC 7230 which says that header names should be
     # case-insensitive.
     headers = {"content-type": "application/vscode-jsonrpc; charset=utf-8"}
-    for header_line in header_lines.split(b"\r\n"):
+    for header_line in bytes(response_buf[:headers_end]).split(b"\r\n"):
         key, value = header_line.decode("ascii").split(": ", 1)
         headers[key.lower()] = value
 
@@ -151,15 +258,27 @@ def _parse_one_message(
     # Content-Length
     content_length = int(headers["content-length"])
 
-    # We need to verify that the raw_content is long enough.
-    if len(raw_content) < content_length:
+    return headers_end + 4, encoding, content_length
+
+
+def _parse_one_raw_message(response_buf: bytearray) -> t.Optional[t.List[JSONDict]]:
+    """Like _parse_one_message, but returns the decoded JSON objects without
+    validating them. A batch message gives more than one object."""
+    headers = _parse_headers(response_buf)
+    if headers is None:
+        return None
+    content_start, encoding, content_length = headers
+
+    # We need to verify that the content is long enough. This is checked
+    # before copying anything, because a huge message can arrive in many
+    # small pieces.
+    if len(response_buf) - content_start < content_length:
         # incomplete request
         return None
 
     # Take only as many bytes as we need. If there's any remaining, they're
     # the next response's.
-    unused_bytes_count = len(raw_content) - content_length
-    raw_content = raw_content[:content_length]
+    raw_content = bytes(response_buf[content_start : content_start + content_length])
 
     # This is a good place for deleting unnecessary stuff from response_buf
     # because if the code below fails, then leaving the cause of failure to
@@ -167,24 +286,213 @@ def _parse_one_message(
     # when called with the same response_buf. I think I've had this issue a
     # long time ago, and it was annoying how one response parsing error would
     # also block the parsing of any future responses.
-    if unused_bytes_count == 0:  # 'del response_buf[:-0]' does wrong thing
-        response_buf.clear()
-    else:
-        del response_buf[:-unused_bytes_count]
+    del response_buf[: content_start + content_length]
 
-    def parse_request_or_response(
-        data: JSONDict,
-    ) -> t.Union[Request, Response]:
-        del data["jsonrpc"]
-        return TypeAdapter(t.Union[Request, Response]).validate_python(data)
+    return _decode_content(raw_content.decode(encoding))
 
-    content = json.loads(raw_content.decode(encoding))
+
+def _decode_content(content_text: str) -> t.List[JSONDict]:
+    content = json.loads(content_text)
 
     if isinstance(content, list):
         # This is in response to a batch operation.
-        return map(parse_request_or_response, content)
+        return content
     else:
-        return [parse_request_or_response(content)]
+        return [content]
+
+
+# The beginning of a message that has an id, up to the end of the id.
+_MESSAGE_ID_START = (
+    rb'\s*\{\s*(?:"jsonrpc"\s*:\s*"2\.0"\s*,\s*)?'
+    rb'"id"\s*:\s*(-?\d+|"(?:[^"\\]|\\.)*")'
+)
+# The beginning of a response, up to the "result" or "error" key
+_RESPONSE_START_RE = re.compile(
+    _MESSAGE_ID_START + rb'\s*,\s*(?:"jsonrpc"\s*:\s*"2\.0"\s*,\s*)?"(?:result|error)"'
+)
+# The beginning of a response whose result is a list, up to and including the
+# "[". The id must come before the result, otherwise we wouldn't know which
+# request the list belongs to.
+_LIST_RESPONSE_START_RE = re.compile(
+    _MESSAGE_ID_START + rb'\s*,\s*(?:"jsonrpc"\s*:\s*"2\.0"\s*,\s*)?"result"\s*:\s*\['
+)
+# If this many bytes of the content don't start like _LIST_RESPONSE_START_RE,
+# the message is something else.
+_LIST_RESPONSE_START_MAX_LENGTH = 256
+_SEPARATORS_RE = re.compile(r"[\s,]*")
+_JSON_DECODER = json.JSONDecoder()
+
+
+class _StreamedListResponse:
+    """
+    Decodes the items of a response's result list while the response is
+    being received, instead of waiting for all of it.
+
+    See _start_streamed_list_response().
+    """
+
+    __slots__ = ("id", "batches", "_remaining", "_decoder", "_text", "_list_ended")
+
+    def __init__(self, id: Id, encoding: str, remaining: int) -> None:
+        self.id = id
+        self.batches = 0  # for use by the caller
+        # Number of bytes of the content that haven't been received yet
+        self._remaining = remaining
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        # Received content that hasn't been decoded into items yet
+        self._text = ""
+        self._list_ended = False
+
+    @property
+    def done(self) -> bool:
+        return self._remaining == 0
+
+    def feed(self, response_buf: bytearray) -> t.List[t.Any]:
+        """Take the rest of the response (or as much of it as there is) from
+        the start of `response_buf`, and return the list items in it."""
+        length = min(len(response_buf), self._remaining)
+        chunk = bytes(response_buf[:length])
+        del response_buf[:length]
+        self._remaining -= length
+        self._text += self._decoder.decode(chunk, final=self.done)
+
+        items = []
+        text = self._text
+        position = 0
+        while not self._list_ended:
+            position = _SEPARATORS_RE.match(text, position).end()  # type: ignore
+            if position == len(text):
+                break
+            if text[position] == "]":
+                self._list_ended = True
+                break
+            try:
+                item, end = _JSON_DECODER.raw_decode(text, position)
+            except json.JSONDecodeError:
+                if self.done:
+                    raise
+                break  # the item hasn't been fully received yet
+            if end == len(text) and not self.done:
+                break  # could be a number that continues in the next chunk
+            items.append(item)
+            position = end
+
+        # Anything after the list is ignored.
+        self._text = "" if self._list_ended else text[position:]
+        return items
+
+
+def _start_streamed_list_response(
+    response_buf: bytearray,
+    min_length: int,
+    is_list_response: t.Callable[[Id], bool],
+) -> t.Optional[_StreamedListResponse]:
+    """
+    Check whether the message at the start of `response_buf` should be
+    decoded with a _StreamedListResponse: its Content-Length is at least
+    `min_length`, and it's a response whose id satisfies `is_list_response`
+    and whose result is a list.
+
+    If so, the beginning of the message is removed from `response_buf`.
+    Returns None if not, or if it can't be known yet.
+    """
+    headers = _parse_headers(response_buf)
+    if headers is None:
+        return None
+    content_start, encoding, content_length = headers
+    if content_length < min_length or codecs.lookup(encoding).name != "utf-8":
+        return None
+
+    beginning = bytes(
+        response_buf[content_start : content_start + _LIST_RESPONSE_START_MAX_LENGTH]
+    )
+    match = _LIST_RESPONSE_START_RE.match(beginning)
+    if match is None or not is_list_response(json.loads(match.group(1))):
+        return None
+
+    del response_buf[: content_start + match.end()]
+    return _StreamedListResponse(
+        json.loads(match.group(1)), encoding, content_length - match.end()
+    )
+
+
+class _SkippedMessage:
+    """Discards the content of a message as it arrives, e.g. because it's
+    too big to handle."""
+
+    __slots__ = ("content_length", "_remaining", "_beginning")
+
+    def __init__(self, content_length: int) -> None:
+        self.content_length = content_length
+        self._remaining = content_length
+        # Kept for finding out whether the message is a response
+        self._beginning = bytearray()
+
+    @property
+    def done(self) -> bool:
+        return self._remaining == 0
+
+    @property
+    def response_id(self) -> t.Optional[Id]:
+        """The id of the message, if it's a response that starts with its id."""
+        match = _RESPONSE_START_RE.match(self._beginning)
+        return None if match is None else json.loads(match.group(1))
+
+    def feed(self, response_buf: bytearray) -> None:
+        length = min(len(response_buf), self._remaining)
+        missing = _LIST_RESPONSE_START_MAX_LENGTH - len(self._beginning)
+        if missing > 0:
+            self._beginning += response_buf[: min(missing, length)]
+        del response_buf[:length]
+        self._remaining -= length
+
+
+class _SpilledMessage:
+    """
+    Writes the content of a message to a temporary file as it arrives, so
+    that it doesn't have to be kept in memory, and decodes the file through
+    mmap once all of it has arrived.
+    """
+
+    __slots__ = ("_encoding", "_remaining", "_file")
+
+    def __init__(self, encoding: str, content_length: int) -> None:
+        self._encoding = encoding
+        self._remaining = content_length
+        self._file = tempfile.TemporaryFile()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def feed(self, response_buf: bytearray) -> t.Optional[t.List[JSONDict]]:
+        """Take the rest of the content (or as much of it as there is) from
+        the start of `response_buf`. Returns the decoded JSON objects, or None
+        if more content is needed."""
+        length = min(len(response_buf), self._remaining)
+        self._file.write(response_buf[:length])
+        del response_buf[:length]
+        self._remaining -= length
+        if self._remaining > 0:
+            return None
+
+        try:
+            self._file.flush()
+            if self._file.tell() == 0:
+                return _decode_content("")  # can't mmap an empty file
+            with mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return _decode_content(str(mapped, self._encoding))
+        finally:
+            self.close()
+
+
+_REQUEST_OR_RESPONSE_ADAPTER: TypeAdapter[t.Union[Request, Response]] = TypeAdapter(
+    t.Union[Request, Response]
+)
+
+
+def _parse_request_or_response(data: JSONDict) -> t.Union[Request, Response]:
+    del data["jsonrpc"]
+    return _REQUEST_OR_RESPONSE_ADAPTER.validate_python(data)
 
 
 def _parse_messages(response_buf: bytearray) -> t.Iterator[t.Union[Response, Request]]:
@@ -203,3 +511,45 @@ def _parse_messages(response_buf: bytearray) -> t.Iterator[t.Union[Response, Req
         if parsed is None:
             break
         yield from parsed
+
+
+def _coalescing_key(frame: JSONDict) -> t.Optional[t.Tuple[str, t.Any]]:
+    if "id" in frame:
+        return None  # requests and responses always need to be handled
+
+    params = frame.get("params")
+    if not isinstance(params, dict):
+        return None
+
+    method = frame.get("method")
+    if method == "textDocument/publishDiagnostics":
+        return (method, params.get("uri"))
+    if method == "$/progress":
+        value = params.get("value")
+        # "begin" can't be dropped, because it contains the title. The value
+        # isn't a dict for partial results, and those are never superseded.
+        if isinstance(value, dict) and value.get("kind") in ("report", "end"):
+            return (method, params.get("token"))
+    return None
+
+
+def _coalesce_notifications(frames: t.List[JSONDict]) -> t.List[JSONDict]:
+    """Drop the notifications that are superseded by a later one in `frames`.
+
+    A publishDiagnostics replaces all previous diagnostics of the same uri,
+    and a work done progress report or end makes the previous reports of the
+    same token obsolete. The order of the remaining frames is preserved."""
+    seen = set()
+    kept = []
+    for frame in reversed(frames):
+        key = _coalescing_key(frame)
+        if key is not None:
+            is_progress_end = (
+                key[0] == "$/progress" and frame["params"]["value"]["kind"] == "end"
+            )
+            if key in seen and not is_progress_end:
+                continue
+            seen.add(key)
+        kept.append(frame)
+    kept.reverse()
+    return kept
@@ -0,0 +1,36 @@
+import mmap
+import os
+import typing as t
+
+
+def _read_text(path: str) -> str:
+    """Read a UTF-8 file, decoding straight from a memory map of it."""
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return ""  # can't mmap an empty file
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return str(mapped, "utf-8")
+
+
+class PreloadProgress(t.NamedTuple):
+    """Progress of `Client.preload_documents()`."""
+
+    files: int  # number of files opened so far
+    total_files: int
+    bytes: int  # number of bytes of didOpen notifications written so far
+    seconds: float  # since the preload started, including time spent flushing
+    # Files that couldn't be read or aren't UTF-8, with the errors. The same
+    # list is shared by all progress objects of one preload.
+    failed: t.List[t.Tuple[str, Exception]]
+
+    @property
+    def done(self) -> bool:
+        return self.files + len(self.failed) == self.total_files
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.seconds if self.seconds else 0.0
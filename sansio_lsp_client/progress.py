@@ -0,0 +1,120 @@
+import math
+import typing as t
+
+from .events import ProgressUpdate, WorkDoneProgress
+from .structs import JSONDict, ProgressToken
+
+
+class _TokenState:
+    __slots__ = (
+        "title",
+        "message",
+        "percentage",
+        "cancellable",
+        "done",
+        "changed",
+        "last_update",
+        "last_activity",
+    )
+
+    def __init__(self, title: str) -> None:
+        self.title = title
+        self.message: t.Optional[str] = None
+        self.percentage: t.Optional[int] = None
+        self.cancellable: t.Optional[bool] = None
+        self.done = False
+        self.changed = True
+        self.last_update = -math.inf
+        # Notifications don't come with a time, so they are timestamped on
+        # the next tick. None means "not yet".
+        self.last_activity: t.Optional[float] = None
+
+
+class ProgressTracker:
+    """
+    Merges work done progress notifications into rate-limited updates.
+
+    Servers can send thousands of progress reports while indexing. Instead
+    of handling each of them, feed them to a tracker (or pass the tracker to
+    `Client(progress_tracker=...)`, which does that without creating events
+    for them), and call `tick()` periodically, e.g. from a UI timer. It
+    returns at most one ProgressUpdate per token per `interval` seconds,
+    containing the latest state of the token.
+
+    Finished tokens are forgotten after their last update. Tokens without
+    any notifications for `idle_timeout` seconds are considered finished.
+    """
+
+    def __init__(self, interval: float = 0.1, idle_timeout: float = 300) -> None:
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self._tokens: t.Dict[ProgressToken, _TokenState] = {}
+
+    def feed(self, event: WorkDoneProgress) -> None:
+        self.feed_raw(event.token, event.value.model_dump())
+
+    def feed_raw(self, token: ProgressToken, value: JSONDict) -> None:
+        """Feed the params of a `$/progress` notification, as JSON."""
+        kind = value["kind"]
+        state = self._tokens.get(token)
+        if kind == "begin" or state is None:
+            state = _TokenState(value.get("title", ""))
+            self._tokens[token] = state
+
+        if value.get("message") is not None:
+            state.message = value["message"]
+        if value.get("percentage") is not None:
+            state.percentage = value["percentage"]
+        if value.get("cancellable") is not None:
+            state.cancellable = value["cancellable"]
+        if kind == "end":
+            state.done = True
+        state.changed = True
+        state.last_activity = None
+
+    @property
+    def tokens(self) -> t.List[ProgressToken]:
+        """Tokens of the work that hasn't finished yet."""
+        return [token for token, state in self._tokens.items() if not state.done]
+
+    def aggregate_percentage(self) -> t.Optional[float]:
+        """The average percentage of all unfinished work that reports one."""
+        percentages = [
+            state.percentage
+            for state in self._tokens.values()
+            if not state.done and state.percentage is not None
+        ]
+        if not percentages:
+            return None
+        return sum(percentages) / len(percentages)
+
+    def tick(self, now: float) -> t.List[ProgressUpdate]:
+        """Return the updates that are due at time `now` (in seconds, e.g.
+        from `time.monotonic()`)."""
+        due = []
+        for token, state in list(self._tokens.items()):
+            if state.last_activity is None:
+                state.last_activity = now
+            elif not state.done and now - state.last_activity >= self.idle_timeout:
+                state.done = True
+                state.changed = True
+            if state.changed and now - state.last_update >= self.interval:
+                due.append((token, state))
+                state.changed = False
+                state.last_update = now
+                if state.done:
+                    del self._tokens[token]
+
+        aggregate = self.aggregate_percentage()
+        return [
+            ProgressUpdate(
+                token=token,
+                title=state.title,
+                message=state.message,
+                percentage=state.percentage,
+                cancellable=state.cancellable,
+                done=state.done,
+                aggregate_percentage=aggregate,
+            )
+            for token, state in due
+        ]
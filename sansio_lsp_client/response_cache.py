@@ -0,0 +1,157 @@
+import hashlib
+import json
+import sqlite3
+import typing as t
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+# Requests whose responses depend only on the content of the document (for a
+# given server and version), so that they can be cached by default.
+DEFAULT_CACHED_METHODS = frozenset(
+    {
+        "textDocument/documentSymbol",
+        "textDocument/foldingRange",
+    }
+)
+
+# Instead of writing to the database on every cache hit, get() remembers
+# which results it returned. Their last_used columns are updated in one
+# transaction when this many are waiting, and by put() and close().
+_LAST_USED_BATCH_SIZE = 256
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """
+    Results of requests, stored in a SQLite database so that they survive
+    restarts of the editor and the server.
+
+    Give a cache to `Client(response_cache=...)`. Requests for the methods
+    in `methods` about open documents are then answered from the cache if
+    the same request was answered before by the same server (the name and
+    version in its initialize response) for the same content of the
+    document. Servers that don't tell their name aren't cached.
+
+    Only methods whose results depend on nothing but the document's
+    content should be cached. Hover isn't cached by default, because it can
+    depend on other files too, e.g. the type of an imported function. Add
+    "textDocument/hover" to `methods` if that doesn't matter.
+
+    When the results take more than `max_size` bytes of JSON, the least
+    recently used ones are removed.
+    """
+
+    def __init__(
+        self,
+        database: str = ":memory:",
+        max_size: int = 64 * 1024 * 1024,
+        methods: t.AbstractSet[str] = DEFAULT_CACHED_METHODS,
+    ) -> None:
+        self.max_size = max_size
+        self.methods = methods
+        self._db = sqlite3.connect(database)
+        self._db.executescript(_SCHEMA)
+        size, last_used = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM responses"
+        ).fetchone()
+        self._size: int = size
+        self._use_counter: int = last_used
+        # Keys returned by get() whose last_used isn't updated yet
+        self._last_used: t.Dict[str, int] = {}
+
+    def close(self) -> None:
+        with self._db:
+            self._write_last_used()
+        self._db.close()
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached results, in bytes of JSON."""
+        return self._size
+
+    def __len__(self) -> int:
+        count: int = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return count
+
+    @staticmethod
+    def key(server: str, method: str, content_hash: str, params: t.Any) -> str:
+        return hashlib.blake2b(
+            json.dumps([server, method, content_hash, params], sort_keys=True).encode(
+                "utf-8"
+            ),
+            digest_size=16,
+        ).hexdigest()
+
+    def get(self, key: str) -> t.Optional[str]:
+        """The result for a key as JSON, or None if it's not cached."""
+        row = self._db.execute(
+            "SELECT result FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._use_counter += 1
+        self._last_used[key] = self._use_counter
+        if len(self._last_used) >= _LAST_USED_BATCH_SIZE:
+            with self._db:
+                self._write_last_used()
+        result: str = row[0]
+        return result
+
+    def _write_last_used(self) -> None:
+        self._db.executemany(
+            "UPDATE responses SET last_used = ? WHERE key = ?",
+            [(last_used, key) for key, last_used in self._last_used.items()],
+        )
+        self._last_used.clear()
+
+    def put(self, key: str, result: str) -> None:
+        """Cache a result given as JSON."""
+        size = len(result.encode("utf-8"))
+        if size > self.max_size:
+            return
+        self._use_counter += 1
+        with self._db:
+            # Before evicting, which needs the right order
+            self._write_last_used()
+            old = self._db.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if old is not None:
+                self._size -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, result, size, self._use_counter),
+            )
+            self._size += size
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Down to 90%, so that not every put() has to evict something
+        target = self.max_size * 9 // 10
+        evicted = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY last_used"
+        ):
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def clear(self) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM responses")
+        self._last_used.clear()
+        self._size = 0
@@ -0,0 +1,90 @@
+import array
+import bisect
+import itertools
+import typing as t
+
+from .structs import JSONDict
+
+# Every token is 5 integers: deltaLine, deltaStartChar, length, tokenType and
+# tokenModifiers (a bit set). See the LSP spec for details.
+_TOKEN_SIZE = 5
+
+
+class SemanticToken(t.NamedTuple):
+    line: int
+    character: int
+    length: int
+    token_type: int  # index into SemanticTokensLegend.tokenTypes
+    token_modifiers: int  # bit set of indexes into SemanticTokensLegend.tokenModifiers
+
+
+class SemanticTokensData:
+    """
+    The semantic tokens of a document, in the relative format of the LSP.
+
+    The integers are kept in a packed `array('I')` and are not decoded into
+    Python objects, except for the lines asked from `tokens_in_lines()`.
+    Deltas from `semanticTokens/full/delta` requests are applied in place.
+    """
+
+    __slots__ = ("data", "result_id", "_lines")
+
+    def __init__(
+        self, data: t.Iterable[int], result_id: t.Optional[str] = None
+    ) -> None:
+        self.data = array.array("I", data)
+        self.result_id = result_id
+        # Absolute line of every token, computed when first needed.
+        self._lines: t.Optional[array.array[int]] = None
+
+    def __len__(self) -> int:
+        """Number of tokens."""
+        return len(self.data) // _TOKEN_SIZE
+
+    def apply_edits(self, edits: t.List[JSONDict], result_id: t.Optional[str]) -> None:
+        """Apply the `edits` of a SemanticTokensDelta response."""
+        # The edits refer to offsets in the old data. Applying them from the
+        # end keeps the offsets of the remaining edits valid.
+        for edit in sorted(edits, key=lambda e: e["start"], reverse=True):
+            start = edit["start"]
+            self.data[start : start + edit["deleteCount"]] = array.array(
+                "I", edit.get("data") or ()
+            )
+        self.result_id = result_id
+        self._lines = None
+
+    def _token_lines(self) -> "array.array[int]":
+        if self._lines is None:
+            self._lines = array.array(
+                "I", itertools.accumulate(self.data[0::_TOKEN_SIZE])
+            )
+        return self._lines
+
+    def tokens_in_lines(
+        self, first_line: int, last_line: int
+    ) -> t.Iterator[SemanticToken]:
+        """Decode the tokens on lines `first_line..last_line` (inclusive)."""
+        lines = self._token_lines()
+        begin = bisect.bisect_left(lines, first_line)
+        end = bisect.bisect_right(lines, last_line)
+
+        data = self.data
+        line = -1
+        character = 0
+        for index in range(begin, end):
+            offset = index * _TOKEN_SIZE
+            if lines[index] != line:
+                # The first token of a line has an absolute start character.
+                line = lines[index]
+                character = data[offset + 1]
+            else:
+                character += data[offset + 1]
+            yield SemanticToken(
+                line, character, data[offset + 2], data[offset + 3], data[offset + 4]
+            )
+
+    def tokens(self) -> t.Iterator[SemanticToken]:
+        """Decode all tokens."""
+        if len(self) == 0:
+            return iter(())
+        return self.tokens_in_lines(0, self._token_lines()[-1])
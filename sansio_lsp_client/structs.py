@@ -2,7 +2,8 @@ import enum
 import typing as t
 from typing_extensions import Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, GetCoreSchemaHandler
+from pydantic_core import SchemaValidator, core_schema
 
 # XXX: Replace the non-commented-out code with what's commented out once nested
 # types become a thing in mypy.
@@ -60,8 +61,24 @@ class VersionedTextDocumentIdentifier(TextDocumentIdentifier):
     version: t.Optional[int]
 
 
-# Sorting tip:  sorted(positions, key=(lambda p: p.as_tuple()))
-class Position(BaseModel):
+# Coerces like an int field of a pydantic model, e.g. "1" and 1.0 become 1
+_int_validator = SchemaValidator(core_schema.int_schema())
+
+
+def _validate_int(value: t.Any) -> int:
+    if type(value) is int:
+        return value
+    result: int = _int_validator.validate_python(value)
+    return result
+
+
+# Position and Range are by far the most common objects, so instead of
+# pydantic models they are named tuples that pydantic knows how to validate
+# and serialize. This makes them a lot smaller, hashable and sortable. They
+# also have model_validate() and model_dump() like the pydantic models.
+#
+# Sorting tip:  sorted(positions)
+class Position(t.NamedTuple):
     # NB: These are both zero-based.
     line: int
     character: int
@@ -69,11 +86,64 @@ class Position(BaseModel):
     def as_tuple(self) -> t.Tuple[int, int]:
         return (self.line, self.character)
 
+    @classmethod
+    def model_validate(cls, obj: t.Any) -> "Position":
+        if isinstance(obj, Position):
+            return obj
+        try:
+            if isinstance(obj, dict):
+                return cls(_validate_int(obj["line"]), _validate_int(obj["character"]))
+            line, character = obj
+            return cls(_validate_int(line), _validate_int(character))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"invalid Position: {obj!r}") from e
+
+    def model_dump(self, **kwargs: t.Any) -> JSONDict:
+        return {"line": self.line, "character": self.character}
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source_type: t.Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls.model_validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls.model_dump
+            ),
+        )
+
 
-class Range(BaseModel):
+class Range(t.NamedTuple):
     start: Position
     end: Position
 
+    @classmethod
+    def model_validate(cls, obj: t.Any) -> "Range":
+        if isinstance(obj, Range):
+            return obj
+        try:
+            if isinstance(obj, dict):
+                start, end = obj["start"], obj["end"]
+            else:
+                start, end = obj
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"invalid Range: {obj!r}") from e
+        return cls(Position.model_validate(start), Position.model_validate(end))
+
+    def model_dump(self, **kwargs: t.Any) -> JSONDict:
+        return {"start": self.start.model_dump(), "end": self.end.model_dump()}
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source_type: t.Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls.model_validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls.model_dump
+            ),
+        )
+
     def calculate_length(self, text: str) -> int:
         text_lines = text.splitlines()
 
@@ -282,6 +352,20 @@ class Diagnostic(BaseModel):
     relatedInformation: t.Optional[t.List[DiagnosticRelatedInformation]] = None
 
 
+class DocumentDiagnosticReportKind(enum.Enum):
+    FULL = "full"
+    UNCHANGED = "unchanged"
+
+
+class WorkspaceDocumentDiagnosticReport(BaseModel):
+    uri: str
+    version: t.Optional[int] = None
+    kind: DocumentDiagnosticReportKind
+    resultId: t.Optional[str] = None
+    # For "unchanged" reports, these are the previously received diagnostics.
+    items: t.List[Diagnostic] = []
+
+
 class MarkedString(BaseModel):
     language: str
     value: str
@@ -335,7 +419,7 @@ class SymbolTag(enum.IntEnum):
 class CallHierarchyItem(BaseModel):
     name: str
     kind: SymbolKind
-    tags: t.Optional[SymbolTag] = None
+    tags: t.Optional[t.List[SymbolTag]] = None
     detail: t.Optional[str] = None
     uri: str
     range: Range
@@ -404,6 +488,10 @@ class FoldingRange(BaseModel):
 # Usually a hierarchy, e.g. a symbol with kind=SymbolKind.CLASS contains
 # several SymbolKind.METHOD symbols
 class DocumentSymbol(BaseModel):
+    # The schema is built when the model is first used, which also resolves
+    # the forward reference in `children`.
+    model_config = ConfigDict(defer_build=True)
+
     name: str
     detail: t.Optional[str] = None
     kind: SymbolKind
@@ -417,16 +505,32 @@ class DocumentSymbol(BaseModel):
     children: t.Optional[t.List["DocumentSymbol"]] = None
 
 
-# for `.children` treeness
-DocumentSymbol.model_rebuild()
-
-
 class Registration(BaseModel):
     id: str
     method: str
     registerOptions: t.Optional[t.Any] = None
 
 
+class Unregistration(BaseModel):
+    id: str
+    method: str
+
+
+class SemanticTokensLegend(BaseModel):
+    tokenTypes: t.List[str]
+    tokenModifiers: t.List[str]
+
+    def type_name(self, token_type: int) -> str:
+        return self.tokenTypes[token_type]
+
+    def modifier_names(self, token_modifiers: int) -> t.List[str]:
+        return [
+            name
+            for bit, name in enumerate(self.tokenModifiers)
+            if token_modifiers & (1 << bit)
+        ]
+
+
 class FormattingOptions(BaseModel):
     tabSize: int
     insertSpaces: bool
@@ -440,6 +544,38 @@ class WorkspaceFolder(BaseModel):
     name: str
 
 
+class ServerInfo(BaseModel):
+    name: str
+    version: t.Optional[str] = None
+
+
+class RelativePattern(BaseModel):
+    baseUri: t.Union[WorkspaceFolder, str]
+    pattern: str
+
+
+class WatchKind(enum.IntFlag):
+    CREATE = 1
+    CHANGE = 2
+    DELETE = 4
+
+
+class FileSystemWatcher(BaseModel):
+    globPattern: t.Union[str, RelativePattern]
+    kind: WatchKind = WatchKind.CREATE | WatchKind.CHANGE | WatchKind.DELETE
+
+
+class FileChangeType(enum.IntEnum):
+    CREATED = 1
+    CHANGED = 2
+    DELETED = 3
+
+
+class FileEvent(BaseModel):
+    uri: str
+    type: FileChangeType
+
+
 class ProgressValue(BaseModel):
     pass
 
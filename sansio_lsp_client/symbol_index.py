@@ -0,0 +1,400 @@
+import collections
+import sqlite3
+import typing as t
+
+from .events import Event, MDocumentSymbols, References, ResponseError
+from .response_cache import _content_hash
+from .structs import (
+    DocumentSymbol,
+    Id,
+    Location,
+    Position,
+    Range,
+    SymbolInformation,
+    SymbolKind,
+    TextDocumentContentChangeEvent,
+    TextDocumentIdentifier,
+    TextDocumentItem,
+    TextDocumentPosition,
+    VersionedTextDocumentIdentifier,
+)
+
+if t.TYPE_CHECKING:
+    from .client import Client
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    uri TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,  -- ids of deleted symbols aren't reused
+    uri TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind INTEGER NOT NULL,
+    container TEXT,
+    start_line INTEGER NOT NULL,
+    start_character INTEGER NOT NULL,
+    end_line INTEGER NOT NULL,
+    end_character INTEGER NOT NULL,
+    selection_start_line INTEGER NOT NULL,
+    selection_start_character INTEGER NOT NULL,
+    selection_end_line INTEGER NOT NULL,
+    selection_end_character INTEGER NOT NULL,
+    references_indexed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS symbols_uri ON symbols (uri);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS refs (
+    symbol_id INTEGER NOT NULL,
+    uri TEXT NOT NULL,
+    start_line INTEGER NOT NULL,
+    start_character INTEGER NOT NULL,
+    end_line INTEGER NOT NULL,
+    end_character INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refs_symbol_id ON refs (symbol_id);
+CREATE INDEX IF NOT EXISTS refs_uri ON refs (uri);
+"""
+
+_SYMBOL_COLUMNS = (
+    "id, uri, name, kind, container, start_line, start_character, end_line,"
+    " end_character"
+)
+
+
+def _flatten_symbols(
+    symbols: t.Union[t.List[SymbolInformation], t.List[DocumentSymbol]],
+    container: t.Optional[str] = None,
+) -> t.Iterator[t.Tuple[str, SymbolKind, t.Optional[str], Range, Range]]:
+    """Yield (name, kind, container name, range, selection range)."""
+    for symbol in symbols:
+        if isinstance(symbol, SymbolInformation):
+            yield (
+                symbol.name,
+                symbol.kind,
+                symbol.containerName,
+                symbol.location.range,
+                symbol.location.range,
+            )
+        else:
+            yield (
+                symbol.name,
+                symbol.kind,
+                container,
+                symbol.range,
+                symbol.selectionRange,
+            )
+            yield from _flatten_symbols(symbol.children or [], symbol.name)
+
+
+class _SymbolsJob(t.NamedTuple):
+    uri: str
+    text: str
+    language_id: str
+    hash: str
+    # See _ReferencesJob
+    in_opened_file: bool = False
+
+
+class _ReferencesJob(t.NamedTuple):
+    symbol_id: int
+    uri: str
+    position: Position
+    # True if the file was opened for crawling it, and it has to stay open
+    # until the response arrives
+    in_opened_file: bool = False
+
+
+class SymbolIndex:
+    """
+    Keeps the symbols of a workspace, and optionally references to them, in
+    a SQLite database.
+
+    Files are given to `update_file()`, which compares a hash of the content
+    with the one in the database, and crawls the file with a documentSymbol
+    request (and references requests for its symbols, if
+    `index_references` is true) only if it changed. Up to `max_in_flight`
+    requests are sent at once. Like with CallHierarchyExpander, pass the
+    events from `Client.recv()` to `handle()`. Files that aren't open in the
+    client are opened until their responses arrive.
+
+    `find_symbols()` and `find_references()` answer from the database,
+    including what was indexed before a restart, so they work before the
+    server has finished starting.
+    """
+
+    def __init__(
+        self,
+        client: "Client",
+        database: str = ":memory:",
+        index_references: bool = False,
+        max_in_flight: int = 8,
+    ) -> None:
+        self.client = client
+        self.index_references = index_references
+        self.max_in_flight = max_in_flight
+        self._db = sqlite3.connect(database)
+        self._db.executescript(_SCHEMA)
+
+        self._queue: t.Deque[t.Union[_SymbolsJob, _ReferencesJob]] = collections.deque()
+        self._in_flight: t.Dict[Id, t.Union[_SymbolsJob, _ReferencesJob]] = {}
+        # The hash of the latest content of every file being crawled
+        self._crawled_hashes: t.Dict[str, str] = {}
+        # Files that weren't open in the client are opened for crawling
+        # them. These are the files opened by the index, with the number of
+        # their requests that are queued or waiting for a response.
+        self._opened_files: t.Dict[str, int] = {}
+
+    def close(self) -> None:
+        self._db.close()
+
+    @property
+    def done(self) -> bool:
+        return not self._queue and not self._in_flight
+
+    def update_file(self, uri: str, text: str, language_id: str) -> bool:
+        """
+        Crawl a file if its content isn't in the index yet. Returns True if
+        the file will be crawled.
+        """
+        hash = _content_hash(text)
+        row = self._db.execute(
+            "SELECT hash FROM files WHERE uri = ?", (uri,)
+        ).fetchone()
+        if row is not None and row[0] == hash:
+            return False
+
+        if self._crawled_hashes.get(uri) == hash:
+            return True
+        with self._db:
+            self._forget_file(uri)
+        self._crawled_hashes[uri] = hash
+        self._queue.append(_SymbolsJob(uri, text, language_id, hash))
+        self._send_requests()
+        return True
+
+    def remove_file(self, uri: str) -> None:
+        self._crawled_hashes.pop(uri, None)
+        with self._db:
+            self._forget_file(uri)
+        self._send_requests()
+
+    def _forget_file(self, uri: str) -> None:
+        # The positions of references in the file are no longer valid, so
+        # the symbols referenced from the file need new references.
+        stale_symbols = [
+            row[0]
+            for row in self._db.execute(
+                "SELECT DISTINCT symbol_id FROM refs WHERE uri = ?", (uri,)
+            )
+        ]
+        self._db.executemany(
+            "DELETE FROM refs WHERE symbol_id = ?", [(id,) for id in stale_symbols]
+        )
+        self._db.executemany(
+            "UPDATE symbols SET references_indexed = 0 WHERE id = ?",
+            [(id,) for id in stale_symbols],
+        )
+        self._db.execute(
+            "DELETE FROM refs"
+            " WHERE symbol_id IN (SELECT id FROM symbols WHERE uri = ?)",
+            (uri,),
+        )
+        self._db.execute("DELETE FROM symbols WHERE uri = ?", (uri,))
+        self._db.execute("DELETE FROM files WHERE uri = ?", (uri,))
+
+        if self.index_references:
+            for id in stale_symbols:
+                row = self._db.execute(
+                    "SELECT uri, selection_start_line, selection_start_character"
+                    " FROM symbols WHERE id = ?",
+                    (id,),
+                ).fetchone()
+                if row is not None:
+                    self._queue.append(
+                        _ReferencesJob(id, row[0], Position(row[1], row[2]))
+                    )
+
+    def _send_requests(self) -> None:
+        while self._queue and len(self._in_flight) < self.max_in_flight:
+            job = self._queue.popleft()
+            if isinstance(job, _SymbolsJob):
+                in_opened_file = self._open_file(job)
+                id = self.client.documentSymbol(TextDocumentIdentifier(uri=job.uri))
+                # The text is no longer needed
+                self._in_flight[id] = job._replace(
+                    text="", in_opened_file=in_opened_file
+                )
+            else:
+                id = self.client.references(
+                    TextDocumentPosition(
+                        textDocument=TextDocumentIdentifier(uri=job.uri),
+                        position=job.position,
+                    )
+                )
+                self._in_flight[id] = job
+
+    def _open_file(self, job: _SymbolsJob) -> bool:
+        version = self.client.document_version(job.uri)
+        if job.uri in self._opened_files:
+            # Still open for crawling an older content
+            assert version is not None
+            self.client.did_change(
+                VersionedTextDocumentIdentifier(uri=job.uri, version=version + 1),
+                [TextDocumentContentChangeEvent.whole_document_change(job.text)],
+            )
+        elif version is None:
+            self.client.did_open(
+                TextDocumentItem(
+                    uri=job.uri, languageId=job.language_id, version=0, text=job.text
+                )
+            )
+            self._opened_files[job.uri] = 0
+        else:
+            return False  # opened by the user of the client
+        self._opened_files[job.uri] += 1
+        return True
+
+    def _release_file(self, uri: str) -> None:
+        # Close the file once it has no requests left
+        self._opened_files[uri] -= 1
+        if self._opened_files[uri] == 0:
+            del self._opened_files[uri]
+            self.client.did_close(TextDocumentIdentifier(uri=uri))
+
+    def handle(self, event: Event) -> bool:
+        """Handle an event if it's a response to the index's requests."""
+        if not isinstance(event, (MDocumentSymbols, References, ResponseError)):
+            return False
+        if event.message_id not in self._in_flight:
+            return False
+
+        job = self._in_flight.pop(event.message_id)
+        with self._db:
+            if isinstance(job, _SymbolsJob):
+                # Unless the file was changed again after sending the request
+                if self._crawled_hashes.get(job.uri) == job.hash:
+                    del self._crawled_hashes[job.uri]
+                    if isinstance(event, MDocumentSymbols):
+                        self._store_symbols(job, event.result or [])
+            elif isinstance(event, References):
+                self._store_references(job, event.result or [])
+            # After an error, the file is crawled again on its next update.
+
+        if job.in_opened_file:
+            self._release_file(job.uri)
+        self._send_requests()
+        return True
+
+    def _store_symbols(
+        self,
+        job: _SymbolsJob,
+        symbols: t.Union[t.List[SymbolInformation], t.List[DocumentSymbol]],
+    ) -> None:
+        for name, kind, container, range, selection_range in _flatten_symbols(symbols):
+            cursor = self._db.execute(
+                "INSERT INTO symbols (uri, name, kind, container, start_line,"
+                " start_character, end_line, end_character, selection_start_line,"
+                " selection_start_character, selection_end_line,"
+                " selection_end_character) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.uri, name, int(kind), container, *range.start, *range.end)
+                + (*selection_range.start, *selection_range.end),
+            )
+            if self.index_references:
+                assert cursor.lastrowid is not None
+                in_opened_file = job.uri in self._opened_files
+                if in_opened_file:
+                    self._opened_files[job.uri] += 1
+                self._queue.append(
+                    _ReferencesJob(
+                        cursor.lastrowid,
+                        job.uri,
+                        selection_range.start,
+                        in_opened_file,
+                    )
+                )
+        self._db.execute(
+            "INSERT OR REPLACE INTO files (uri, hash) VALUES (?, ?)",
+            (job.uri, job.hash),
+        )
+
+    def _store_references(
+        self, job: _ReferencesJob, locations: t.List[Location]
+    ) -> None:
+        if (
+            self._db.execute(
+                "SELECT 1 FROM symbols WHERE id = ?", (job.symbol_id,)
+            ).fetchone()
+            is None
+        ):
+            return  # the file changed while waiting for the response
+        self._db.executemany(
+            "INSERT INTO refs VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    job.symbol_id,
+                    location.uri,
+                    *location.range.start,
+                    *location.range.end,
+                )
+                for location in locations
+            ],
+        )
+        self._db.execute(
+            "UPDATE symbols SET references_indexed = 1 WHERE id = ?", (job.symbol_id,)
+        )
+
+    @staticmethod
+    def _symbol_from_row(row: t.Tuple[t.Any, ...]) -> SymbolInformation:
+        _, uri, name, kind, container, *range = row
+        return SymbolInformation(
+            name=name,
+            kind=SymbolKind(kind),
+            containerName=container,
+            location=Location(
+                uri=uri,
+                range=Range(Position(range[0], range[1]), Position(range[2], range[3])),
+            ),
+        )
+
+    def find_symbols(self, query: str, limit: int = 100) -> t.List[SymbolInformation]:
+        """Symbols whose name contains `query`, ignoring case."""
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = self._db.execute(
+            f"SELECT {_SYMBOL_COLUMNS} FROM symbols"
+            " WHERE name LIKE ? ESCAPE '\\' ORDER BY length(name), name LIMIT ?",
+            (f"%{escaped}%", limit),
+        )
+        return [self._symbol_from_row(row) for row in rows]
+
+    def find_references(
+        self, uri: str, position: Position
+    ) -> t.Optional[t.List[Location]]:
+        """
+        References to the symbol whose name is at `position`, or None if
+        there is no such symbol or its references haven't been indexed.
+        """
+        line, character = position
+        row = self._db.execute(
+            "SELECT id, references_indexed FROM symbols WHERE uri = ?"
+            " AND (selection_start_line, selection_start_character) <= (?, ?)"
+            " AND (selection_end_line, selection_end_character) >= (?, ?)"
+            " ORDER BY selection_start_line DESC, selection_start_character DESC"
+            " LIMIT 1",
+            (uri, line, character, line, character),
+        ).fetchone()
+        if row is None or not row[1]:
+            return None
+        return [
+            Location(
+                uri=ref_uri,
+                range=Range(Position(*ref_range[:2]), Position(*ref_range[2:])),
+            )
+            for ref_uri, *ref_range in self._db.execute(
+                "SELECT uri, start_line, start_character, end_line, end_character"
+                " FROM refs WHERE symbol_id = ?"
+                " ORDER BY uri, start_line, start_character",
+                (row[0],),
+            )
+        ]
@@ -0,0 +1,292 @@
+import ctypes
+import ctypes.util
+import os
+import pathlib
+import struct
+import sys
+import typing as t
+
+from .capabilities import _compile_glob, _uri_path
+from .structs import FileChangeType, FileEvent, FileSystemWatcher, WatchKind
+
+if t.TYPE_CHECKING:
+    from .client import Client
+
+_WATCH_KINDS = {
+    FileChangeType.CREATED: WatchKind.CREATE,
+    FileChangeType.CHANGED: WatchKind.CHANGE,
+    FileChangeType.DELETED: WatchKind.DELETE,
+}
+
+# How a pending change of a file and a newer change of the same file combine
+# into one change. None means that the server doesn't need to hear about the
+# file at all, e.g. when it was created and deleted in the same batch.
+_MERGED_CHANGES: t.Dict[
+    t.Tuple[FileChangeType, FileChangeType], t.Optional[FileChangeType]
+] = {
+    (FileChangeType.CREATED, FileChangeType.CREATED): FileChangeType.CREATED,
+    (FileChangeType.CREATED, FileChangeType.CHANGED): FileChangeType.CREATED,
+    (FileChangeType.CREATED, FileChangeType.DELETED): None,
+    (FileChangeType.CHANGED, FileChangeType.CREATED): FileChangeType.CHANGED,
+    (FileChangeType.CHANGED, FileChangeType.CHANGED): FileChangeType.CHANGED,
+    (FileChangeType.CHANGED, FileChangeType.DELETED): FileChangeType.DELETED,
+    (FileChangeType.DELETED, FileChangeType.CREATED): FileChangeType.CHANGED,
+    (FileChangeType.DELETED, FileChangeType.CHANGED): FileChangeType.CHANGED,
+    (FileChangeType.DELETED, FileChangeType.DELETED): FileChangeType.DELETED,
+}
+
+
+class _CompiledWatcher:
+    __slots__ = ("base", "pattern", "kind")
+
+    def __init__(self, watcher: FileSystemWatcher) -> None:
+        glob = watcher.globPattern
+        if isinstance(glob, str):
+            # Plain patterns are matched against absolute paths.
+            self.base: t.Optional[str] = None
+            self.pattern = _compile_glob(glob)
+        else:
+            base_uri = (
+                glob.baseUri if isinstance(glob.baseUri, str) else glob.baseUri.uri
+            )
+            self.base = _uri_path(base_uri).rstrip("/") + "/"
+            self.pattern = _compile_glob(glob.pattern)
+        self.kind = watcher.kind
+
+    def matches(self, path: str, change_type: FileChangeType) -> bool:
+        if not self.kind & _WATCH_KINDS[change_type]:
+            return False
+        if self.base is None:
+            return self.pattern.match(path) is not None
+        return path.startswith(self.base) and bool(
+            self.pattern.match(path[len(self.base) :])
+        )
+
+
+class WatchedFilesBatcher:
+    """
+    Collects file changes and reports the ones matching the server's
+    `FileSystemWatcher` registrations in batched
+    `workspace/didChangeWatchedFiles` notifications.
+
+    Changes to the same file are merged, e.g. a file that is created and
+    then written to is reported once as created. A batch is sent from
+    `poll()` when no changes have been added for `debounce` seconds, or
+    `max_delay` seconds after its first change, whichever comes first.
+
+    The changes can come from anywhere, e.g. an editor's own file watching
+    or an `InotifyWatcher`::
+
+        for path, change_type in inotify_watcher.read():
+            batcher.add(path, change_type, time.monotonic())
+        batcher.poll(time.monotonic())
+        sock.sendall(client.send())
+    """
+
+    def __init__(
+        self, client: "Client", debounce: float = 0.1, max_delay: float = 1.0
+    ) -> None:
+        self.client = client
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._pending: t.Dict[str, FileChangeType] = {}
+        self._first_change: t.Optional[float] = None
+        self._last_change: t.Optional[float] = None
+        self._watchers_key: t.Optional[t.Tuple[str, ...]] = None
+        self._watchers: t.List[_CompiledWatcher] = []
+
+    def add(self, path: str, change_type: FileChangeType, now: float) -> None:
+        """Add a change of the file at the absolute `path`, at time `now`
+        (in seconds, e.g. from `time.monotonic()`)."""
+        previous = self._pending.pop(path, None)
+        if previous is None:
+            merged: t.Optional[FileChangeType] = change_type
+        else:
+            merged = _MERGED_CHANGES[previous, change_type]
+        if merged is not None:
+            self._pending[path] = merged
+
+        if self._first_change is None:
+            self._first_change = now
+        self._last_change = now
+
+    @property
+    def pending(self) -> int:
+        """Number of files whose changes haven't been sent yet."""
+        return len(self._pending)
+
+    def _compiled_watchers(self) -> t.List[_CompiledWatcher]:
+        registrations = self.client.capabilities.registrations(
+            "workspace/didChangeWatchedFiles"
+        )
+        key = tuple(registration.id for registration in registrations)
+        if key != self._watchers_key:
+            self._watchers = [
+                _CompiledWatcher(watcher) for watcher in self.client.file_watchers
+            ]
+            self._watchers_key = key
+        return self._watchers
+
+    def poll(self, now: float, force: bool = False) -> int:
+        """
+        Send the pending changes if it's time to do so, or if `force` is
+        true. Returns the number of file changes that were sent.
+        """
+        if self._first_change is None or self._last_change is None:
+            return 0
+        if not (
+            force
+            or now - self._last_change >= self.debounce
+            or now - self._first_change >= self.max_delay
+        ):
+            return 0
+
+        watchers = self._compiled_watchers()
+        changes = [
+            FileEvent(uri=pathlib.Path(path).as_uri(), type=change_type)
+            for path, change_type in self._pending.items()
+            if any(watcher.matches(path, change_type) for watcher in watchers)
+        ]
+        self._pending.clear()
+        self._first_change = self._last_change = None
+        if changes:
+            self.client.did_change_watched_files(changes)
+        return len(changes)
+
+
+# From <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class InotifyWatcher:
+    """
+    Watches a directory tree for file changes with Linux's inotify.
+
+    `read()` never blocks, so it can be called periodically or when
+    `fileno()` becomes readable (e.g. with `selectors`). Directories
+    created in the tree are watched too, and directories named in
+    `exclude_dirs` are skipped.
+
+    If the kernel drops events because they weren't read quickly enough,
+    `overflowed` becomes true, and changes may have been missed.
+    """
+
+    def __init__(self, root: str, exclude_dirs: t.Iterable[str] = (".git",)) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd: int = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self.root = os.path.abspath(root)
+        self.exclude_dirs = frozenset(exclude_dirs)
+        self.overflowed = False
+        self._paths: t.Dict[int, str] = {}  # watch descriptor -> directory
+        self._watch_tree(self.root)
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._paths.clear()
+
+    def __enter__(self) -> "InotifyWatcher":
+        return self
+
+    def __exit__(self, *exc_info: t.Any) -> None:
+        self.close()
+
+    def _watch_tree(self, top: str) -> t.List[str]:
+        """Watch `top` and the directories in it. Returns the files found."""
+        files: t.List[str] = []
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if d not in self.exclude_dirs]
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(dirpath), _WATCH_MASK
+            )
+            if wd < 0:
+                # Most likely deleted already, its deletion will be reported
+                continue
+            self._paths[wd] = dirpath
+            files.extend(os.path.join(dirpath, name) for name in filenames)
+        return files
+
+    def _forget_tree(self, top: str) -> None:
+        prefix = top + os.sep
+        for wd, path in list(self._paths.items()):
+            if path == top or path.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._paths[wd]
+
+    def read(self) -> t.List[t.Tuple[str, FileChangeType]]:
+        """Changes since the last call, as (absolute path, change type)."""
+        changes: t.List[t.Tuple[str, FileChangeType]] = []
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changes
+
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = buffer[offset : offset + length].rstrip(b"\0")
+                offset += length
+
+                if mask & _IN_Q_OVERFLOW:
+                    self.overflowed = True
+                    continue
+                if mask & _IN_IGNORED:
+                    self._paths.pop(wd, None)
+                    continue
+                directory = self._paths.get(wd)
+                if directory is None or not name:
+                    continue
+
+                path = os.path.join(directory, os.fsdecode(name))
+                is_dir = bool(mask & _IN_ISDIR)
+                if is_dir and os.path.basename(path) in self.exclude_dirs:
+                    continue
+
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    changes.append((path, FileChangeType.CREATED))
+                    if is_dir:
+                        # Files can appear before the watch is added.
+                        changes.extend(
+                            (file, FileChangeType.CREATED)
+                            for file in self._watch_tree(path)
+                        )
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    changes.append((path, FileChangeType.DELETED))
+                    if is_dir and mask & _IN_MOVED_FROM:
+                        # The watches follow the moved directory, which is
+                        # no longer in the tree (or is reported as created).
+                        self._forget_tree(path)
+                elif not is_dir:
+                    changes.append((path, FileChangeType.CHANGED))
@@ -0,0 +1,129 @@
+import bisect
+import concurrent.futures
+import re
+import typing as t
+
+from .events import WorkspaceEdit
+from .structs import Position, TextEdit
+
+# LSP considers only these to be line breaks, unlike str.splitlines()
+_LINE_BREAK_RE = re.compile(r"\r\n?|\n")
+
+
+class OverlappingEditsError(ValueError):
+    """Raised when the text edits of a document overlap each other."""
+
+
+class _LineIndex:
+    """Converts positions in a text to offsets.
+
+    Like elsewhere in this library, characters are counted in Python string
+    indexes (code points)."""
+
+    __slots__ = ("_text", "_line_starts", "_line_ends")
+
+    def __init__(self, text: str) -> None:
+        self._text = text
+        self._line_starts = [0]
+        self._line_ends = []
+        for match in _LINE_BREAK_RE.finditer(text):
+            self._line_ends.append(match.start())
+            self._line_starts.append(match.end())
+        self._line_ends.append(len(text))
+
+    def offset(self, position: Position) -> int:
+        line, character = position
+        if line >= len(self._line_starts):
+            return len(self._text)
+        # Like the spec says, a character past the end of the line means the
+        # end of the line.
+        return min(self._line_starts[line] + character, self._line_ends[line])
+
+    def position(self, offset: int) -> Position:
+        line = bisect.bisect_right(self._line_starts, offset) - 1
+        return Position(line, offset - self._line_starts[line])
+
+
+def apply_text_edits(text: str, edits: t.Sequence[TextEdit]) -> str:
+    """
+    Apply the edits of one document and return the new text.
+
+    All ranges refer to the original text, as in the LSP. Inserts at the same
+    position are applied in the order they appear in `edits`. Raises
+    OverlappingEditsError if two edits change the same part of the text.
+    """
+    if not edits:
+        return text
+
+    index = _LineIndex(text)
+    spans = []
+    for i, edit in enumerate(edits):
+        start = index.offset(edit.range.start)
+        end = index.offset(edit.range.end)
+        # Inserts go before a replacement starting at the same offset, and
+        # `i` keeps the order of inserts at the same offset.
+        spans.append((start, end > start, i, end, edit))
+    spans.sort()
+
+    pieces = []
+    previous_end = 0
+    for start, _, _, end, edit in spans:
+        if start < previous_end:
+            raise OverlappingEditsError(
+                f"edit at {edit.range.start} overlaps the edit before it,"
+                f" which ends at {index.position(previous_end)}"
+            )
+        pieces.append(text[previous_end:start])
+        pieces.append(edit.newText)
+        previous_end = max(start, end)
+    pieces.append(text[previous_end:])
+    return "".join(pieces)
+
+
+def _edits_by_uri(edit: WorkspaceEdit) -> t.Dict[str, t.List[t.List[TextEdit]]]:
+    # A document can have several TextDocumentEdits, which are applied one
+    # after another.
+    result: t.Dict[str, t.List[t.List[TextEdit]]] = {}
+    if edit.documentChanges is not None:
+        # Servers send documentChanges instead of changes when both are
+        # supported, and the spec says that changes are then ignored.
+        for document_edit in edit.documentChanges:
+            result.setdefault(document_edit.textDocument.uri, []).append(
+                document_edit.edits
+            )
+    elif edit.changes is not None:
+        for uri, edits in edit.changes.items():
+            result[uri] = [edits]
+    return result
+
+
+def apply_workspace_edit(
+    edit: WorkspaceEdit,
+    get_text: t.Callable[[str], str],
+    max_workers: t.Optional[int] = None,
+) -> t.Dict[str, str]:
+    """
+    Compute the new texts of all documents changed by a workspace edit.
+
+    `get_text` returns the current text of a document given its uri, e.g. by
+    reading the file or from an editor buffer. With many documents, the work
+    is done in a thread pool of `max_workers` threads (see
+    `concurrent.futures.ThreadPoolExecutor`), which mostly helps when
+    `get_text` reads files. Use `max_workers=1` to do everything in the
+    calling thread.
+
+    Returns the new texts by uri. See also `Client.apply_workspace_edit()`,
+    which also notifies the server about changes to open documents.
+    """
+    edits_by_uri = _edits_by_uri(edit)
+
+    def apply(uri: str) -> str:
+        text = get_text(uri)
+        for edits in edits_by_uri[uri]:
+            text = apply_text_edits(text, edits)
+        return text
+
+    if max_workers == 1 or len(edits_by_uri) <= 1:
+        return {uri: apply(uri) for uri in edits_by_uri}
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        return dict(zip(edits_by_uri, executor.map(apply, edits_by_uri)))
@@ -0,0 +1,224 @@
+import typing as t
+
+from .completion import _fuzzy_score
+from .events import Event, MWorkspaceSymbols, ResponseError
+from .structs import Id, SymbolInformation
+
+if t.TYPE_CHECKING:
+    from .client import Client
+
+_SymbolKey = t.Tuple[str, int, str, t.Tuple[int, int, int, int], t.Optional[str]]
+
+
+def _symbol_key(symbol: SymbolInformation) -> _SymbolKey:
+    range = symbol.location.range
+    return (
+        symbol.name,
+        int(symbol.kind),
+        symbol.location.uri,
+        (*range.start, *range.end),
+        symbol.containerName,
+    )
+
+
+class _IndexedSymbol:
+    __slots__ = ("symbol", "name", "lower", "last_seen")
+
+    def __init__(self, symbol: SymbolInformation, last_seen: float) -> None:
+        self.symbol = symbol
+        self.name = symbol.name
+        self.lower = symbol.name.lower()
+        # When the request of the newest response containing the symbol was
+        # sent
+        self.last_seen = last_seen
+
+
+class WorkspaceSymbolIndex:
+    """
+    Answers workspace symbol queries locally from the results of earlier
+    workspace/symbol requests, e.g. for a "go to symbol" picker.
+
+    Servers return the symbols matching a query, so the result of a query
+    also contains all matches of any query that contains it. For example,
+    after the server has answered "pars", the symbols for "parse" and
+    "parse_h" are known without asking again. `search()` uses the index
+    when a fresh enough response (younger than `max_age` seconds) covers
+    the query, and otherwise sends a new request and returns the best
+    matches known so far. Pass the events from `Client.recv()` to
+    `handle()`, and call `search()` again when it returns True::
+
+        results = index.search(query, time.monotonic())
+        sock.sendall(client.send())
+        for event in client.recv(sock.recv(4096)):
+            if index.handle(event):
+                results = index.search(query, time.monotonic())
+
+    Many servers return only a limited number of symbols, such as 100.
+    With `server_result_limit` set to that number, a response with that
+    many symbols is considered truncated, and it doesn't cover other
+    queries.
+
+    Symbols are matched and ranked locally by fuzzy matching their names
+    with the query, like completion items in `CompletionSession`.
+    """
+
+    def __init__(
+        self,
+        client: "Client",
+        max_age: float = 60.0,
+        server_result_limit: t.Optional[int] = None,
+    ) -> None:
+        self.client = client
+        self.max_age = max_age
+        self.server_result_limit = server_result_limit
+
+        self._symbols: t.Dict[int, _IndexedSymbol] = {}
+        self._ids: t.Dict[_SymbolKey, int] = {}
+        self._next_id = 0
+        # Ids of the symbols whose lowercase name contains each character.
+        # A symbol can only match a query if it has all of its characters.
+        self._postings: t.Dict[str, t.Set[int]] = {}
+
+        # Queries whose complete results are in the index, with the times
+        # their requests were sent
+        self._fetched: t.Dict[str, float] = {}
+        self._in_flight: t.Dict[Id, t.Tuple[str, float]] = {}
+
+        # Typing more characters can only remove matches, so the matches of
+        # the previous search are filtered instead of all candidates.
+        self._last_search: t.Optional[t.Tuple[str, t.Optional[float]]] = None
+        self._last_matches: t.List[_IndexedSymbol] = []
+
+    @property
+    def done(self) -> bool:
+        """True if no requests are waiting for responses."""
+        return not self._in_flight
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def _covering_fetch(self, query: str, now: float) -> t.Optional[float]:
+        # The newest response is used, because symbols that it doesn't
+        # contain but older responses do are no longer in the workspace.
+        times = [
+            fetch_time
+            for fetched_query, fetch_time in self._fetched.items()
+            if fetched_query in query and now - fetch_time < self.max_age
+        ]
+        return max(times, default=None)
+
+    def _awaits_covering_response(self, query: str, now: float) -> bool:
+        # While typing, the request for the first characters is usually
+        # still waiting for its response, and it will cover the rest.
+        return any(
+            requested_query in query and now - sent_time < self.max_age
+            for requested_query, sent_time in self._in_flight.values()
+        )
+
+    def covers(self, query: str, now: float) -> bool:
+        """True if `search()` can answer `query` without the server."""
+        return self._covering_fetch(query, now) is not None
+
+    def search(
+        self, query: str, now: float, limit: int = 100
+    ) -> t.List[SymbolInformation]:
+        """
+        Symbols matching `query`, best first.
+
+        If the index doesn't cover `query`, a workspace/symbol request is
+        sent, unless a request whose response will cover `query` is already
+        waiting for it. Until the response arrives, the result is only the
+        best guess.
+        """
+        since = self._covering_fetch(query, now)
+        if since is None and not self._awaits_covering_response(query, now):
+            self._in_flight[self.client.workspace_symbol(query)] = (query, now)
+
+        if (
+            self._last_search is not None
+            and query.startswith(self._last_search[0])
+            and since == self._last_search[1]
+        ):
+            candidates: t.Iterable[_IndexedSymbol] = self._last_matches
+        else:
+            candidates = self._candidates(query.lower(), since)
+
+        query_lower = query.lower()
+        scored = []
+        for indexed in candidates:
+            score = _fuzzy_score(query, query_lower, indexed.name, indexed.lower)
+            if score is not None:
+                scored.append((-score, len(indexed.name), indexed.name, indexed))
+        scored.sort(key=lambda entry: entry[:3])
+
+        self._last_search = (query, since)
+        self._last_matches = [entry[3] for entry in scored]
+        return [indexed.symbol for indexed in self._last_matches[:limit]]
+
+    def _candidates(
+        self, query_lower: str, since: t.Optional[float]
+    ) -> t.List[_IndexedSymbol]:
+        if query_lower:
+            postings = sorted(
+                (self._postings.get(char, set()) for char in set(query_lower)), key=len
+            )
+            ids: t.Iterable[int] = postings[0].intersection(*postings[1:])
+        else:
+            ids = self._symbols.keys()
+        symbols = [self._symbols[id] for id in ids]
+        if since is not None:
+            symbols = [indexed for indexed in symbols if indexed.last_seen >= since]
+        return symbols
+
+    def handle(self, event: Event) -> bool:
+        """Handle an event if it's a response to the index's requests."""
+        if not isinstance(event, (MWorkspaceSymbols, ResponseError)):
+            return False
+        if event.message_id not in self._in_flight:
+            return False
+
+        query, sent_time = self._in_flight.pop(event.message_id)
+        if isinstance(event, ResponseError):
+            return True
+
+        symbols = event.result or []
+        for symbol in symbols:
+            self._add(symbol, sent_time)
+        if self.server_result_limit is None or len(symbols) < self.server_result_limit:
+            if sent_time >= self._fetched.get(query, sent_time):
+                self._fetched[query] = sent_time
+        self._forget_older_than(sent_time - self.max_age)
+        self._last_search = None
+        return True
+
+    def _add(self, symbol: SymbolInformation, last_seen: float) -> None:
+        key = _symbol_key(symbol)
+        id = self._ids.get(key)
+        if id is not None:
+            indexed = self._symbols[id]
+            # Responses can arrive in a different order than the requests
+            # were sent.
+            if last_seen >= indexed.last_seen:
+                indexed.symbol = symbol
+                indexed.last_seen = last_seen
+            return
+
+        id = self._next_id
+        self._next_id += 1
+        indexed = _IndexedSymbol(symbol, last_seen)
+        self._ids[key] = id
+        self._symbols[id] = indexed
+        for char in set(indexed.lower):
+            self._postings.setdefault(char, set()).add(id)
+
+    def _forget_older_than(self, time: float) -> None:
+        for query, fetch_time in list(self._fetched.items()):
+            if fetch_time < time:
+                del self._fetched[query]
+        for key, id in list(self._ids.items()):
+            indexed = self._symbols[id]
+            if indexed.last_seen < time:
+                del self._ids[key]
+                del self._symbols[id]
+                for char in set(indexed.lower):
+                    self._postings[char].discard(id)
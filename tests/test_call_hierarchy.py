@@ -0,0 +1,106 @@
+import sansio_lsp_client as lsp
+from sansio_lsp_client.io_handler import _make_response
+
+from test_client import initialized_client, sent_messages
+
+
+def item_json(name, line):
+    return {
+        "name": name,
+        "kind": 12,
+        "uri": "file:///a.py",
+        "range": {
+            "start": {"line": line, "character": 0},
+            "end": {"line": line + 1, "character": 0},
+        },
+        "selectionRange": {
+            "start": {"line": line, "character": 4},
+            "end": {"line": line, "character": 4 + len(name)},
+        },
+    }
+
+
+# main calls a and b, both of them call shared, shared calls main
+GRAPH = {"main": ["a", "b"], "a": ["shared"], "b": ["shared"], "shared": ["main"]}
+LINES = {"main": 0, "a": 10, "b": 20, "shared": 30}
+
+
+def outgoing_calls_json(name):
+    return [
+        {"to": item_json(callee, LINES[callee]), "fromRanges": []}
+        for callee in GRAPH[name]
+    ]
+
+
+def test_incoming_and_outgoing_calls():
+    client = initialized_client()
+    item = lsp.CallHierarchyItem.model_validate(item_json("main", 0))
+
+    incoming_id = client.incoming_calls(item)
+    outgoing_id = client.outgoing_calls(item)
+    incoming_request, outgoing_request = sent_messages(client)
+    assert incoming_request.method == "callHierarchy/incomingCalls"
+    assert incoming_request.params == {"item": item_json("main", 0)}
+    assert outgoing_request.method == "callHierarchy/outgoingCalls"
+
+    incoming, outgoing = client.recv(
+        _make_response(
+            id=incoming_id,
+            result=[
+                {
+                    "from": item_json("shared", 30),
+                    "fromRanges": [item_json("x", 31)["selectionRange"]],
+                }
+            ],
+        )
+        + _make_response(id=outgoing_id, result=outgoing_calls_json("main"))
+    )
+    assert isinstance(incoming, lsp.MCallHierarchyIncomingCalls)
+    assert incoming.message_id == incoming_id
+    assert incoming.result[0].from_.name == "shared"
+    assert incoming.result[0].fromRanges[0].start == lsp.Position(31, 4)
+    assert isinstance(outgoing, lsp.MCallHierarchyOutgoingCalls)
+    assert [call.to.name for call in outgoing.result] == ["a", "b"]
+
+
+def test_expander():
+    client = initialized_client()
+    expander = lsp.CallHierarchyExpander(client, "outgoing", max_in_flight=2)
+    expander.start([lsp.CallHierarchyItem.model_validate(item_json("main", 0))])
+
+    requested = []
+    max_in_flight = 0
+    while not expander.done:
+        requests = sent_messages(client)
+        max_in_flight = max(max_in_flight, len(expander._in_flight))
+        assert requests
+        response = b""
+        for request in requests:
+            name = request.params["item"]["name"]
+            requested.append(name)
+            response += _make_response(id=request.id, result=outgoing_calls_json(name))
+        for event in client.recv(response):
+            assert expander.handle(event)
+
+    # shared is requested once, and main isn't requested again
+    assert requested == ["main", "a", "b", "shared"]
+    assert max_in_flight == 2
+    assert {key[0] for key in expander.items} == {"file:///a.py"}
+    assert {item.name for item in expander.items.values()} == set(GRAPH)
+    shared = lsp.CallHierarchyItem.model_validate(item_json("shared", 30))
+    calls = expander.calls[(shared.uri, shared.selectionRange)]
+    assert [call.to.name for call in calls] == ["main"]
+
+
+def test_expander_max_depth_and_errors():
+    client = initialized_client()
+    expander = lsp.CallHierarchyExpander(client, "outgoing", max_depth=1)
+    expander.start([lsp.CallHierarchyItem.model_validate(item_json("main", 0))])
+    [request] = sent_messages(client)
+    [event] = client.recv(
+        _make_response(id=request.id, error={"code": -32603, "message": "oops"})
+    )
+    assert expander.handle(event)
+    assert expander.done
+    assert list(expander.errors.values())[0].message == "oops"
+    assert not expander.handle(lsp.Shutdown())
@@ -0,0 +1,102 @@
+import pytest
+
+import sansio_lsp_client as lsp
+from sansio_lsp_client import capabilities
+from sansio_lsp_client.capabilities import _compile_glob
+from sansio_lsp_client.io_handler import _make_request
+
+from test_client import initialized_client
+
+
+@pytest.mark.parametrize(
+    "pattern, path, matches",
+    [
+        ("**/*.py", "/home/foo/bar.py", True),
+        ("**/*.py", "/home/foo/bar.pyi", False),
+        ("/src/*.py", "/src/a/bar.py", False),
+        ("/src/**/*.{c,h}", "/src/a/b/foo.h", True),
+        ("/src/**/*.{c,h}", "/src/foo.c", True),
+        ("**/test_?.py", "/x/test_1.py", True),
+        ("**/[!a]*.rs", "/x/bar.rs", True),
+        ("**/[!a]*.rs", "/x/a.rs", False),
+        ("**/build/**", "/x/build/out/a.o", True),
+    ],
+)
+def test_glob(pattern, path, matches):
+    assert bool(_compile_glob(pattern).match(path)) == matches
+
+
+def test_static_capabilities():
+    registry = lsp.CapabilityRegistry()
+    registry.set_server_capabilities(
+        {
+            "hoverProvider": True,
+            "definitionProvider": False,
+            "referencesProvider": {},
+            "semanticTokensProvider": {"full": True, "range": False},
+        }
+    )
+    assert registry.supports("textDocument/hover")
+    assert not registry.supports("textDocument/definition")
+    assert registry.supports("textDocument/references")
+    assert not registry.supports("textDocument/inlayHint")
+    assert registry.supports("textDocument/semanticTokens/full")
+    assert not registry.supports("textDocument/semanticTokens/full/delta")
+    assert not registry.supports("textDocument/semanticTokens/range")
+    assert registry.supports("textDocument/didOpen")  # can't be advertised
+
+
+def test_dynamic_registrations():
+    client = initialized_client()
+    assert not client.supports("textDocument/inlayHint")
+
+    [request] = client.recv(
+        _make_request(
+            "client/registerCapability",
+            {
+                "registrations": [
+                    {
+                        "id": "1",
+                        "method": "textDocument/inlayHint",
+                        "registerOptions": {
+                            "documentSelector": [
+                                {"language": "rust"},
+                                {"scheme": "file", "pattern": "**/*.toml"},
+                            ]
+                        },
+                    }
+                ]
+            },
+            id=1,
+        )
+    )
+    request.reply()
+
+    client.did_open(
+        lsp.TextDocumentItem(
+            uri="file:///a/b.rs", languageId="rust", version=0, text=""
+        )
+    )
+    assert client.supports("textDocument/inlayHint")
+    assert client.supports("textDocument/inlayHint", "file:///a/b.rs")
+    assert client.supports("textDocument/inlayHint", "file:///a/Cargo.toml")
+    assert not client.supports("textDocument/inlayHint", "file:///a/b.py")
+
+    [request] = client.recv(
+        _make_request(
+            "client/unregisterCapability",
+            {"unregisterations": [{"id": "1", "method": "textDocument/inlayHint"}]},
+            id=2,
+        )
+    )
+    assert isinstance(request, lsp.UnregisterCapabilityRequest)
+    assert not client.supports("textDocument/inlayHint", "file:///a/b.rs")
+
+
+def test_supports_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(capabilities, "_SUPPORTS_CACHE_SIZE", 3)
+    registry = lsp.CapabilityRegistry()
+    registry.set_server_capabilities({"hoverProvider": True})
+    for i in range(10):
+        assert registry.supports("textDocument/hover", f"file:///{i}.py", "python")
+    assert len(registry._cache) == 3
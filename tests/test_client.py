@@ -0,0 +1,544 @@
+import json
+
+import pytest
+
+import sansio_lsp_client as lsp
+from sansio_lsp_client.io_handler import _make_request, _make_response, _parse_messages
+
+
+def initialized_client(**kwargs):
+    client = lsp.Client(**kwargs)
+    client.send()
+    [event] = client.recv(_make_response(id=0, result={"capabilities": {}}))
+    assert isinstance(event, lsp.Initialized)
+    client.send()
+    return client
+
+
+def diagnostic_json(line, message):
+    return {
+        "range": {
+            "start": {"line": line, "character": 0},
+            "end": {"line": line, "character": 1},
+        },
+        "severity": 1,
+        "message": message,
+    }
+
+
+def publish(uri, *diagnostics):
+    return _make_request(
+        "textDocument/publishDiagnostics",
+        {"uri": uri, "diagnostics": list(diagnostics)},
+    )
+
+
+def test_diagnostics_delta():
+    client = initialized_client(publish_diagnostics="delta")
+
+    [delta] = client.recv(
+        publish("file:///a", diagnostic_json(0, "a"), diagnostic_json(1, "b"))
+    )
+    assert isinstance(delta, lsp.DiagnosticsDelta)
+    assert [d.message for d in delta.added] == ["a", "b"]
+    assert delta.removed == []
+    assert delta.unchanged == 0
+
+    [delta] = client.recv(
+        publish("file:///a", diagnostic_json(1, "b"), diagnostic_json(2, "c"))
+    )
+    assert [d.message for d in delta.added] == ["c"]
+    assert [d.message for d in delta.removed] == ["a"]
+    assert delta.unchanged == 1
+
+    [delta] = client.recv(publish("file:///a"))
+    assert [d.message for d in delta.removed] == ["b", "c"]
+
+
+def test_diagnostics_both():
+    client = initialized_client(publish_diagnostics="both")
+    full, delta = client.recv(publish("file:///a", diagnostic_json(0, "a")))
+    assert isinstance(full, lsp.PublishDiagnostics)
+    assert isinstance(delta, lsp.DiagnosticsDelta)
+    assert delta.added == full.diagnostics
+
+
+def progress(token, kind, **value):
+    return _make_request(
+        "$/progress", {"token": token, "value": {"kind": kind, **value}}
+    )
+
+
+def test_coalesce_notifications():
+    client = initialized_client(coalesce_notifications=True)
+    data = b"".join(
+        [
+            progress("t", "begin", title="Indexing"),
+            publish("file:///a", diagnostic_json(0, "old")),
+            progress("t", "report", percentage=10),
+            publish("file:///b", diagnostic_json(0, "b")),
+            progress("t", "report", percentage=20),
+            publish("file:///a", diagnostic_json(0, "new")),
+            progress("u", "report", percentage=50),
+        ]
+    )
+    events = list(client.recv(data))
+    assert [type(e) for e in events] == [
+        lsp.WorkDoneProgressBegin,
+        lsp.PublishDiagnostics,
+        lsp.WorkDoneProgressReport,
+        lsp.PublishDiagnostics,
+        lsp.WorkDoneProgressReport,
+    ]
+    assert events[1].uri == "file:///b"
+    assert events[2].value.percentage == 20
+    assert events[3].diagnostics[0].message == "new"
+    assert events[4].token == "u"
+
+    events = list(
+        client.recv(progress("t", "report", percentage=90) + progress("t", "end"))
+    )
+    assert [type(e) for e in events] == [lsp.WorkDoneProgressEnd]
+
+
+def test_coalesce_notifications_errors():
+    client = initialized_client(coalesce_notifications=True)
+    malformed = b"Content-Length: 5\r\n\r\n{oops"
+    invalid = _make_request("textDocument/publishDiagnostics", {"uri": 123})
+    data = b"".join(
+        [
+            publish("file:///a", diagnostic_json(0, "a")),
+            invalid,
+            publish("file:///b", diagnostic_json(0, "b")),
+            malformed,
+            publish("file:///c", diagnostic_json(0, "c")),
+        ]
+    )
+    events = []
+    with pytest.raises(ValueError):
+        for event in client.recv(data):
+            events.append(event)
+    assert [event.uri for event in events] == ["file:///a"]
+
+    # The frames after the invalid one were already out of the buffer, but
+    # they aren't lost. The malformed message is reported after them.
+    events = []
+    with pytest.raises(json.JSONDecodeError):
+        for event in client.recv(b""):
+            events.append(event)
+    assert [event.uri for event in events] == ["file:///b"]
+
+    [event] = client.recv(b"")
+    assert event.uri == "file:///c"
+
+
+def sent_messages(client):
+    buf = bytearray(client.send())
+    return list(_parse_messages(buf))
+
+
+def test_pull_diagnostics():
+    client = initialized_client()
+    doc = lsp.TextDocumentItem(uri="file:///a", languageId="python", version=0, text="")
+    client.did_open(doc)
+    client.send()
+
+    [first_id] = client.pull_diagnostics(["file:///a", "file:///b"])
+    assert client.pull_diagnostics(["file:///a"]) == []  # already in flight
+    [request] = sent_messages(client)
+    assert request.method == "textDocument/diagnostic"
+    assert "previousResultId" not in request.params
+
+    [event] = client.recv(
+        _make_response(
+            id=first_id,
+            result={
+                "kind": "full",
+                "resultId": "1",
+                "items": [diagnostic_json(0, "a")],
+            },
+        )
+    )
+    assert isinstance(event, lsp.DocumentDiagnostics)
+    assert event.kind == lsp.DocumentDiagnosticReportKind.FULL
+    assert [d.message for d in event.items] == ["a"]
+    assert client.pull_diagnostics(["file:///a"]) == []  # not dirty
+
+    client.did_change(
+        lsp.VersionedTextDocumentIdentifier(uri="file:///a", version=1),
+        [lsp.TextDocumentContentChangeEvent.whole_document_change("x")],
+    )
+    [second_id] = client.pull_diagnostics(["file:///a"])
+    [_, request] = sent_messages(client)
+    assert request.params["previousResultId"] == "1"
+
+    [unchanged] = client.recv(
+        _make_response(id=second_id, result={"kind": "unchanged", "resultId": "1"})
+    )
+    assert unchanged.kind == lsp.DocumentDiagnosticReportKind.UNCHANGED
+    assert unchanged.items == event.items
+
+    [refresh] = client.recv(_make_request("workspace/diagnostic/refresh", id=7))
+    assert isinstance(refresh, lsp.DiagnosticRefreshRequest)
+    refresh.reply()
+    assert len(client.pull_diagnostics(["file:///a"])) == 1
+
+
+def test_pull_diagnostics_after_close():
+    client = initialized_client()
+    doc = lsp.TextDocumentItem(uri="file:///a", languageId="python", version=0, text="")
+    client.did_open(doc)
+    [first_id] = client.pull_diagnostics(["file:///a"])
+    sent_messages(client)
+    list(
+        client.recv(
+            _make_response(
+                id=first_id, result={"kind": "full", "resultId": "1", "items": []}
+            )
+        )
+    )
+
+    client.did_change(
+        lsp.VersionedTextDocumentIdentifier(uri="file:///a", version=1),
+        [lsp.TextDocumentContentChangeEvent.whole_document_change("x")],
+    )
+    [unchanged_id] = client.pull_diagnostics(["file:///a"])
+    client.did_close(lsp.TextDocumentIdentifier(uri="file:///a"))
+    sent_messages(client)
+    # The diagnostics that didn't change were forgotten when closing
+    response = {"kind": "unchanged", "resultId": "1"}
+    assert list(client.recv(_make_response(id=unchanged_id, result=response))) == []
+
+    # Reopening doesn't wait for the response that was in flight when closing
+    client.did_open(doc)
+    [full_id] = client.pull_diagnostics(["file:///a"])
+    client.did_close(lsp.TextDocumentIdentifier(uri="file:///a"))
+    client.did_open(doc)
+    assert len(client.pull_diagnostics(["file:///a"])) == 1
+    client.did_close(lsp.TextDocumentIdentifier(uri="file:///a"))
+    sent_messages(client)
+
+    response = {"kind": "full", "resultId": "2", "items": [diagnostic_json(0, "a")]}
+    [event] = client.recv(_make_response(id=full_id, result=response))
+    assert [d.message for d in event.items] == ["a"]
+    # The late response wasn't remembered
+    client.did_open(doc)
+    client.pull_diagnostics(["file:///a"])
+    [_, request] = sent_messages(client)
+    assert request.method == "textDocument/diagnostic"
+    assert "previousResultId" not in request.params
+
+
+def test_resolve_completion_item_cache():
+    client = initialized_client()
+    item = lsp.CompletionItem(label="foo", data={"id": 1})
+
+    first_id = client.resolve_completion_item(item)
+    [request] = sent_messages(client)
+    assert request.method == "completionItem/resolve"
+    assert request.params == {"label": "foo", "data": {"id": 1}}
+
+    [resolved] = client.recv(
+        _make_response(
+            id=first_id, result={"label": "foo", "data": {"id": 1}, "detail": "bar"}
+        )
+    )
+    assert isinstance(resolved, lsp.CompletionItemResolve)
+    assert resolved.message_id == first_id
+    assert resolved.item.detail == "bar"
+
+    second_id = client.resolve_completion_item(item)
+    assert second_id != first_id
+    assert client.send() == b""
+    [cached] = client.drain_local()
+    assert cached.message_id == second_id
+    assert cached.item.detail == "bar"
+
+
+def location_json(line):
+    return {
+        "uri": "file:///a",
+        "range": {
+            "start": {"line": line, "character": 0},
+            "end": {"line": line, "character": 1},
+        },
+    }
+
+
+def test_partial_results():
+    client = initialized_client()
+    id = client.references(
+        lsp.TextDocumentPosition(
+            textDocument=lsp.TextDocumentIdentifier(uri="file:///a"),
+            position=lsp.Position(line=0, character=0),
+        ),
+        partial_results=True,
+    )
+    [request] = sent_messages(client)
+    token = request.params["partialResultToken"]
+
+    events = list(
+        client.recv(
+            _make_request("$/progress", {"token": token, "value": [location_json(1)]})
+            + _make_request(
+                "$/progress",
+                {"token": token, "value": [location_json(2), location_json(3)]},
+            )
+            + _make_response(id=id, result=[])
+        )
+    )
+    first, second, final = events
+    assert isinstance(first, lsp.PartialResult)
+    assert first.message_id == id
+    assert [location.range.start.line for location in first.result] == [1]
+    assert [location.range.start.line for location in second.result] == [2, 3]
+    assert isinstance(final, lsp.References)
+    assert final.result == []
+    assert final.delivered_partial_results == 2
+
+
+def test_skip_unsupported_requests():
+    client = lsp.Client(skip_unsupported_requests=True)
+    client.send()
+    list(
+        client.recv(
+            _make_response(
+                id=0,
+                result={
+                    "capabilities": {
+                        "hoverProvider": True,
+                        "foldingRangeProvider": False,
+                    }
+                },
+            )
+        )
+    )
+    client.send()
+    doc = lsp.TextDocumentIdentifier(uri="file:///a")
+
+    folding_id = client.folding_range(doc)
+    inlay_id = client.inlay_hint(
+        doc,
+        lsp.Range(
+            start=lsp.Position(line=0, character=0),
+            end=lsp.Position(line=9, character=0),
+        ),
+    )
+    diagnostic_id = client.document_diagnostic(doc)
+    hover_id = client.hover(
+        lsp.TextDocumentPosition(
+            textDocument=doc, position=lsp.Position(line=0, character=0)
+        )
+    )
+    assert [request.id for request in sent_messages(client)] == [hover_id]
+
+    folding, inlay, diagnostic = client.drain_local()
+    assert isinstance(folding, lsp.MFoldingRanges)
+    assert folding.message_id == folding_id
+    assert folding.result == []
+    assert isinstance(inlay, lsp.MInlayHints)
+    assert inlay.message_id == inlay_id
+    assert isinstance(diagnostic, lsp.DocumentDiagnostics)
+    assert diagnostic.message_id == diagnostic_id
+    assert diagnostic.items == []
+
+
+def test_stream_large_results():
+    client = initialized_client(stream_results_larger_than=1000)
+    position = lsp.TextDocumentPosition(
+        textDocument=lsp.TextDocumentIdentifier(uri="file:///a"),
+        position=lsp.Position(line=0, character=0),
+    )
+    small_id = client.references(position)
+    big_id = client.references(position)
+    client.send()
+
+    locations = [location_json(line) for line in range(100)]
+    data = (
+        _make_response(id=small_id, result=locations[:2])
+        + _make_response(id=big_id, result=locations)
+        + publish("file:///a")
+    )
+
+    events = []
+    for start in range(0, len(data), 700):
+        events.extend(client.recv(data[start : start + 700]))
+
+    small, *partials, final, diagnostics = events
+    assert isinstance(small, lsp.References)
+    assert small.delivered_partial_results == 0
+    assert len(small.result) == 2
+    assert len(partials) > 3
+    assert all(
+        isinstance(p, lsp.PartialResult) and p.message_id == big_id for p in partials
+    )
+    lines = [location.range.start.line for p in partials for location in p.result]
+    assert lines == list(range(100))
+    assert isinstance(final, lsp.References)
+    assert final.message_id == big_id
+    assert final.result == []
+    assert final.delivered_partial_results == len(partials)
+    assert isinstance(diagnostics, lsp.PublishDiagnostics)
+    assert client._recv_buf == b""
+
+
+def test_stream_large_results_only_lists():
+    client = initialized_client(stream_results_larger_than=10)
+    id = client.references(
+        lsp.TextDocumentPosition(
+            textDocument=lsp.TextDocumentIdentifier(uri="file:///a"),
+            position=lsp.Position(line=0, character=0),
+        )
+    )
+    # The result comes before the id, so the response can't be streamed
+    body = json.dumps({"result": [location_json(1)], "jsonrpc": "2.0", "id": id})
+    [event] = client.recv(b"Content-Length: %d\r\n\r\n%s" % (len(body), body.encode()))
+    assert isinstance(event, lsp.References)
+    assert event.delivered_partial_results == 0
+    assert len(event.result) == 1
+
+
+def feed_in_pieces(client, data, size=100):
+    events = []
+    for start in range(0, len(data), size):
+        events.extend(client.recv(data[start : start + size]))
+    return events
+
+
+def test_max_message_size_skip():
+    client = initialized_client(max_message_size=1000, oversized_messages="skip")
+    id = client.workspace_symbol("foo")
+    client.send()
+
+    big = [{"name": "x" * 100, "kind": 12, "location": location_json(1)}] * 20
+    events = feed_in_pieces(
+        client,
+        _make_request("window/logMessage", {"type": 3, "message": "x" * 2000})
+        + _make_response(id=id, result=big)
+        + publish("file:///a"),
+    )
+    log_skipped, response_skipped, diagnostics = events
+    assert isinstance(log_skipped, lsp.MessageSkipped)
+    assert log_skipped.message_id is None
+    assert isinstance(response_skipped, lsp.MessageSkipped)
+    assert response_skipped.message_id == id
+    assert response_skipped.content_length > 1000
+    assert isinstance(diagnostics, lsp.PublishDiagnostics)
+    assert client._unanswered_requests == {}
+    assert client._recv_buf == b""
+
+
+def test_max_message_size_raise():
+    client = initialized_client(max_message_size=1000)
+    data = _make_request("window/logMessage", {"type": 3, "message": "x" * 2000})
+    with pytest.raises(lsp.MessageTooLargeError):
+        list(client.recv(data[:500]))
+    # The rest of the message is skipped after the error
+    [skipped, diagnostics] = client.recv(data[500:] + publish("file:///a"))
+    assert isinstance(skipped, lsp.MessageSkipped)
+    assert isinstance(diagnostics, lsp.PublishDiagnostics)
+
+
+def test_spill_messages():
+    client = initialized_client(spill_messages_larger_than=1000)
+    id = client.references(
+        lsp.TextDocumentPosition(
+            textDocument=lsp.TextDocumentIdentifier(uri="file:///a"),
+            position=lsp.Position(line=0, character=0),
+        )
+    )
+    client.send()
+
+    data = _make_response(id=id, result=[location_json(i) for i in range(50)])
+    events = feed_in_pieces(client, data[:-1])
+    assert events == []
+    assert len(client._recv_buf) < 100  # the content went to a file
+    references, diagnostics = client.recv(data[-1:] + publish("file:///a"))
+    assert isinstance(references, lsp.References)
+    assert [location.range.start.line for location in references.result] == list(
+        range(50)
+    )
+    assert isinstance(diagnostics, lsp.PublishDiagnostics)
+
+
+def test_stream_before_spill():
+    client = initialized_client(
+        stream_results_larger_than=1000, spill_messages_larger_than=1000
+    )
+    id = client.references(
+        lsp.TextDocumentPosition(
+            textDocument=lsp.TextDocumentIdentifier(uri="file:///a"),
+            position=lsp.Position(line=0, character=0),
+        )
+    )
+    client.send()
+
+    events = feed_in_pieces(
+        client,
+        _make_request("window/logMessage", {"type": 3, "message": "x" * 2000})
+        + _make_response(id=id, result=[location_json(i) for i in range(50)]),
+    )
+    assert isinstance(events[0], lsp.LogMessage)
+    assert isinstance(events[1], lsp.PartialResult)
+    assert isinstance(events[-1], lsp.References)
+    assert events[-1].delivered_partial_results == len(events) - 2
+
+
+def test_raw_validation():
+    client = lsp.Client(validation="raw", spill_messages_larger_than=1000)
+    client.send()
+    [initialized] = client.recv(
+        _make_response(id=0, result={"capabilities": {}, "serverInfo": {"name": "x"}})
+    )
+    assert isinstance(initialized, lsp.RawResponse)
+    assert (initialized.method, initialized.message_id) == ("initialize", 0)
+    assert client.state == lsp.ClientState.NORMAL
+    [notification] = sent_messages(client)
+    assert notification.method == "initialized"
+
+    position = lsp.TextDocumentPosition(
+        textDocument=lsp.TextDocumentIdentifier(uri="file:///a"),
+        position=lsp.Position(line=0, character=0),
+    )
+    hover_id = client.hover(position)
+    definition_id = client.definition(position)
+    client.send()
+    registration = {"id": "1", "method": "textDocument/inlayHint"}
+    events = feed_in_pieces(
+        client,
+        _make_response(id=hover_id, result={"contents": "x" * 2000})
+        + _make_request("window/logMessage", {"type": 3, "message": "hi"})
+        + _make_request(
+            "client/registerCapability", {"registrations": [registration]}, id="r"
+        )
+        + _make_response(
+            id=definition_id, error={"code": -32601, "message": "not supported"}
+        ),
+    )
+    hover, log, register, definition = events
+    assert isinstance(hover, lsp.RawResponse)
+    assert hover.method == "textDocument/hover"
+    assert hover.payload == {"contents": "x" * 2000}
+    assert isinstance(log, lsp.RawServerNotification)
+    assert log.method == "window/logMessage"
+    assert log.message_id is None
+    assert log.payload == {"type": 3, "message": "hi"}
+    assert isinstance(register, lsp.RawServerRequest)
+    assert client.supports("textDocument/inlayHint")
+    assert isinstance(definition, lsp.RawResponse)
+    assert definition.payload is None
+    assert definition.error["code"] == -32601
+    assert client._unanswered_requests == {}
+
+    register.reply()
+    [response] = sent_messages(client)
+    assert (response.id, response.result) == ("r", None)
+
+    client.shutdown()
+    client.send()
+    [shutdown] = client.recv(_make_response(id=client._id_counter - 1, result=None))
+    assert shutdown.method == "shutdown"
+    assert client.state == lsp.ClientState.SHUTDOWN
+
+    with pytest.raises(ValueError):
+        lsp.Client(validation="raw", stream_results_larger_than=1000)
@@ -0,0 +1,45 @@
+import sansio_lsp_client as lsp
+
+from test_client import initialized_client
+from sansio_lsp_client.io_handler import _make_response
+
+RESULT = {
+    "isIncomplete": False,
+    "items": [
+        {"label": "foo", "kind": 3, "sortText": "b", "detail": "int foo()"},
+        {"label": "bar", "filterText": "bar", "sortText": "a", "insertTextFormat": 2},
+    ],
+}
+
+
+def test_compact_completion_list():
+    completion_list = lsp.CompactCompletionList.from_json(RESULT)
+    assert len(completion_list) == 2
+    assert not completion_list.isIncomplete
+
+    foo, bar = completion_list
+    assert foo.label == "foo"
+    assert foo.kind == lsp.CompletionItemKind.FUNCTION
+    assert foo.insertTextFormat is None
+    assert bar.kind is None
+    assert bar.insertTextFormat == lsp.InsertTextFormat.SNIPPET
+    assert completion_list[-1].label == "bar"
+
+    assert foo.materialize() == lsp.CompletionItem.model_validate(RESULT["items"][0])
+    assert bar.materialize() == lsp.CompletionItem.model_validate(RESULT["items"][1])
+
+
+def test_client_completion_format():
+    client = initialized_client(completion_format="compact")
+    doc_position = lsp.TextDocumentPosition(
+        textDocument=lsp.TextDocumentIdentifier(uri="file:///a"),
+        position=lsp.Position(line=0, character=0),
+    )
+    id = client.completion(doc_position)
+    [event] = client.recv(_make_response(id=id, result=RESULT["items"]))
+    assert isinstance(event, lsp.CompactCompletion)
+    assert event.message_id == id
+    assert [item.label for item in event.completion_list] == ["foo", "bar"]
+
+    session = lsp.CompletionSession(event)
+    assert [item.label for item in session.filter("")] == ["bar", "foo"]
@@ -0,0 +1,51 @@
+import sansio_lsp_client as lsp
+
+
+def make_session(labels, prefix="", is_incomplete=False, **item_kwargs):
+    items = [lsp.CompletionItem(label=label, **item_kwargs) for label in labels]
+    completion = lsp.Completion(
+        completion_list=lsp.CompletionList(isIncomplete=is_incomplete, items=items)
+    )
+    return lsp.CompletionSession(completion, prefix)
+
+
+def labels(items):
+    return [item.label for item in items]
+
+
+def test_filter_and_rank():
+    session = make_session(
+        ["get_default_encoding", "getdefaultencoding", "intern", "gc_enabled"]
+    )
+    assert labels(session.filter("gde")) == [
+        "get_default_encoding",
+        "getdefaultencoding",
+    ]
+    assert labels(session.filter("getd")) == [
+        "getdefaultencoding",
+        "get_default_encoding",
+    ]
+    assert labels(session.filter("int")) == ["intern"]
+    assert session.filter("xyz") == []
+
+
+def test_sort_text_breaks_ties():
+    items = [
+        lsp.CompletionItem(label="foo", sortText="2"),
+        lsp.CompletionItem(label="foo2", filterText="foo", sortText="1"),
+    ]
+    session = lsp.CompletionSession(
+        lsp.Completion(
+            completion_list=lsp.CompletionList(isIncomplete=False, items=items)
+        )
+    )
+    assert labels(session.filter("fo")) == ["foo2", "foo"]
+    assert labels(session.filter("")) == ["foo2", "foo"]
+
+
+def test_requery():
+    session = make_session(["foobar"], prefix="fo")
+    assert session.filter("foo") is not None
+    assert session.filter("f") is None  # went back past the requested prefix
+    assert session.filter("foo.") is None  # left the word
+    assert make_session(["foobar"], is_incomplete=True).filter("foo") is None
@@ -0,0 +1,79 @@
+import random
+
+import sansio_lsp_client as lsp
+
+
+def make_diagnostic(start, end, severity=lsp.DiagnosticSeverity.ERROR, message="x"):
+    return lsp.Diagnostic(
+        range=lsp.Range(
+            start=lsp.Position(line=start[0], character=start[1]),
+            end=lsp.Position(line=end[0], character=end[1]),
+        ),
+        severity=severity,
+        message=message,
+    )
+
+
+def test_point_and_line_queries():
+    index = lsp.DiagnosticsIndex()
+    a = make_diagnostic((0, 0), (0, 5), message="a")
+    b = make_diagnostic((1, 2), (3, 0), lsp.DiagnosticSeverity.WARNING, message="b")
+    c = make_diagnostic((5, 0), (5, 1), message="c")
+    index.update(lsp.PublishDiagnostics(uri="file:///foo", diagnostics=[c, b, a]))
+
+    assert index.at("file:///foo", lsp.Position(line=0, character=3)) == [a]
+    assert index.at("file:///foo", lsp.Position(line=2, character=100)) == [b]
+    assert index.at("file:///foo", lsp.Position(line=4, character=0)) == []
+    assert index.in_lines("file:///foo", 0, 5) == [a, b, c]
+    assert index.in_lines("file:///foo", 3, 4) == [b]
+    assert index.in_lines(
+        "file:///foo", 0, 5, severities={lsp.DiagnosticSeverity.ERROR}
+    ) == [a, c]
+    assert index.in_lines("file:///bar", 0, 5) == []
+
+
+def test_counts_are_updated_incrementally():
+    index = lsp.DiagnosticsIndex()
+    error = make_diagnostic((0, 0), (0, 1))
+    warning = make_diagnostic((0, 0), (0, 1), lsp.DiagnosticSeverity.WARNING)
+
+    index.update(lsp.PublishDiagnostics(uri="file:///a", diagnostics=[error, error]))
+    index.update(lsp.PublishDiagnostics(uri="file:///b", diagnostics=[warning]))
+    assert index.counts() == {
+        lsp.DiagnosticSeverity.ERROR: 2,
+        lsp.DiagnosticSeverity.WARNING: 1,
+    }
+
+    index.update(lsp.PublishDiagnostics(uri="file:///a", diagnostics=[warning]))
+    assert index.counts() == {lsp.DiagnosticSeverity.WARNING: 2}
+    assert index.counts("file:///a") == {lsp.DiagnosticSeverity.WARNING: 1}
+
+    index.update(lsp.PublishDiagnostics(uri="file:///b", diagnostics=[]))
+    assert index.uris == ["file:///a"]
+    assert index.counts() == {lsp.DiagnosticSeverity.WARNING: 1}
+
+
+def test_matches_linear_scan():
+    rng = random.Random(1234)
+    diagnostics = []
+    for i in range(500):
+        start = (rng.randrange(100), rng.randrange(80))
+        end = (start[0] + rng.randrange(3), rng.randrange(80))
+        if end < start:
+            end = start
+        diagnostics.append(make_diagnostic(start, end, message=str(i)))
+
+    index = lsp.DiagnosticsIndex()
+    index.update(lsp.PublishDiagnostics(uri="file:///foo", diagnostics=diagnostics))
+
+    for _ in range(200):
+        first = rng.randrange(100)
+        last = first + rng.randrange(5)
+        expected = {
+            d.message
+            for d in diagnostics
+            if d.range.start.line <= last and d.range.end.line >= first
+        }
+        found = index.in_lines("file:///foo", first, last)
+        assert {d.message for d in found} == expected
+        assert len(found) == len(expected)
@@ -0,0 +1,63 @@
+import importlib
+import inspect
+import subprocess
+import sys
+
+import pydantic
+import pytest
+
+import sansio_lsp_client as lsp
+
+# Run in a fresh interpreter, because the tests have imported everything
+CHECK_IMPORTED_MODULES = """
+import sys
+{statement}
+loaded = [
+    name
+    for name in sys.modules
+    if name == "pydantic" or name.startswith(("pydantic.", "sansio_lsp_client."))
+]
+assert sorted(loaded) == sorted({expected}), loaded
+"""
+
+
+@pytest.mark.parametrize(
+    "statement, expected",
+    [
+        ("import sansio_lsp_client", []),
+        (
+            "from sansio_lsp_client import ResponseCache",
+            ["sansio_lsp_client.response_cache"],
+        ),
+    ],
+)
+def test_import_is_lazy(statement, expected):
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            CHECK_IMPORTED_MODULES.format(statement=statement, expected=expected),
+        ],
+        check=True,
+    )
+
+
+def test_lazy_names():
+    for submodule_name, names in lsp._SUBMODULE_NAMES.items():
+        submodule = importlib.import_module(f"sansio_lsp_client.{submodule_name}")
+        assert getattr(lsp, submodule_name) is submodule
+        for name in names:
+            assert getattr(lsp, name) is getattr(submodule, name)
+        # Every public class and function must be listed
+        for name, value in vars(submodule).items():
+            if (
+                not name.startswith("_")
+                and (inspect.isclass(value) or inspect.isfunction(value))
+                and value.__module__ == submodule.__name__
+            ):
+                assert name in names, f"{submodule_name}.{name} is not listed"
+
+    assert set(lsp.__all__) <= set(dir(lsp))
+    assert lsp.ValidationError is pydantic.ValidationError
+    with pytest.raises(AttributeError):
+        lsp.NoSuchThing
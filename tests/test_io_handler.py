@@ -1,4 +1,16 @@
-from sansio_lsp_client.io_handler import _parse_one_message
+import json
+
+import pytest
+
+from sansio_lsp_client import io_handler
+from sansio_lsp_client.io_handler import (
+    _StreamedText,
+    _make_request,
+    _make_response,
+    _parse_one_message,
+    _start_streamed_list_response,
+    _write_request,
+)
 from sansio_lsp_client.structs import Request, Response
 
 
@@ -101,3 +113,66 @@ def test_parse_one_message_with_array_params():
     assert result[0].id is None
     assert result[0].params == []
     assert len(buffer) == 0  # Buffer should be cleared after parsing
+
+
+def test_write_request_streamed_text(monkeypatch):
+    monkeypatch.setattr(io_handler, "_STREAMED_TEXT_CHUNK_SIZE", 7)
+    text = 'line "one"\n\ttab \\ \x00 h\xe4st \N{SNOWMAN} \U0001f600 end' * 3
+    params = {"textDocument": {"uri": "file:///a"}, "text": text}
+
+    buf = bytearray(b"previous")
+    written = _write_request(
+        buf,
+        "textDocument/didSave",
+        {**params, "text": _StreamedText(text)},
+        id=1,
+    )
+    assert buf.startswith(b"previous")
+    assert written == len(buf) - len(b"previous")
+    assert buf[len(b"previous") :] == _make_request(
+        "textDocument/didSave", params, id=1
+    )
+
+    headers, body = bytes(buf[len(b"previous") :]).split(b"\r\n\r\n")
+    assert b"Content-Length: %d" % len(body) in headers
+    assert json.loads(body)["params"]["text"] == text
+
+
+def test_write_request_several_streamed_texts():
+    params = {"a": _StreamedText(""), "b": [_StreamedText("x"), "y"]}
+    buf = bytearray()
+    _write_request(buf, "foo", params)
+    assert buf == _make_request("foo", {"a": "", "b": ["x", "y"]})
+
+
+def test_write_request_not_serializable():
+    with pytest.raises(TypeError):
+        _write_request(bytearray(), "foo", {"a": object()})
+
+
+def test_streamed_list_response_byte_by_byte():
+    result = [{"name": "h\xe4st \N{SNOWMAN}"}, 12345, "x, ]", [1, [2]]]
+    data = _make_response(id=7, result=result) + b"next"
+    buf = bytearray()
+    streamed = None
+    items = []
+    for byte in data:
+        buf.append(byte)
+        if streamed is None:
+            streamed = _start_streamed_list_response(buf, 10, lambda id: id == 7)
+            if streamed is not None:
+                assert streamed.id == 7
+        elif not streamed.done:
+            items.extend(streamed.feed(buf))
+    assert streamed is not None and streamed.done
+    assert items == result
+    assert buf == b"next"
+
+
+def test_streamed_list_response_not_a_list():
+    buf = bytearray(_make_response(id=1, result={"items": []}))
+    assert _start_streamed_list_response(buf, 10, lambda id: True) is None
+    buf = bytearray(_make_response(id=1, result=[]))
+    assert _start_streamed_list_response(buf, 1000, lambda id: True) is None
+    assert _start_streamed_list_response(buf, 10, lambda id: False) is None
+    assert buf == _make_response(id=1, result=[])
@@ -0,0 +1,66 @@
+import sansio_lsp_client as lsp
+from sansio_lsp_client.io_handler import _parse_messages
+
+from test_client import initialized_client
+
+
+def test_preload_documents(tmp_path):
+    paths = []
+    for i in range(10):
+        path = tmp_path / f"file{i}.py"
+        path.write_text(f"x = {i}  # \N{SNOWMAN}\n" * 100)
+        paths.append(str(path))
+    (tmp_path / "empty.py").write_text("")
+    paths.append(str(tmp_path / "empty.py"))
+    (tmp_path / "binary.py").write_bytes(b"\xff\xfe")
+    paths.append(str(tmp_path / "binary.py"))
+    paths.append(str(tmp_path / "missing.py"))
+
+    client = initialized_client()
+    sent = bytearray()
+    progresses = []
+    for progress in client.preload_documents(paths, "python", max_unflushed_bytes=5000):
+        assert len(client._send_buf) < 5000 + 3000
+        sent += client.send()
+        progresses.append(progress)
+
+    assert len(progresses) > 2
+    final = progresses[-1]
+    assert final.done
+    assert final.files == 11
+    assert final.total_files == 13
+    assert final.bytes == len(sent)
+    assert [path for path, _ in final.failed] == paths[-2:]
+    assert isinstance(final.failed[0][1], UnicodeDecodeError)
+    assert isinstance(final.failed[1][1], FileNotFoundError)
+
+    messages = list(_parse_messages(sent))
+    assert [m.method for m in messages] == ["textDocument/didOpen"] * 11
+    first = messages[0].params["textDocument"]
+    assert first == {
+        "uri": (tmp_path / "file0.py").as_uri(),
+        "languageId": "python",
+        "version": 0,
+        "text": "x = 0  # \N{SNOWMAN}\n" * 100,
+    }
+    assert messages[-1].params["textDocument"]["text"] == ""
+
+    # The documents are known to the client like with did_open()
+    assert client._document_languages[first["uri"]] == "python"
+
+
+def test_preload_same_as_did_open(tmp_path):
+    path = tmp_path / "a.rs"
+    path.write_text('fn main() { println!("\\t"); }\n')
+
+    preloading = initialized_client()
+    [progress] = preloading.preload_documents([str(path)], lambda p: "rust")
+    assert progress.files == 1
+
+    opening = initialized_client()
+    opening.did_open(
+        lsp.TextDocumentItem(
+            uri=path.as_uri(), languageId="rust", version=0, text=path.read_text()
+        )
+    )
+    assert preloading.send() == opening.send()
@@ -0,0 +1,49 @@
+import sansio_lsp_client as lsp
+
+from test_client import initialized_client, progress
+
+
+def test_rate_limited_updates():
+    tracker = lsp.ProgressTracker(interval=1, idle_timeout=100)
+    tracker.feed_raw("a", {"kind": "begin", "title": "Indexing", "percentage": 0})
+    tracker.feed_raw("b", {"kind": "begin", "title": "Loading"})
+
+    updates = tracker.tick(0)
+    assert [(u.token, u.title, u.done) for u in updates] == [
+        ("a", "Indexing", False),
+        ("b", "Loading", False),
+    ]
+    assert updates[0].aggregate_percentage == 0
+
+    for percentage in range(1, 50):
+        tracker.feed_raw("a", {"kind": "report", "percentage": percentage})
+    assert tracker.tick(0.5) == []  # too soon
+    [update] = tracker.tick(1)
+    assert update.token == "a"
+    assert update.percentage == 49
+    assert tracker.tick(2) == []  # nothing changed
+
+    tracker.feed_raw("a", {"kind": "end", "message": "Done"})
+    [update] = tracker.tick(3)
+    assert update.done
+    assert update.message == "Done"
+    assert tracker.tokens == ["b"]
+
+    # "b" is idle for too long
+    [update] = tracker.tick(200)
+    assert update.token == "b"
+    assert update.done
+    assert tracker.tokens == []
+
+
+def test_client_feeds_tracker():
+    tracker = lsp.ProgressTracker(interval=0)
+    client = initialized_client(progress_tracker=tracker)
+    events = client.recv(
+        progress("t", "begin", title="Indexing")
+        + progress("t", "report", message="foo.py")
+    )
+    assert list(events) == []
+    [update] = tracker.tick(0)
+    assert update.title == "Indexing"
+    assert update.message == "foo.py"
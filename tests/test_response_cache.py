@@ -0,0 +1,185 @@
+import sansio_lsp_client as lsp
+from sansio_lsp_client.io_handler import _make_response
+
+from test_client import sent_messages
+
+FOLDING_RANGES = [{"startLine": 0, "endLine": 2}]
+
+
+def initialized_client(cache, server_info={"name": "pylsp", "version": "1.0"}):
+    client = lsp.Client(response_cache=cache)
+    client.send()
+    [event] = client.recv(
+        _make_response(id=0, result={"capabilities": {}, "serverInfo": server_info})
+    )
+    if server_info is not None:
+        assert event.serverInfo == lsp.ServerInfo.model_validate(server_info)
+    client.send()
+    return client
+
+
+def open_document(client, text):
+    client.did_open(
+        lsp.TextDocumentItem(
+            uri="file:///a.py", languageId="python", version=0, text=text
+        )
+    )
+    client.send()
+
+
+def folding_range(client):
+    return client.folding_range(lsp.TextDocumentIdentifier(uri="file:///a.py"))
+
+
+def test_cached_across_clients(tmp_path):
+    database = str(tmp_path / "cache.sqlite3")
+    cache = lsp.ResponseCache(database)
+    client = initialized_client(cache)
+    open_document(client, "def f():\n    pass\n")
+    id = folding_range(client)
+    [request] = sent_messages(client)
+    [event] = client.recv(_make_response(id=id, result=FOLDING_RANGES))
+    assert isinstance(event, lsp.MFoldingRanges)
+    assert len(cache) == 1
+    cache.close()
+
+    # Restart with the same server and file
+    cache = lsp.ResponseCache(database)
+    assert cache.size > 0
+    client = initialized_client(cache)
+    open_document(client, "def f():\n    pass\n")
+    id = folding_range(client)
+    assert sent_messages(client) == []
+    [event] = client.recv(b"")
+    assert isinstance(event, lsp.MFoldingRanges)
+    assert event.message_id == id
+    assert event.result[0].endLine == 2
+
+    # Other content, other server versions and unknown servers aren't cached
+    client.did_change(
+        lsp.VersionedTextDocumentIdentifier(uri="file:///a.py", version=1),
+        [lsp.TextDocumentContentChangeEvent.whole_document_change("x = 1\n")],
+    )
+    client.send()
+    folding_range(client)
+    assert len(sent_messages(client)) == 1
+    for server_info in [{"name": "pylsp", "version": "1.1"}, None]:
+        client = initialized_client(cache, server_info)
+        open_document(client, "def f():\n    pass\n")
+        folding_range(client)
+        assert len(sent_messages(client)) == 1
+
+
+def test_incremental_changes_and_errors():
+    client = initialized_client(lsp.ResponseCache())
+    open_document(client, "a\n")
+    client.did_change(
+        lsp.VersionedTextDocumentIdentifier(uri="file:///a.py", version=1),
+        [
+            lsp.TextDocumentContentChangeEvent.range_change(
+                lsp.Position(0, 0), lsp.Position(0, 1), "b", "a\n"
+            )
+        ],
+    )
+    client.send()
+    id = folding_range(client)
+    sent_messages(client)
+    client.recv(_make_response(id=id, result=FOLDING_RANGES))
+    assert len(client._response_cache) == 0
+
+    open_document(client, "a\n")
+    id = folding_range(client)
+    sent_messages(client)
+    client.recv(_make_response(id=id, error={"code": -32603, "message": "oops"}))
+    assert len(client._response_cache) == 0
+
+
+def test_eviction():
+    cache = lsp.ResponseCache(max_size=100)
+    for i in range(10):
+        cache.put(str(i), '"' + "x" * 18 + '"')
+        cache.get("0")  # used recently
+    assert cache.size <= 100
+    assert cache.get("0") is not None
+    assert cache.get("1") is None
+    assert cache.get("9") is not None
+
+
+def test_raw_validation():
+    cache = lsp.ResponseCache()
+    for _ in range(2):
+        client = lsp.Client(response_cache=cache, validation="raw")
+        client.send()
+        list(
+            client.recv(
+                _make_response(
+                    id=0, result={"capabilities": {}, "serverInfo": {"name": "pylsp"}}
+                )
+            )
+        )
+        client.send()
+        open_document(client, "def f():\n    pass\n")
+        folding_range(client)
+        for request in sent_messages(client):
+            list(client.recv(_make_response(id=request.id, result=FOLDING_RANGES)))
+
+    # The second client got the result from the cache
+    assert sent_messages(client) == []
+    [event] = client.drain_local()
+    assert isinstance(event, lsp.RawResponse)
+    assert event.payload == FOLDING_RANGES
+
+
+def test_last_used_survives_restart(tmp_path):
+    database = str(tmp_path / "cache.sqlite3")
+    cache = lsp.ResponseCache(database, max_size=100)
+    for i in range(4):
+        cache.put(str(i), '"' + "x" * 18 + '"')
+    cache.get("0")
+    cache.close()
+
+    cache = lsp.ResponseCache(database, max_size=100)
+    for i in range(4, 6):
+        cache.put(str(i), '"' + "x" * 18 + '"')
+    assert cache.get("0") is not None
+    assert cache.get("1") is None
+
+
+def test_raw_validation_invalid_server_info():
+    cache = lsp.ResponseCache()
+    client = lsp.Client(response_cache=cache, validation="raw")
+    client.send()
+    [event] = client.recv(
+        _make_response(id=0, result={"capabilities": {}, "serverInfo": {"version": 1}})
+    )
+    assert event.payload["serverInfo"] == {"version": 1}
+    client.send()
+
+    # Without a server name, nothing is cached
+    open_document(client, "def f():\n    pass\n")
+    folding_range(client)
+    [request] = sent_messages(client)
+    list(client.recv(_make_response(id=request.id, result=FOLDING_RANGES)))
+    assert len(cache) == 0
+
+
+def test_partial_results_cached():
+    cache = lsp.ResponseCache()
+    client = initialized_client(cache)
+    open_document(client, "class A: ...\n")
+    doc = lsp.TextDocumentIdentifier(uri="file:///a.py")
+    id = client.documentSymbol(doc, partial_results=True)
+    [request] = sent_messages(client)
+    assert "partialResultToken" in request.params
+    list(client.recv(_make_response(id=id, result=[])))
+    assert len(cache) == 1
+
+    # Answered from the cache without a partialResultToken, looked up once
+    use_counter = cache._use_counter
+    id = client.documentSymbol(doc, partial_results=True)
+    assert sent_messages(client) == []
+    assert cache._use_counter == use_counter + 1
+    [event] = client.drain_local()
+    assert isinstance(event, lsp.MDocumentSymbols)
+    assert event.message_id == id
+    assert event.delivered_partial_results == 0
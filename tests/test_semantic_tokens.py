@@ -0,0 +1,132 @@
+import sansio_lsp_client as lsp
+from sansio_lsp_client.io_handler import _make_response
+
+from test_client import initialized_client, sent_messages
+
+# line 0: tokens at 0 and 5, line 2: token at 3, line 3: token at 1
+DATA = [0, 0, 3, 1, 0, 0, 5, 2, 2, 1, 2, 3, 4, 0, 0, 1, 1, 1, 3, 0]
+
+
+def test_tokens_in_lines():
+    tokens = lsp.SemanticTokensData(DATA)
+    assert len(tokens) == 4
+    assert list(tokens.tokens_in_lines(0, 0)) == [(0, 0, 3, 1, 0), (0, 5, 2, 2, 1)]
+    assert list(tokens.tokens_in_lines(1, 2)) == [(2, 3, 4, 0, 0)]
+    assert list(tokens.tokens_in_lines(3, 10)) == [(3, 1, 1, 3, 0)]
+    assert len(list(tokens.tokens())) == 4
+
+
+def test_legend():
+    legend = lsp.SemanticTokensLegend(
+        tokenTypes=["class", "function"], tokenModifiers=["static", "readonly"]
+    )
+    assert legend.type_name(1) == "function"
+    assert legend.modifier_names(0b11) == ["static", "readonly"]
+
+
+def open_document(client):
+    client.did_open(
+        lsp.TextDocumentItem(uri="file:///a", languageId="python", version=0, text="")
+    )
+    sent_messages(client)
+    return lsp.TextDocumentIdentifier(uri="file:///a")
+
+
+def test_client_full_and_delta():
+    client = initialized_client()
+    doc = open_document(client)
+
+    full_id = client.semantic_tokens_full_delta(doc)
+    [request] = sent_messages(client)
+    assert request.method == "textDocument/semanticTokens/full"
+    [full] = client.recv(
+        _make_response(id=full_id, result={"resultId": "1", "data": DATA})
+    )
+    assert isinstance(full, lsp.SemanticTokens)
+    assert full.uri == "file:///a"
+
+    delta_id = client.semantic_tokens_full_delta(doc)
+    [request] = sent_messages(client)
+    assert request.method == "textDocument/semanticTokens/full/delta"
+    assert request.params["previousResultId"] == "1"
+    # Remove the second token, and change the length of the last one.
+    edits = [
+        {"start": 5, "deleteCount": 5},
+        {"start": 17, "deleteCount": 1, "data": [7]},
+    ]
+    [delta] = client.recv(
+        _make_response(id=delta_id, result={"resultId": "2", "edits": edits})
+    )
+    assert delta.tokens is full.tokens
+    assert delta.tokens.result_id == "2"
+    assert list(delta.tokens.tokens()) == [
+        (0, 0, 3, 1, 0),
+        (2, 3, 4, 0, 0),
+        (3, 1, 7, 3, 0),
+    ]
+
+
+def test_delta_after_close():
+    client = initialized_client()
+    doc = open_document(client)
+    full_id = client.semantic_tokens_full_delta(doc)
+    sent_messages(client)
+    client.recv(_make_response(id=full_id, result={"resultId": "1", "data": DATA}))
+
+    delta_id = client.semantic_tokens_full_delta(doc)
+    client.did_close(doc)
+    sent_messages(client)
+    edits = [{"start": 5, "deleteCount": 5}]
+    [delta] = client.recv(
+        _make_response(id=delta_id, result={"resultId": "2", "edits": edits})
+    )
+    assert delta.uri == "file:///a"
+    assert delta.tokens is None
+
+
+def test_full_after_close():
+    client = initialized_client()
+    doc = open_document(client)
+    full_id = client.semantic_tokens_full(doc)
+    client.did_close(doc)
+    sent_messages(client)
+    [full] = client.recv(
+        _make_response(id=full_id, result={"resultId": "1", "data": DATA})
+    )
+    assert len(full.tokens) == 4
+
+    # The tokens of the closed document weren't kept
+    client.semantic_tokens_full_delta(doc)
+    [request] = sent_messages(client)
+    assert request.method == "textDocument/semanticTokens/full"
+
+
+def test_overlapping_deltas():
+    client = initialized_client()
+    doc = open_document(client)
+    full_id = client.semantic_tokens_full_delta(doc)
+    sent_messages(client)
+    [full] = client.recv(
+        _make_response(id=full_id, result={"resultId": "1", "data": [0, 0, 1, 0, 0]})
+    )
+
+    # Both deltas are relative to "1"
+    first_id = client.semantic_tokens_full_delta(doc)
+    second_id = client.semantic_tokens_full_delta(doc)
+    requests = sent_messages(client)
+    assert [r.params["previousResultId"] for r in requests] == ["1", "1"]
+    replace = [{"start": 0, "deleteCount": 5, "data": [1, 0, 1, 0, 0]}]
+    append = [{"start": 5, "deleteCount": 0, "data": [0, 2, 1, 0, 0]}]
+    [first, second] = client.recv(
+        _make_response(id=first_id, result={"resultId": "2", "edits": replace})
+        + _make_response(id=second_id, result={"resultId": "3", "edits": append})
+    )
+    assert first.tokens is full.tokens
+    assert second.tokens is None
+    assert full.tokens.result_id == "2"
+    assert list(full.tokens.tokens()) == [(1, 0, 1, 0, 0)]
+
+    # The next delta is relative to the tokens that were kept
+    client.semantic_tokens_full_delta(doc)
+    [request] = sent_messages(client)
+    assert request.params["previousResultId"] == "2"
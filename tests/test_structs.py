@@ -1,3 +1,6 @@
+import pydantic
+import pytest
+
 import sansio_lsp_client as lsp
 
 
@@ -35,3 +38,38 @@ def test_change_range():
         rangeLength=len("o" + "bar" + "ba"),  # FIXME: include newlines?
         text="LOL",
     )
+
+
+def test_position_and_range_are_compact():
+    json_range = {
+        "start": {"line": 1, "character": 2},
+        "end": {"line": 3, "character": 0},
+    }
+    range = lsp.Range.model_validate(json_range)
+    assert range == lsp.Range(
+        start=lsp.Position(line=1, character=2), end=lsp.Position(line=3, character=0)
+    )
+    assert range.model_dump() == json_range
+    assert lsp.Location(uri="file:///a", range=range).model_dump() == {
+        "uri": "file:///a",
+        "range": json_range,
+    }
+
+    assert hash(range) == hash(lsp.Range.model_validate(json_range))
+    assert range.start < range.end
+    assert sorted([range.end, range.start]) == [range.start, range.end]
+
+    with pytest.raises(pydantic.ValidationError):
+        lsp.Location.model_validate(
+            {"uri": "file:///a", "range": {"start": {"line": 1}, "end": {}}}
+        )
+
+
+def test_position_coerces_like_int_fields():
+    assert lsp.Position.model_validate({"line": "1", "character": 2.0}) == (1, 2)
+    with pytest.raises(ValueError):
+        lsp.Position.model_validate({"line": 1.5, "character": 0})
+    with pytest.raises(pydantic.ValidationError):
+        lsp.Location.model_validate(
+            {"uri": "file:///a", "range": {"start": ["x", 0], "end": [0, 0]}}
+        )
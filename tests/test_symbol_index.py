@@ -0,0 +1,158 @@
+import sansio_lsp_client as lsp
+from sansio_lsp_client.io_handler import _make_response
+
+from test_client import initialized_client, location_json, sent_messages
+
+
+def range_json(line, start, end):
+    return {
+        "start": {"line": line, "character": start},
+        "end": {"line": line, "character": end},
+    }
+
+
+def document_symbols_json(*names):
+    return [
+        {
+            "name": "Outer",
+            "kind": lsp.SymbolKind.CLASS,
+            "range": range_json(0, 0, 50),
+            "selectionRange": range_json(0, 6, 11),
+            "children": [
+                {
+                    "name": name,
+                    "kind": lsp.SymbolKind.METHOD,
+                    "range": range_json(i + 1, 0, 50),
+                    "selectionRange": range_json(i + 1, 8, 8 + len(name)),
+                }
+                for i, name in enumerate(names)
+            ],
+        }
+    ]
+
+
+def answer(client, index, results):
+    """Answer the requests sent by the index with results[method]."""
+    while not index.done:
+        response = b""
+        for message in sent_messages(client):
+            if message.id is not None:
+                response += _make_response(
+                    id=message.id, result=results[message.method]
+                )
+        for event in client.recv(response):
+            assert index.handle(event)
+
+
+def test_symbol_index(tmp_path):
+    database = str(tmp_path / "index.sqlite")
+    client = initialized_client()
+    index = lsp.SymbolIndex(client, database, index_references=True)
+    assert index.update_file("file:///a.py", "class Outer: ...", "python")
+    [open_, request] = sent_messages(client)
+    assert open_.method == "textDocument/didOpen"
+    assert request.method == "textDocument/documentSymbol"
+    for event in client.recv(
+        _make_response(
+            id=request.id, result=document_symbols_json("get_thing", "set_thing")
+        )
+    ):
+        assert index.handle(event)
+
+    # Now the references of every symbol are requested, and the file stays
+    # open until they are answered
+    requests = sent_messages(client)
+    assert [r.method for r in requests] == ["textDocument/references"] * 3
+    response = b"".join(
+        _make_response(id=r.id, result=[location_json(5), location_json(7)])
+        for r in requests
+    )
+    for event in client.recv(response):
+        assert index.handle(event)
+    [close] = sent_messages(client)
+    assert close.method == "textDocument/didClose"
+    assert client.document_version("file:///a.py") is None
+
+    symbols = index.find_symbols("THING")
+    assert [symbol.name for symbol in symbols] == ["get_thing", "set_thing"]
+    assert symbols[0].containerName == "Outer"
+    assert symbols[0].kind == lsp.SymbolKind.METHOD
+    assert symbols[0].location == lsp.Location(
+        uri="file:///a.py",
+        range=lsp.Range(lsp.Position(1, 0), lsp.Position(1, 50)),
+    )
+    assert index.find_symbols("%") == []
+    references = index.find_references("file:///a.py", lsp.Position(2, 10))
+    assert [location.range.start.line for location in references] == [5, 7]
+    assert index.find_references("file:///a.py", lsp.Position(20, 0)) is None
+    index.close()
+
+    # After a restart, unchanged files aren't crawled again
+    client = initialized_client()
+    index = lsp.SymbolIndex(client, database)
+    assert not index.update_file("file:///a.py", "class Outer: ...", "python")
+    assert sent_messages(client) == []
+    assert len(index.find_symbols("thing")) == 2
+
+    assert index.update_file("file:///a.py", "class Outer: pass", "python")
+    # Before the server answers, the old symbols are gone
+    assert index.find_symbols("thing") == []
+    answer(
+        client,
+        index,
+        {"textDocument/documentSymbol": document_symbols_json("other_thing")},
+    )
+    assert [s.name for s in index.find_symbols("thing")] == ["other_thing"]
+    # The references weren't indexed this time
+    assert index.find_references("file:///a.py", lsp.Position(1, 10)) is None
+
+
+def test_symbol_index_file_changed_during_crawl():
+    client = initialized_client()
+    index = lsp.SymbolIndex(client)
+    index.update_file("file:///a.py", "old", "python")
+    [_, old_request] = sent_messages(client)
+    index.update_file("file:///a.py", "new", "python")
+    [change, new_request] = sent_messages(client)
+    assert change.method == "textDocument/didChange"
+    assert change.params["contentChanges"] == [{"text": "new"}]
+
+    for event in client.recv(
+        _make_response(id=old_request.id, result=document_symbols_json("old"))
+        + _make_response(id=new_request.id, result=document_symbols_json("new"))
+    ):
+        assert index.handle(event)
+    [close] = sent_messages(client)
+    assert close.method == "textDocument/didClose"
+    assert [s.name for s in index.find_symbols("Outer")] == ["Outer"]
+    assert [s.name for s in index.find_symbols("new")] == ["new"]
+    assert index.find_symbols("old") == []
+
+
+def test_symbol_index_open_and_removed_files():
+    client = initialized_client()
+    index = lsp.SymbolIndex(client, index_references=True)
+    client.did_open(
+        lsp.TextDocumentItem(
+            uri="file:///a.py", languageId="python", version=3, text="class Outer: ..."
+        )
+    )
+    sent_messages(client)
+
+    # Files that the user has open aren't opened or closed by the index
+    index.update_file("file:///a.py", "class Outer: ...", "python")
+    [request] = sent_messages(client)
+    assert request.method == "textDocument/documentSymbol"
+    for event in client.recv(
+        _make_response(id=request.id, result=document_symbols_json())
+    ):
+        assert index.handle(event)
+    answer(client, index, {"textDocument/references": [location_json(5)]})
+    assert client.document_version("file:///a.py") == 3
+
+    # The references to the symbols from a removed file are requested again
+    index.remove_file("file:///b.py")
+    assert sent_messages(client) == []
+    index.remove_file("file:///a")
+    requests = sent_messages(client)
+    assert [r.method for r in requests] == ["textDocument/references"]
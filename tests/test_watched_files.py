@@ -0,0 +1,142 @@
+import json
+import os
+import sys
+
+import pytest
+
+import sansio_lsp_client as lsp
+from sansio_lsp_client.io_handler import _make_request
+
+from test_client import initialized_client
+
+
+def register_watchers(client, *watchers):
+    [request] = client.recv(
+        _make_request(
+            "client/registerCapability",
+            {
+                "registrations": [
+                    {
+                        "id": "watch",
+                        "method": "workspace/didChangeWatchedFiles",
+                        "registerOptions": {"watchers": list(watchers)},
+                    }
+                ]
+            },
+            id=1,
+        )
+    )
+    request.reply()
+    client.send()
+
+
+def sent_changes(client):
+    data = client.send()
+    if not data:
+        return None
+    body = json.loads(data.split(b"\r\n\r\n", 1)[1])
+    assert body["method"] == "workspace/didChangeWatchedFiles"
+    return [(change["uri"], change["type"]) for change in body["params"]["changes"]]
+
+
+def test_file_watchers():
+    client = initialized_client()
+    register_watchers(
+        client,
+        {"globPattern": "**/*.rs"},
+        {
+            "globPattern": {"baseUri": "file:///project", "pattern": "Cargo.toml"},
+            "kind": lsp.WatchKind.CHANGE,
+        },
+    )
+    first, second = client.file_watchers
+    assert first.globPattern == "**/*.rs"
+    assert (
+        first.kind == lsp.WatchKind.CREATE | lsp.WatchKind.CHANGE | lsp.WatchKind.DELETE
+    )
+    assert second.globPattern.baseUri == "file:///project"
+    assert second.kind == lsp.WatchKind.CHANGE
+
+
+def test_batching():
+    client = initialized_client()
+    register_watchers(
+        client,
+        {"globPattern": "**/*.rs"},
+        {
+            "globPattern": {"baseUri": "file:///project", "pattern": "Cargo.toml"},
+            "kind": lsp.WatchKind.CHANGE,
+        },
+    )
+    batcher = lsp.WatchedFilesBatcher(client, debounce=0.1, max_delay=1)
+
+    batcher.add("/project/src/new.rs", lsp.FileChangeType.CREATED, 0)
+    batcher.add("/project/src/new.rs", lsp.FileChangeType.CHANGED, 0.01)
+    batcher.add("/project/src/old.rs", lsp.FileChangeType.DELETED, 0.02)
+    batcher.add("/project/src/temp.rs", lsp.FileChangeType.CREATED, 0.03)
+    batcher.add("/project/src/temp.rs", lsp.FileChangeType.DELETED, 0.04)
+    batcher.add("/project/README.md", lsp.FileChangeType.CHANGED, 0.05)
+    batcher.add("/project/Cargo.toml", lsp.FileChangeType.CHANGED, 0.05)
+    batcher.add("/elsewhere/Cargo.toml", lsp.FileChangeType.CHANGED, 0.05)
+    batcher.add("/project/Cargo.lock", lsp.FileChangeType.DELETED, 0.05)
+
+    assert batcher.poll(0.1) == 0  # still debouncing
+    assert batcher.poll(0.2) == 3
+    assert sent_changes(client) == [
+        ("file:///project/src/new.rs", lsp.FileChangeType.CREATED),
+        ("file:///project/src/old.rs", lsp.FileChangeType.DELETED),
+        ("file:///project/Cargo.toml", lsp.FileChangeType.CHANGED),
+    ]
+    assert batcher.pending == 0
+    assert batcher.poll(10) == 0
+    assert sent_changes(client) is None
+
+    # Deleting the Cargo.toml isn't watched, recreating it counts as a change
+    batcher.add("/project/Cargo.toml", lsp.FileChangeType.DELETED, 11)
+    assert batcher.poll(11, force=True) == 0
+    batcher.add("/project/Cargo.toml", lsp.FileChangeType.DELETED, 12)
+    batcher.add("/project/Cargo.toml", lsp.FileChangeType.CREATED, 12)
+    assert batcher.poll(12, force=True) == 1
+
+
+def test_max_delay():
+    client = initialized_client()
+    register_watchers(client, {"globPattern": "**/*"})
+    batcher = lsp.WatchedFilesBatcher(client, debounce=0.1, max_delay=1)
+
+    now = 0.0
+    while now < 1:
+        batcher.add("/a/log.txt", lsp.FileChangeType.CHANGED, now)
+        assert batcher.poll(now) == 0
+        now += 0.05
+    batcher.add("/a/log.txt", lsp.FileChangeType.CHANGED, now)
+    assert batcher.poll(now) == 1
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify")
+def test_inotify(tmp_path):
+    (tmp_path / "existing.txt").write_text("hello")
+    (tmp_path / ".git").mkdir()
+
+    with lsp.InotifyWatcher(str(tmp_path)) as watcher:
+        assert watcher.read() == []
+
+        (tmp_path / "existing.txt").write_text("world")
+        (tmp_path / "existing.txt").unlink()
+        (tmp_path / ".git" / "index").write_text("ignored")
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "new.txt").write_text("x")
+
+        changes = watcher.read()
+        existing = os.path.join(str(tmp_path), "existing.txt")
+        new = os.path.join(str(tmp_path), "sub", "new.txt")
+        assert (existing, lsp.FileChangeType.CHANGED) in changes
+        assert changes[-1] != (existing, lsp.FileChangeType.CREATED)
+        assert (existing, lsp.FileChangeType.DELETED) in changes
+        assert (new, lsp.FileChangeType.CREATED) in changes
+        assert not any(".git" in path for path, _ in changes)
+
+        # Files in the new directory are watched too
+        (tmp_path / "sub" / "new.txt").write_text("y")
+        assert (new, lsp.FileChangeType.CHANGED) in watcher.read()
+        assert not watcher.overflowed
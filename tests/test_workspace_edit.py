@@ -0,0 +1,94 @@
+import pytest
+
+import sansio_lsp_client as lsp
+
+from test_client import initialized_client, sent_messages
+
+
+def edit(start_line, start_char, end_line, end_char, new_text):
+    return lsp.TextEdit(
+        range=lsp.Range(
+            lsp.Position(start_line, start_char), lsp.Position(end_line, end_char)
+        ),
+        newText=new_text,
+    )
+
+
+def test_apply_text_edits():
+    text = "foo bar\r\nbaz\nlast"
+    edits = [
+        edit(2, 0, 2, 4, "LAST"),
+        edit(0, 4, 0, 7, "BAR"),
+        edit(0, 0, 0, 0, "1"),
+        edit(0, 0, 0, 0, "2"),
+        edit(1, 1, 1, 100, "AZ"),  # past the end of the line
+        edit(0, 7, 1, 0, " "),  # joins the lines
+    ]
+    assert lsp.apply_text_edits(text, edits) == "12foo BAR bAZ\nLAST"
+    assert lsp.apply_text_edits(text, []) is text
+    assert lsp.apply_text_edits("a", [edit(5, 0, 5, 0, "\nb")]) == "a\nb"
+
+
+def test_apply_text_edits_insert_before_replace():
+    edits = [edit(0, 0, 0, 3, "xyz"), edit(0, 0, 0, 0, "<")]
+    assert lsp.apply_text_edits("abc", edits) == "<xyz"
+
+
+def test_apply_text_edits_overlapping():
+    with pytest.raises(lsp.OverlappingEditsError):
+        lsp.apply_text_edits("abcdef", [edit(0, 0, 0, 3, ""), edit(0, 2, 0, 4, "")])
+
+
+def test_apply_workspace_edit():
+    texts = {f"file:///{i}": f"x = {i}\n" for i in range(100)}
+    workspace_edit = lsp.WorkspaceEdit(
+        changes={uri: [edit(0, 0, 0, 1, "y")] for uri in texts}
+    )
+    assert lsp.apply_workspace_edit(workspace_edit, texts.__getitem__) == {
+        uri: "y" + text[1:] for uri, text in texts.items()
+    }
+    assert lsp.apply_workspace_edit(
+        workspace_edit, texts.__getitem__, max_workers=1
+    ) == {uri: "y" + text[1:] for uri, text in texts.items()}
+
+
+def test_client_apply_workspace_edit():
+    client = initialized_client()
+    client.did_open(
+        lsp.TextDocumentItem(uri="file:///a", languageId="python", version=3, text="")
+    )
+    client.send()
+    texts = {"file:///a": "old = 1\n", "file:///b": "print(old)\n"}
+
+    def rename_edit(version):
+        return lsp.WorkspaceEdit(
+            documentChanges=[
+                lsp.TextDocumentEdit(
+                    textDocument=lsp.OptionalVersionedTextDocumentIdentifier(
+                        uri="file:///a", version=version
+                    ),
+                    edits=[edit(0, 0, 0, 3, "new")],
+                ),
+                lsp.TextDocumentEdit(
+                    textDocument=lsp.OptionalVersionedTextDocumentIdentifier(
+                        uri="file:///b", version=None
+                    ),
+                    edits=[edit(0, 6, 0, 9, "new")],
+                ),
+            ]
+        )
+
+    with pytest.raises(ValueError):
+        client.apply_workspace_edit(rename_edit(2), texts.__getitem__)
+
+    new_texts = client.apply_workspace_edit(rename_edit(3), texts.__getitem__)
+    assert new_texts == {"file:///a": "new = 1\n", "file:///b": "print(new)\n"}
+
+    # Only the open document is sent to the server
+    [request] = sent_messages(client)
+    assert request.method == "textDocument/didChange"
+    assert request.params == {
+        "textDocument": {"uri": "file:///a", "version": 4},
+        "contentChanges": [{"text": "new = 1\n"}],
+    }
+    assert client._document_versions["file:///a"] == 4
@@ -0,0 +1,102 @@
+import sansio_lsp_client as lsp
+from sansio_lsp_client.io_handler import _make_response
+
+from test_client import initialized_client, sent_messages
+
+
+def symbol_json(name, line=0):
+    return {
+        "name": name,
+        "kind": 12,
+        "location": {
+            "uri": "file:///a.py",
+            "range": {
+                "start": {"line": line, "character": 0},
+                "end": {"line": line + 1, "character": 0},
+            },
+        },
+    }
+
+
+def respond(client, index, names):
+    [request] = sent_messages(client)
+    assert request.method == "workspace/symbol"
+    [event] = client.recv(
+        _make_response(id=request.id, result=[symbol_json(name) for name in names])
+    )
+    assert index.handle(event)
+    return request.params["query"]
+
+
+def names(symbols):
+    return [symbol.name for symbol in symbols]
+
+
+def test_narrowing_queries_are_answered_locally():
+    client = initialized_client()
+    index = lsp.WorkspaceSymbolIndex(client, max_age=10)
+
+    assert index.search("pa", now=0) == []
+    assert not index.done
+    assert respond(client, index, ["parse", "parse_headers", "Path", "compare"]) == "pa"
+    assert index.done
+    assert len(index) == 4
+
+    assert index.covers("par", now=1)
+    assert names(index.search("par", now=1)) == ["parse", "parse_headers", "compare"]
+    assert names(index.search("parh", now=1)) == ["parse_headers"]
+    assert names(index.search("pa", now=1, limit=2)) == ["parse", "parse_headers"]
+    assert sent_messages(client) == []
+
+    # Widening the query asks the server, and the known symbols are shown
+    # until it responds.
+    assert not index.covers("p", now=1)
+    assert names(index.search("p", now=1)) == [
+        "parse",
+        "parse_headers",
+        "Path",
+        "compare",
+    ]
+    assert names(index.search("p", now=2)) != []  # no second request
+    respond(client, index, ["parse", "parse_headers", "Path", "compare", "pop"])
+    assert "pop" in names(index.search("p", now=2))
+    assert sent_messages(client) == []
+
+
+def test_typing_while_waiting():
+    client = initialized_client()
+    index = lsp.WorkspaceSymbolIndex(client, max_age=10)
+
+    index.search("f", now=0)
+    # The response for "f" will cover these
+    assert index.search("fo", now=0.1) == []
+    assert index.search("foo", now=0.2) == []
+    assert respond(client, index, ["foo", "foobar", "fun"]) == "f"
+    assert names(index.search("foo", now=0.3)) == ["foo", "foobar"]
+    assert sent_messages(client) == []
+
+    # A query that the pending one doesn't cover is requested right away
+    index.search("x", now=1)
+    index.search("y", now=1)
+    assert [r.params["query"] for r in sent_messages(client)] == ["x", "y"]
+
+
+def test_stale_and_truncated_results():
+    client = initialized_client()
+    index = lsp.WorkspaceSymbolIndex(client, max_age=10, server_result_limit=2)
+
+    index.search("foo", now=0)
+    respond(client, index, ["foo", "foobar"])
+    # The server may have had more symbols than it returned
+    assert not index.covers("foob", now=1)
+    index.search("foob", now=1)
+    respond(client, index, ["foobar"])
+    assert index.covers("foob", now=1)
+
+    # After max_age seconds, the server is asked again, and symbols that
+    # are no longer in its results aren't matched.
+    assert not index.covers("foob", now=15)
+    assert names(index.search("foob", now=15)) == ["foobar"]
+    respond(client, index, ["foobaz"])
+    assert names(index.search("fooba", now=16)) == ["foobaz"]
+    assert len(index) == 1